@@ -0,0 +1,270 @@
+# Pet Arrays - structure-of-arrays pet storage for big ecosystems
+# Keeps every pet's position, stats and personality in NumPy arrays so one
+# tick of hunger, energy and movement is a handful of batched operations.
+# Lesson code can still read pets like dicts:
+#
+#   pets = PetTable.from_dicts(default_pets())
+#   pets['Luna']['hunger'] += 5
+
+from collections.abc import Mapping, MutableMapping
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STAT_FIELDS = ('x', 'y', 'hunger', 'energy', 'happiness')
+
+# Personality columns, with the default PetAI.think() uses when a key is missing
+PERSONALITY_FIELDS = ('hunger', 'energy', 'social', 'help_others', 'helpful')
+PERSONALITY_DEFAULTS = {'hunger': 0.5, 'energy': 0.5, 'social': 0.5, 'help_others': 0.5, 'helpful': 0}
+
+# Every per-pet array: the stats, the weights and the last step taken
+# (what PetAI.last_move holds on the dict backend)
+ARRAY_FIELDS = STAT_FIELDS + ('personality', 'last_dx', 'last_dy')
+
+
+def personality_row(personality):
+    """A personality dict as a list of weights in PERSONALITY_FIELDS order"""
+    return [personality.get(need, PERSONALITY_DEFAULTS[need]) for need in PERSONALITY_FIELDS]
+
+
+class PetArrays:
+    """Contiguous per-field arrays for every pet, grown by doubling"""
+
+    def __init__(self, capacity=64):
+        if np is None:
+            raise ImportError("The vectorized pet backend needs NumPy: pip install numpy")
+
+        self.count = 0
+        self.capacity = max(1, capacity)
+        self.version = 0  # Goes up whenever pets are added or removed
+        for field in STAT_FIELDS + ('last_dx', 'last_dy'):
+            setattr(self, '_' + field, np.zeros(self.capacity))
+        self._personality = np.zeros((self.capacity, len(PERSONALITY_FIELDS)))
+        self._index_columns()
+
+        # Per-pet Python objects that do not vectorize
+        self.names = []
+        self.colors = []
+        self.ais = []
+        self.extras = []
+        self.views = []
+
+    def __len__(self):
+        return self.count
+
+    # Live views of the used part of each array
+    @property
+    def x(self):
+        return self._x[:self.count]
+
+    @property
+    def y(self):
+        return self._y[:self.count]
+
+    @property
+    def hunger(self):
+        return self._hunger[:self.count]
+
+    @property
+    def energy(self):
+        return self._energy[:self.count]
+
+    @property
+    def happiness(self):
+        return self._happiness[:self.count]
+
+    @property
+    def personality(self):
+        return self._personality[:self.count]
+
+    @property
+    def last_dx(self):
+        return self._last_dx[:self.count]
+
+    @property
+    def last_dy(self):
+        return self._last_dy[:self.count]
+
+    def field(self, name):
+        """Array view for one of STAT_FIELDS"""
+        return getattr(self, '_' + name)[:self.count]
+
+    def _grow(self):
+        self.capacity *= 2
+        for field in ARRAY_FIELDS:
+            old = getattr(self, '_' + field)
+            new = np.zeros((self.capacity,) + old.shape[1:])
+            new[:self.count] = old[:self.count]
+            setattr(self, '_' + field, new)
+        self._index_columns()
+
+    def _index_columns(self):
+        # Field name -> full-capacity array, for fast PetView lookups
+        self.columns = {field: getattr(self, '_' + field) for field in STAT_FIELDS}
+
+    def append(self, name, pet):
+        """Copy a pet dict into the next free slot and return its view"""
+        if self.count == self.capacity:
+            self._grow()
+
+        i = self.count
+        for field in STAT_FIELDS:
+            getattr(self, '_' + field)[i] = pet[field]
+
+        ai = pet.get('ai')
+        self._personality[i] = personality_row(ai.personality if ai is not None else {})
+        last_move = getattr(ai, 'last_move', None) or {'dx': 0, 'dy': 0}
+        self._last_dx[i] = last_move['dx']
+        self._last_dy[i] = last_move['dy']
+
+        self.names.append(name)
+        self.colors.append(pet.get('color'))
+        self.ais.append(ai)
+        self.extras.append({k: v for k, v in pet.items()
+                            if k not in STAT_FIELDS and k not in ('color', 'ai')})
+        view = PetView(self, i)
+        self.views.append(view)
+        self.count += 1
+        self.version += 1
+        return view
+
+    def remove(self, slot):
+        """Drop a pet by moving the last pet into its slot"""
+        last = self.count - 1
+        removed = self.views[slot]
+        if slot != last:
+            for field in ARRAY_FIELDS:
+                array = getattr(self, '_' + field)
+                array[slot] = array[last]
+            for column in (self.names, self.colors, self.ais, self.extras, self.views):
+                column[slot] = column[last]
+            self.views[slot].slot = slot
+
+        for column in (self.names, self.colors, self.ais, self.extras, self.views):
+            column.pop()
+        removed.slot = None
+        self.count -= 1
+        self.version += 1
+
+    def recompile(self, slot):
+        """Copy a pet's PetAI.personality into the weight matrix again"""
+        ai = self.ais[slot]
+        self._personality[slot] = personality_row(ai.personality if ai is not None else {})
+
+    def apply_tick(self, dx, dy, resting, bounds):
+        """Move every pet and apply one tick of hunger and energy drift.
+
+        dx, dy and resting are arrays with one entry per pet; bounds is
+        (min_x, min_y, max_x, max_y) for pet centres.
+        """
+        min_x, min_y, max_x, max_y = bounds
+        x, y = self.x, self.y
+        x += dx
+        y += dy
+        np.clip(x, min_x, max_x, out=x)
+        np.clip(y, min_y, max_y, out=y)
+
+        # Gradually get hungry
+        hunger = self.hunger
+        hunger += 0.1
+        np.minimum(hunger, 100, out=hunger)
+
+        # Resting pets recharge, everyone else slowly tires
+        energy = self.energy
+        energy += np.where(resting, 1.0, -0.05)
+        np.clip(energy, 0, 100, out=energy)
+
+
+class PetView(MutableMapping):
+    """Dict-style window onto one pet's row in a PetArrays"""
+
+    __slots__ = ('arrays', 'slot')
+
+    def __init__(self, arrays, slot):
+        self.arrays = arrays
+        self.slot = slot
+
+    def __getitem__(self, key):
+        arrays = self.arrays
+        column = arrays.columns.get(key)
+        if column is not None:
+            return column[self.slot].item()
+        if key == 'color':
+            return arrays.colors[self.slot]
+        if key == 'ai':
+            return arrays.ais[self.slot]
+        return arrays.extras[self.slot][key]
+
+    def __setitem__(self, key, value):
+        arrays = self.arrays
+        column = arrays.columns.get(key)
+        if column is not None:
+            column[self.slot] = value
+        elif key == 'color':
+            arrays.colors[self.slot] = value
+        elif key == 'ai':
+            arrays.ais[self.slot] = value
+        else:
+            arrays.extras[self.slot][key] = value
+
+    def __delitem__(self, key):
+        if key in STAT_FIELDS or key in ('color', 'ai'):
+            raise KeyError(f"{key!r} is part of every pet and cannot be deleted")
+        del self.arrays.extras[self.slot][key]
+
+    def __iter__(self):
+        yield from STAT_FIELDS
+        yield 'color'
+        yield 'ai'
+        yield from self.arrays.extras[self.slot]
+
+    def __len__(self):
+        return len(STAT_FIELDS) + 2 + len(self.arrays.extras[self.slot])
+
+    def __repr__(self):
+        return f"PetView({dict(self)!r})"
+
+
+class PetTable(Mapping):
+    """Name -> PetView mapping backed by one PetArrays"""
+
+    def __init__(self, capacity=64):
+        self.arrays = PetArrays(capacity)
+        self.slots = {}  # name -> slot, in the order pets were added
+
+    @classmethod
+    def from_dicts(cls, pets):
+        table = cls(capacity=len(pets) or 64)
+        for name, pet in pets.items():
+            table.add(name, pet)
+        return table
+
+    def add(self, name, pet):
+        """Add a pet from a plain dict like the ones in default_pets()"""
+        if name in self.slots:
+            raise KeyError(f"There is already a pet called {name!r}")
+        view = self.arrays.append(name, pet)
+        self.slots[name] = view.slot
+        return view
+
+    def recompile(self, name):
+        """Pick up changes made to a pet's personality dict after adding it"""
+        self.arrays.recompile(self.slots[name])
+
+    def remove(self, name):
+        slot = self.slots.pop(name)
+        last_name = self.arrays.names[-1]
+        self.arrays.remove(slot)
+        if last_name != name:
+            self.slots[last_name] = slot
+
+    def __getitem__(self, name):
+        return self.arrays.views[self.slots[name]]
+
+    def __iter__(self):
+        return iter(self.slots)
+
+    def __len__(self):
+        return len(self.slots)
@@ -0,0 +1,281 @@
+# Pet Env - a training environment for pet AI policies
+# Runs many small pet worlds side by side in NumPy arrays, Gym style:
+# you pick a goal for every pet, the worlds move one tick, and you get
+# back what each pet can see and how much happier it got.
+#
+#   env = VectorPetEnv(num_envs=256, num_pets=3, seed=0)
+#   obs = env.reset()                          # (256, 3, OBS_SIZE)
+#   actions = env.policy_actions(weights)      # or your own policy
+#   obs, reward, done, info = env.step(actions)
+#
+# Actions are goal codes from pet_policy.GOALS: 0 find_food, 1 rest,
+# 2 help_friend, 3 socialize, 4 explore. The rules are
+# PetWorld(backend='numpy')'s: every pet acts on the state at the start of
+# the tick, steering with pet_moves.act() and the flow fields, then eats
+# and meets friends, and each world's food comes from the same
+# FoodSpawner a PetWorld gets. Nothing is drawn.
+
+from pet_arrays import np
+from pet_flow import arena_flow
+from pet_moves import act
+from pet_policy import FIND_FOOD, REST, HELP_FRIEND, SOCIALIZE, EXPLORE, decide, needy_mask
+from pet_world import EAT_RADIUS, FOOD_LIFETIME, SOCIAL_RADIUS, default_food_spawner
+
+# What each pet observes, all scaled to about -1..1
+OBS_FIELDS = ('hunger', 'energy', 'happiness', 'x', 'y',
+              'food_dx', 'food_dy', 'food_visible', 'needy_friends')
+OBS_SIZE = len(OBS_FIELDS)
+
+EPISODE_TICKS = 3600     # One minute of game time
+
+
+class _SideBySide:
+    """FlowFields lookups for the env's worlds laid side by side, for pet_moves.act()
+
+    World i's pets stand stride * i further right. Every world shares
+    the one rest field (there are no walls) and has its own food field,
+    kept in a table row per world.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.size = env.flow.columns * env.flow.rows + 1  # Plus one entry for outside
+
+    def cells(self, x, y):
+        world = (x // self.env.stride).astype(np.intp)
+        cells = self.env.flow.cells(x - world * self.env.stride, y)
+        return world * self.size + np.where(cells < 0, self.size - 1, cells)
+
+    def food_arrays(self):
+        env = self.env
+        return env.food_dx.ravel(), env.food_dy.ravel(), env.food_usable.ravel()
+
+    def rest_arrays(self):
+        return self.env.rest_tables
+
+
+class VectorPetEnv:
+    """num_envs independent pet worlds stepped together"""
+
+    def __init__(self, num_envs=64, num_pets=3, width=800, height=600,
+                 episode_ticks=EPISODE_TICKS, seed=None):
+        if np is None:
+            raise ImportError("The training environment needs NumPy: pip install numpy")
+
+        self.num_envs = num_envs
+        self.num_pets = num_pets
+        self.width = width
+        self.height = height
+        self.episode_ticks = episode_ticks
+        self.bounds = (25, 25, width - 25, height - 150)
+        self.rng = np.random.default_rng(seed)
+
+        # One FlowFields works out every world's fields in turn: worlds sit
+        # stride apart so no pet ever heads for something in another world
+        self.flow = arena_flow(width, height, self.bounds)
+        self.stride = 3 * width + height
+        self.tables = _SideBySide(self)
+        self.rest_tables = tuple(np.tile(array, num_envs) for array in self.flow.rest_arrays())
+        self.food_dx = np.zeros((num_envs, self.tables.size))
+        self.food_dy = np.zeros((num_envs, self.tables.size))
+        self.food_usable = np.zeros((num_envs, self.tables.size), dtype=bool)
+        self.food_stale = np.ones(num_envs, dtype=bool)
+
+        # Food comes from a FoodSpawner per world; slots for as much as it allows
+        self.spawners = [None] * num_envs
+        self.next_spawn = np.zeros(num_envs)
+        self.max_food = sum(region.cap for region in default_food_spawner(width, height).regions)
+
+        shape = (num_envs, num_pets)
+        self.x = np.zeros(shape)
+        self.y = np.zeros(shape)
+        self.hunger = np.zeros(shape)
+        self.energy = np.zeros(shape)
+        self.happiness = np.zeros(shape)
+        self.food_x = np.zeros((num_envs, self.max_food))
+        self.food_y = np.zeros((num_envs, self.max_food))
+        self.food_alive = np.zeros((num_envs, self.max_food), dtype=bool)
+        self.food_expires = np.zeros((num_envs, self.max_food), dtype=np.int64)
+        self.food_region = np.zeros((num_envs, self.max_food), dtype=np.int64)
+        self.ticks = np.zeros(num_envs, dtype=np.int64)
+        self.not_self = ~np.eye(num_pets, dtype=bool)
+
+    def reset(self, seed=None):
+        """Start every world over; returns the first observations"""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        return self.observe()
+
+    def _reset_envs(self, which):
+        """Fresh pets and no food in the chosen worlds"""
+        count = int(which.sum())
+        if count == 0:
+            return
+        rng = self.rng
+        shape = (count, self.num_pets)
+        min_x, min_y, max_x, max_y = self.bounds
+        # Starting stats like the three starter pets
+        self.x[which] = rng.uniform(min_x, max_x, shape)
+        self.y[which] = rng.uniform(min_y, max_y, shape)
+        self.hunger[which] = rng.uniform(20, 40, shape)
+        self.energy[which] = rng.uniform(70, 90, shape)
+        self.happiness[which] = rng.uniform(60, 80, shape)
+        self.food_alive[which] = False
+        self.food_stale[which] = True
+        self.ticks[which] = 0
+        for env in np.flatnonzero(which).tolist():
+            spawner = self.spawners[env] = default_food_spawner(self.width, self.height,
+                                                                int(rng.integers(1 << 32)))
+            self.next_spawn[env] = spawner.next_tick
+
+    def _nearest(self, target_x, target_y, allowed):
+        """Position of each pet's nearest allowed target, and whether it has one.
+
+        target_x and target_y are (envs, targets); allowed is
+        (envs, pets, targets).
+        """
+        dx = target_x[:, None, :] - self.x[:, :, None]
+        dy = target_y[:, None, :] - self.y[:, :, None]
+        distance = np.where(allowed, dx * dx + dy * dy, np.inf)
+        nearest = distance.argmin(axis=2)
+        found = np.take_along_axis(distance, nearest[:, :, None], axis=2)[:, :, 0] < np.inf
+        return (np.take_along_axis(target_x, nearest, axis=1),
+                np.take_along_axis(target_y, nearest, axis=1), found)
+
+    def _spawn(self, env):
+        """Add the food world env's spawner has due this tick"""
+        spawner = self.spawners[env]
+        tick = int(self.ticks[env])
+        for region, x, y, lifetime in spawner.due(tick):
+            slot = int(np.argmin(self.food_alive[env]))  # The caps keep a slot free
+            self.food_x[env, slot] = x
+            self.food_y[env, slot] = y
+            self.food_alive[env, slot] = True
+            self.food_expires[env, slot] = tick + (lifetime if lifetime is not None else FOOD_LIFETIME) - 1
+            self.food_region[env, slot] = region
+            self.food_stale[env] = True
+        self.next_spawn[env] = spawner.next_tick
+
+    def _remove_food(self, gone):
+        """Take eaten or spoiled food out, (envs, slots) bool"""
+        for env, slot in zip(*np.nonzero(gone)):
+            self.spawners[env].release(int(self.food_region[env, slot]))
+        self.food_alive &= ~gone
+        self.food_stale |= gone.any(axis=1)
+
+    def _moves(self, actions):
+        """Every pet's step for its goal, as (dx, dy) with pet_moves.act()"""
+        num_envs, num_pets = self.num_envs, self.num_pets
+        flow = self.flow
+
+        # Food fields that changed and someone is about to follow
+        for env in np.flatnonzero(self.food_stale & (actions == FIND_FOOD).any(axis=1)).tolist():
+            alive = self.food_alive[env]
+            flow.set_food(zip(self.food_x[env, alive].tolist(), self.food_y[env, alive].tolist()))
+            self.food_dx[env], self.food_dy[env], self.food_usable[env] = flow.food_arrays()
+            self.food_stale[env] = False
+
+        # Pets with nothing to head for in their own world stand still, as
+        # they would in a PetWorld of their own
+        needy = needy_mask(self.hunger, self.happiness)
+        happy = self.happiness > 50
+        stuck = (((actions == FIND_FOOD) & ~self.food_alive.any(axis=1, keepdims=True))
+                 | ((actions == HELP_FRIEND) & (needy.sum(axis=1, keepdims=True) - needy == 0))
+                 | ((actions == SOCIALIZE) & (happy.sum(axis=1, keepdims=True) - happy == 0)))
+        codes = np.where(stuck, -1, actions).ravel()
+
+        offset = self.stride * np.arange(num_envs)
+        x = (self.x + offset[:, None]).ravel()
+        y = self.y.ravel()
+        food_x = (self.food_x + offset[:, None])[self.food_alive]
+        food_y = self.food_y[self.food_alive]
+        dx, dy, _ = act(codes, x, y, self.tables, food_x, food_y,
+                        (x, y, self.hunger.ravel(), self.happiness.ravel(), np.arange(len(x))))
+
+        exploring = codes == EXPLORE
+        dx[exploring] = self.rng.integers(-2, 3, int(exploring.sum()))
+        dy[exploring] = self.rng.integers(-2, 3, int(exploring.sum()))
+        return dx.reshape(num_envs, num_pets), dy.reshape(num_envs, num_pets)
+
+    def step(self, actions):
+        """Apply one goal per pet; returns (obs, reward, done, info).
+
+        Worlds that reach episode_ticks are reset straight away, so obs
+        for those is already the start of the next episode.
+        """
+        actions = np.asarray(actions)
+        num_pets = self.num_pets
+        before = self.happiness.copy()
+
+        # Food arrives when each world's spawner says so
+        for env in np.flatnonzero(self.next_spawn < self.ticks + 1).tolist():
+            self._spawn(env)
+
+        # Work out each goal's movement from the start-of-tick state
+        dx, dy = self._moves(actions)
+
+        # Move, get hungry, rest or tire
+        min_x, min_y, max_x, max_y = self.bounds
+        np.clip(self.x + dx, min_x, max_x, out=self.x)
+        np.clip(self.y + dy, min_y, max_y, out=self.y)
+        np.minimum(self.hunger + 0.1, 100, out=self.hunger)
+        np.clip(self.energy + np.where(actions == REST, 1.0, -0.05), 0, 100, out=self.energy)
+
+        # Each food item goes to the first pet within reach
+        to_x = self.food_x[:, None, :] - self.x[:, :, None]
+        to_y = self.food_y[:, None, :] - self.y[:, :, None]
+        reach = (to_x * to_x + to_y * to_y < EAT_RADIUS ** 2) & self.food_alive[:, None, :]
+        eaten = reach.any(axis=1)
+        eater = reach.argmax(axis=1)
+        meals = ((eater[:, None, :] == np.arange(num_pets)[None, :, None]) & eaten[:, None, :]).sum(axis=2)
+        np.maximum(self.hunger - 30 * meals, 0, out=self.hunger)
+        np.minimum(self.happiness + 10 * meals, 100, out=self.happiness)
+        self._remove_food(eaten)
+
+        # Friends within reach cheer each other up
+        apart_x = self.x[:, :, None] - self.x[:, None, :]
+        apart_y = self.y[:, :, None] - self.y[:, None, :]
+        friends = ((apart_x * apart_x + apart_y * apart_y < SOCIAL_RADIUS ** 2) & self.not_self).sum(axis=2)
+        np.minimum(self.happiness + 1.0 * friends, 100, out=self.happiness)
+
+        # Old food spoils
+        self._remove_food(self.food_alive & (self.food_expires <= self.ticks[:, None]))
+        self.ticks += 1
+
+        reward = self.happiness - before
+        done = self.ticks >= self.episode_ticks
+        info = {'meals': meals, 'episode_ticks': self.ticks.copy()}
+        self._reset_envs(done)
+        return self.observe(), reward, done, info
+
+    def observe(self):
+        """(num_envs, num_pets, OBS_SIZE) float32 observations, see OBS_FIELDS"""
+        food_x, food_y, food_visible = self._nearest(
+            self.food_x, self.food_y,
+            np.broadcast_to(self.food_alive[:, None, :], (self.num_envs, self.num_pets, self.max_food)))
+        needy = needy_mask(self.hunger, self.happiness)
+        obs = np.empty((self.num_envs, self.num_pets, OBS_SIZE), dtype=np.float32)
+        obs[..., 0] = self.hunger / 100
+        obs[..., 1] = self.energy / 100
+        obs[..., 2] = self.happiness / 100
+        obs[..., 3] = self.x / self.width
+        obs[..., 4] = self.y / self.height
+        obs[..., 5] = np.where(food_visible, (food_x - self.x) / self.width, 0)
+        obs[..., 6] = np.where(food_visible, (food_y - self.y) / self.height, 0)
+        obs[..., 7] = food_visible
+        obs[..., 8] = (needy.sum(axis=1, keepdims=True) - needy) / max(1, self.num_pets - 1)
+        return obs
+
+    def policy_actions(self, weights):
+        """What PetAI.think() would choose for every pet, as a baseline.
+
+        weights is (num_pets, 5) or (num_envs, num_pets, 5) personality
+        weights, like pet_policy.compile_policy() returns.
+        """
+        weights = np.broadcast_to(weights, (self.num_envs, self.num_pets, 5)).reshape(-1, 5)
+        needy = needy_mask(self.hunger, self.happiness)
+        needy_friends = needy.sum(axis=1, keepdims=True) - needy
+        codes = decide(weights, self.hunger.ravel(), self.energy.ravel(),
+                       self.happiness.ravel(), needy_friends.ravel())
+        return codes.reshape(self.num_envs, self.num_pets)
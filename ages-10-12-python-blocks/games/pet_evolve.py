@@ -0,0 +1,196 @@
+# Pet Evolve - breed better PetAI personalities
+# Tries whole populations of personality weights in headless worlds (see
+# pet_env.py), keeps the best, mutates them and tries again. Batches of
+# candidates are scored in parallel in a process pool, and every
+# generation is saved so a long run can be stopped and picked up again.
+#
+#   result = evolve(generations=20, population=32, fitness='happiness',
+#                   checkpoint='evolve.json')
+#   PetAI('Buddy', result['best_weights'])
+#
+#   python pet_evolve.py --generations 20 --checkpoint evolve.json
+
+import json
+import os
+from multiprocessing import Pool
+
+from pet_arrays import np, PERSONALITY_FIELDS
+from pet_env import VectorPetEnv
+
+# How good a run was, from the averages collected while it ran
+FITNESS = {
+    'happiness': lambda stats: stats['happiness'],    # Average happiness
+    'low_hunger': lambda stats: -stats['hunger'],     # Least hunger over time
+    'balanced': lambda stats: stats['happiness'] - stats['hunger'],
+}
+
+BATCH_SIZE = 8  # Candidates scored together in one VectorPetEnv
+
+
+def weights_to_personality(weights):
+    """A weight vector as the personality dict PetAI expects"""
+    return {field: round(float(weight), 4) for field, weight in zip(PERSONALITY_FIELDS, weights)}
+
+
+def score_batch(task):
+    """Average stats for a batch of weight vectors; runs in a pool worker.
+
+    Every pet in a candidate's worlds shares its personality, and every
+    batch in a generation uses the same scenario seed, so candidates are
+    compared on equal terms whichever worker scores them.
+    """
+    batch, ticks, episodes, num_pets, seed = task
+    batch = np.asarray(batch, dtype=float)
+    env = VectorPetEnv(num_envs=len(batch) * episodes, num_pets=num_pets,
+                       episode_ticks=ticks + 1, seed=seed)
+    env.reset()
+    weights = np.repeat(batch, episodes, axis=0)[:, None, :]
+    happiness = np.zeros(env.num_envs)
+    hunger = np.zeros(env.num_envs)
+    for _ in range(ticks):
+        env.step(env.policy_actions(weights))
+        happiness += env.happiness.mean(axis=1)
+        hunger += env.hunger.mean(axis=1)
+    return {
+        'happiness': (happiness / ticks).reshape(len(batch), episodes).mean(axis=1).tolist(),
+        'hunger': (hunger / ticks).reshape(len(batch), episodes).mean(axis=1).tolist(),
+    }
+
+
+def _save(path, state):
+    # Write then rename, so a crash never leaves half a checkpoint
+    temp = path + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp, path)
+
+
+def evolve(generations=20, population=32, fitness='happiness', ticks=1800, episodes=8,
+           num_pets=3, elite=4, mutation=0.1, processes=None, seed=0, checkpoint=None,
+           resume=True, report=None):
+    """Search for personality weights that score well on fitness.
+
+    Each generation keeps the elite best candidates and fills the rest of
+    the population with mutated copies of the better half. With a
+    checkpoint path the whole search state is saved after every
+    generation and, if resume is true, picked up from there next time
+    (only with the same settings, apart from generations).
+    processes=0 scores everything in this process.
+
+    Returns {'best_weights', 'best_fitness', 'history'}, where history has
+    the best, mean and worst fitness of every generation.
+    """
+    if fitness not in FITNESS:
+        raise ValueError(f"Unknown fitness {fitness!r}: use one of {', '.join(FITNESS)}")
+    for name, value in (('population', population), ('ticks', ticks), ('episodes', episodes),
+                        ('num_pets', num_pets)):
+        if value < 1:
+            raise ValueError(f"{name} must be at least 1, not {value}")
+    if not 0 <= elite <= population:
+        raise ValueError(f"elite must be between 0 and population ({population}), not {elite}")
+    if mutation < 0:
+        raise ValueError(f"mutation must not be negative, not {mutation}")
+
+    # A checkpoint only carries on the search it was saved from
+    settings = {'population': population, 'ticks': ticks, 'episodes': episodes, 'num_pets': num_pets,
+                'elite': elite, 'mutation': mutation, 'seed': seed}
+    state = None
+    if checkpoint and resume and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        if state['fitness'] != fitness:
+            raise ValueError(f"{checkpoint} was a {state['fitness']!r} search, not {fitness!r}")
+        saved = state.get('settings', {})
+        changed = [f"{name} {saved.get(name)!r} -> {value!r}" for name, value in settings.items()
+                   if saved.get(name) != value]
+        if changed:
+            raise ValueError(f"{checkpoint} was saved with other settings ({', '.join(changed)}): "
+                             "use them, or resume=False to start over")
+    if state is None:
+        rng = np.random.default_rng(seed)
+        state = {
+            'fitness': fitness,
+            'settings': settings,
+            'generation': 0,
+            'population': rng.random((population, len(PERSONALITY_FIELDS))).tolist(),
+            'rng': rng.bit_generator.state,
+            'best_weights': None,
+            'best_fitness': None,
+            'history': [],
+        }
+    rng = np.random.default_rng()
+    rng.bit_generator.state = state['rng']
+
+    pool = Pool(processes) if processes != 0 else None
+    try:
+        while state['generation'] < generations:
+            generation = state['generation']
+            candidates = np.array(state['population'])
+
+            # Score the population in fixed-size batches
+            scenario = [seed, generation]
+            tasks = [(candidates[i:i + BATCH_SIZE].tolist(), ticks, episodes, num_pets, scenario)
+                     for i in range(0, len(candidates), BATCH_SIZE)]
+            results = pool.map(score_batch, tasks) if pool is not None else map(score_batch, tasks)
+            stats = {'happiness': [], 'hunger': []}
+            for result in results:
+                for key in stats:
+                    stats[key].extend(result[key])
+            scores = FITNESS[fitness]({key: np.array(value) for key, value in stats.items()})
+
+            order = np.argsort(-scores, kind='stable')
+            if state['best_fitness'] is None or scores[order[0]] > state['best_fitness']:
+                state['best_fitness'] = float(scores[order[0]])
+                state['best_weights'] = weights_to_personality(candidates[order[0]])
+            state['history'].append({
+                'generation': generation,
+                'best': float(scores[order[0]]),
+                'mean': float(scores.mean()),
+                'worst': float(scores[order[-1]]),
+                'happiness': float(np.mean(stats['happiness'])),
+                'hunger': float(np.mean(stats['hunger'])),
+            })
+            if report is not None:
+                report(state['history'][-1])
+
+            # Next generation: the elite as they are, then mutated parents
+            parents = candidates[order[:max(elite, len(candidates) // 2, 1)]]
+            children = parents[rng.integers(0, len(parents), len(candidates) - elite)]
+            children = np.clip(children + rng.normal(0, mutation, children.shape), 0, 1)
+            state['population'] = np.concatenate([candidates[order[:elite]], children]).tolist()
+            state['rng'] = rng.bit_generator.state
+            state['generation'] = generation + 1
+            if checkpoint:
+                _save(checkpoint, state)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return {
+        'best_weights': state['best_weights'],
+        'best_fitness': state['best_fitness'],
+        'history': state['history'],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Evolve PetAI personality weights")
+    parser.add_argument('--generations', type=int, default=20)
+    parser.add_argument('--population', type=int, default=32)
+    parser.add_argument('--fitness', choices=sorted(FITNESS), default='happiness')
+    parser.add_argument('--ticks', type=int, default=1800, help="ticks per simulated run")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (0 = none)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint', help="save progress here and resume from it")
+    args = parser.parse_args()
+
+    def report(entry):
+        print(f"🧬 Generation {entry['generation']}: best {entry['best']:.2f}, "
+              f"mean {entry['mean']:.2f}, worst {entry['worst']:.2f}")
+
+    result = evolve(generations=args.generations, population=args.population, fitness=args.fitness,
+                    ticks=args.ticks, processes=args.processes, seed=args.seed,
+                    checkpoint=args.checkpoint, report=report)
+    print(f"🏆 Best fitness {result['best_fitness']:.2f} with {result['best_weights']}")
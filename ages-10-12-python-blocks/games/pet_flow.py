@@ -0,0 +1,280 @@
+# Pet Flow - shared "which way do I go?" maps for the pet simulation
+# Instead of every pet working out its own route, the arena is split into
+# cells and one distance map per goal is worked out for everybody. A pet
+# then just looks up the arrow in the cell it is standing in.
+#
+#   flow = FlowFields(800, 600)
+#   flow.add_obstacle(300, 100, 320, 400)   # A wall
+#   flow.set_food([(120, 80)])
+#   flow.food_move(500, 300)                # -> {'dx': -2, 'dy': 0} or similar
+
+import heapq
+import math
+
+from pet_arrays import np
+
+FLOW_CELL_SIZE = 20
+FLOW_MAX_CELLS = 4800    # Bigger maps get coarser flow field cells
+
+# Step costs: straight moves cost 2, diagonal ones 3 (close to 2 * sqrt(2))
+_STEPS = [(dx, dy, 3 if dx and dy else 2)
+          for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+# The movement each arrow stands for, at PetAI.move_toward()'s speed of 2
+_MOVES = {(dx, dy): {'dx': int(dx / (dx*dx + dy*dy) ** 0.5 * 2), 'dy': int(dy / (dx*dx + dy*dy) ** 0.5 * 2)}
+          for dx, dy, _ in _STEPS}
+_STAY = {'dx': 0, 'dy': 0}
+_STEP_MOVES = [_MOVES[dx, dy] for dx, dy, _ in _STEPS]
+
+
+class FlowField:
+    """Distance to the nearest source from every cell, plus a downhill arrow"""
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.distance = [None] * (columns * rows)  # None means unreachable
+        self.moves = [None] * (columns * rows)
+        self.arrays = None  # moves as NumPy arrays, made when first asked for
+
+    def build(self, sources, blocked):
+        """Dijkstra out from every source cell at once"""
+        if np is not None:
+            self._build_arrays(sources, blocked)
+            return
+        columns, rows = self.columns, self.rows
+        distance = [None] * (columns * rows)
+        heap = []
+        for cell in sources:
+            if not blocked[cell] and distance[cell] is None:
+                distance[cell] = 0
+                heap.append((0, cell))
+        heapq.heapify(heap)
+
+        while heap:
+            cost, cell = heapq.heappop(heap)
+            if cost != distance[cell]:
+                continue  # Already reached more cheaply
+            cx, cy = cell % columns, cell // columns
+            for dx, dy, step in _STEPS:
+                nx, ny = cx + dx, cy + dy
+                if not (0 <= nx < columns and 0 <= ny < rows):
+                    continue
+                neighbour = ny * columns + nx
+                # No squeezing diagonally between two blocked cells
+                if blocked[neighbour] or (dx and dy and (blocked[cy * columns + nx] or blocked[ny * columns + cx])):
+                    continue
+                if distance[neighbour] is None or cost + step < distance[neighbour]:
+                    distance[neighbour] = cost + step
+                    heapq.heappush(heap, (cost + step, neighbour))
+
+        # Each cell's arrow points at its cheapest neighbour
+        moves = [None] * (columns * rows)
+        for cell, cost in enumerate(distance):
+            if cost is None:
+                continue
+            if cost == 0:
+                moves[cell] = _STAY
+                continue
+            cx, cy = cell % columns, cell // columns
+            best = None
+            for dx, dy, step in _STEPS:
+                nx, ny = cx + dx, cy + dy
+                if not (0 <= nx < columns and 0 <= ny < rows):
+                    continue
+                neighbour = ny * columns + nx
+                if distance[neighbour] is not None and distance[neighbour] + step == cost:
+                    best = (dx, dy)
+                    if not (dx and dy):
+                        break  # Prefer straight moves when there is a choice
+            moves[cell] = _MOVES[best]
+
+        self.distance = distance
+        self.moves = moves
+        self.arrays = None
+
+    def _build_arrays(self, sources, blocked):
+        """build() with NumPy: the same distances and arrows for every cell at once.
+
+        Instead of a heap, every cell keeps taking its cheapest neighbour's
+        distance plus the step until nothing changes, which needs about as
+        many rounds as the longest path is long.
+        """
+        columns, rows = self.columns, self.rows
+        unreached = np.iinfo(np.int64).max // 2
+
+        # One cell of padding all round, so every neighbour is a shifted slice
+        open_cells = np.zeros((rows + 2, columns + 2), dtype=bool)
+        open_cells[1:-1, 1:-1] = ~np.array(blocked, dtype=bool).reshape(rows, columns)
+        padded = np.full((rows + 2, columns + 2), unreached, dtype=np.int64)
+        distance = padded[1:-1, 1:-1]
+        sources = np.array(list(sources), dtype=np.intp)
+        sources = sources[open_cells[1:-1, 1:-1].ravel()[sources]] if len(sources) else sources
+        distance[sources // columns, sources % columns] = 0
+
+        def neighbours(array, dx, dy):
+            return array[1 + dy:rows + 1 + dy, 1 + dx:columns + 1 + dx]
+
+        # No squeezing diagonally between two blocked cells
+        steps = []
+        for dx, dy, step in _STEPS:
+            allowed = open_cells[1:-1, 1:-1].copy()
+            if dx and dy:
+                allowed &= neighbours(open_cells, dx, 0) & neighbours(open_cells, 0, dy)
+            steps.append((dx, dy, step, allowed))
+        while True:
+            relaxed = distance.copy()
+            for dx, dy, step, allowed in steps:
+                np.minimum(relaxed, np.where(allowed, neighbours(padded, dx, dy) + step, unreached), out=relaxed)
+            if np.array_equal(relaxed, distance):
+                break
+            distance[...] = relaxed
+
+        # Each cell's arrow points at its cheapest neighbour: the first
+        # straight one in _STEPS order, else the last diagonal one
+        choice = np.full((rows, columns), -1)
+        straight = np.zeros((rows, columns), dtype=bool)
+        for index, (dx, dy, step) in enumerate(_STEPS):
+            match = (neighbours(padded, dx, dy) + step == distance) & ~straight
+            choice[match] = index
+            if not (dx and dy):
+                straight |= match
+        choice[distance == 0] = len(_STEPS)
+
+        moves = _STEP_MOVES + [_STAY, None]
+        self.distance = [cost if cost < unreached else None for cost in distance.ravel().tolist()]
+        self.moves = [moves[index] for index in choice.ravel().tolist()]
+        self.arrays = None
+
+    def move_arrays(self, stay=True):
+        """(dx, dy, usable) arrays with one entry per cell plus an unusable one at the end.
+
+        usable is False where there is no arrow, and also in source cells
+        unless stay is True. Index them with FlowFields.cells().
+        """
+        if self.arrays is None or self.arrays[0] != stay:
+            moves = self.moves + [None]
+            usable = np.array([move is not None and (stay or move is not _STAY) for move in moves])
+            dx = np.array([move['dx'] if move is not None else 0 for move in moves], dtype=float)
+            dy = np.array([move['dy'] if move is not None else 0 for move in moves], dtype=float)
+            self.arrays = (stay, dx, dy, usable)
+        return self.arrays[1:]
+
+
+class FlowFields:
+    """The 'find_food' and 'rest' flow fields for one arena.
+
+    Each field is rebuilt only when what it depends on changes: the food
+    field when food appears or goes, both fields when obstacles change.
+    Rebuilding waits until a pet next asks for directions.
+    """
+
+    def __init__(self, width, height, rest_spots=None, cell_size=FLOW_CELL_SIZE):
+        self.cell_size = cell_size
+        self.columns = -(-width // cell_size)
+        self.rows = -(-height // cell_size)
+        self.blocked = [False] * (self.columns * self.rows)
+        self._blocked_array = None
+        self.obstacles = []
+        if rest_spots is None:
+            rest_spots = [(50, 50), (width - 50, 50), (50, height - 50), (width - 50, height - 50)]
+        self.rest_spots = rest_spots
+        self.food_spots = []
+        self.food = FlowField(self.columns, self.rows)
+        self.rest = FlowField(self.columns, self.rows)
+        self.food_stale = True
+        self.rest_stale = True
+
+    def cell(self, x, y):
+        """Index of the cell holding (x, y), or None outside the arena"""
+        cx, cy = int(x // self.cell_size), int(y // self.cell_size)
+        if 0 <= cx < self.columns and 0 <= cy < self.rows:
+            return cy * self.columns + cx
+        return None
+
+    def cells(self, x, y):
+        """cell() for arrays of positions, with -1 outside the arena"""
+        cx = (x // self.cell_size).astype(np.intp)
+        cy = (y // self.cell_size).astype(np.intp)
+        inside = (cx >= 0) & (cx < self.columns) & (cy >= 0) & (cy < self.rows)
+        return np.where(inside, cy * self.columns + cx, -1)
+
+    def is_blocked(self, x, y):
+        cell = self.cell(x, y)
+        return cell is None or self.blocked[cell]
+
+    def blocked_array(self):
+        """blocked as a NumPy array with a blocked entry at the end for cells() == -1"""
+        if self._blocked_array is None:
+            self._blocked_array = np.array(self.blocked + [True])
+        return self._blocked_array
+
+    def add_obstacle(self, x0, y0, x1, y1):
+        """Block every cell the rectangle touches"""
+        self.obstacles.append((x0, y0, x1, y1))
+        size = self.cell_size
+        for cy in range(max(0, int(y0 // size)), min(self.rows, int(y1 // size) + 1)):
+            for cx in range(max(0, int(x0 // size)), min(self.columns, int(x1 // size) + 1)):
+                self.blocked[cy * self.columns + cx] = True
+        self._blocked_array = None
+        self.food_stale = self.rest_stale = True
+
+    def set_food(self, spots):
+        """Where the food is now, as (x, y) pairs"""
+        self.food_spots = list(spots)
+        self.food_stale = True
+
+    def _sources(self, spots):
+        cells = (self.cell(x, y) for x, y in spots)
+        return [cell for cell in cells if cell is not None]
+
+    def update(self):
+        """Rebuild whichever fields are out of date"""
+        if self.food_stale:
+            self.food.build(self._sources(self.food_spots), self.blocked)
+            self.food_stale = False
+        if self.rest_stale:
+            self.rest.build(self._sources(self.rest_spots), self.blocked)
+            self.rest_stale = False
+
+    def food_move(self, x, y):
+        """Movement toward the nearest food, or None if there is none to reach.
+
+        Also None in a cell with food in it, where the food is best walked
+        to directly (with big cells it can still be far off).
+        """
+        self.update()
+        cell = self.cell(x, y)
+        if cell is None:
+            return None
+        move = self.food.moves[cell]
+        return move if move is not _STAY else None
+
+    def rest_move(self, x, y):
+        """Movement toward the nearest resting spot"""
+        self.update()
+        cell = self.cell(x, y)
+        return self.rest.moves[cell] if cell is not None else None
+
+    def food_arrays(self):
+        """food_move() for every cell as move_arrays(); usable where it is not None"""
+        self.update()
+        return self.food.move_arrays(stay=False)
+
+    def rest_arrays(self):
+        """rest_move() for every cell as move_arrays()"""
+        self.update()
+        return self.rest.move_arrays()
+
+
+def arena_flow(width, height, bounds):
+    """FlowFields for a pet arena, resting in the corners of bounds.
+
+    bounds is where pet centres may go, as (min_x, min_y, max_x, max_y);
+    big arenas get cells big enough to keep to about FLOW_MAX_CELLS.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    cell_size = max(FLOW_CELL_SIZE, math.ceil(math.sqrt(width * height / FLOW_MAX_CELLS)))
+    return FlowFields(width, height, cell_size=cell_size, rest_spots=[
+        (min_x + 25, min_y + 25), (max_x - 25, min_y + 25),
+        (min_x + 25, max_y - 25), (max_x - 25, max_y - 25)])
@@ -0,0 +1,608 @@
+# Pet History - save, load and rewind a PetWorld
+# Every few seconds the whole world is packed into a binary checkpoint;
+# in between, each tick is stored as a delta of only what changed, plus
+# the commands (food dropped, code panel toggled...) that came before it.
+# A History keeps as much of that as fits in its memory budget,
+# forgetting the oldest seconds first, so students can rewind and watch
+# what their AI did a moment ago.
+#
+#   history = History(world, budget_bytes=32 << 20)
+#   world.step(600)
+#   history.rewind(world.tick - 120)            # Two seconds back
+#   history.save('pets.pethist')
+#   history = History.load('pets.pethist')      # history.world is at the last tick
+#
+# Rewinding goes back to the checkpoint before and runs the ticks since
+# then again with the same commands, so the world carries on exactly as
+# it did the first time. world_at(tick, exact=False) applies the deltas
+# instead, which is quicker for big worlds but only good for looking:
+# random streams, pet memories and food timing come from the checkpoint.
+#
+# Checkpoints and files hold plain numbers and JSON only, so loading a
+# history someone sent you cannot run any code.
+
+import json
+import mmap
+import os
+import random
+import struct
+import zlib
+from array import array
+
+from pet_arrays import STAT_FIELDS, np
+from pet_memory import PetMemory
+from pet_policy import GOALS, GOAL_CODES
+from pet_scheduling import AIScheduler, FoodSpawner, SpawnRegion
+from pet_world import PetAI, PetWorld
+
+CHECKPOINT_EVERY = 300     # Ticks between full checkpoints (5 seconds)
+HISTORY_BUDGET = 32 << 20  # Bytes of checkpoints and deltas kept by default
+
+CHECKPOINT_MAGIC = b'PETCKPT2'
+FILE_MAGIC = b'PETHIST2'
+
+# Checkpoint header: magic, tick, pets, dict backend?, meta bytes, array bytes
+_CHECKPOINT = struct.Struct('<8sIIBII')
+# Delta header: tick, field records, bytes of food/message/code changes
+_DELTA = struct.Struct('<IHI')
+# Delta field record: field number, flags, pets changed
+_FIELD = struct.Struct('<BBI')
+EVERY_PET, HAS_INTS = 1, 2
+GOAL_FIELD = len(STAT_FIELDS)
+# File index entry: first tick, offset, checkpoint bytes, deltas
+_INDEX = struct.Struct('<IQQI')
+_FOOTER = struct.Struct('<QI')
+
+# Words in a random.Random state (Mersenne Twister), as in getstate()
+_RNG_WORDS = 625
+# PetMemory arrays saved in checkpoints, and how
+_MEMORY_ARRAYS = (('ticks', '<i8'), ('kinds', 'i1'), ('xs', '<f4'), ('ys', '<f4'),
+                  ('partner_ids', '<i4'), ('previous', '<i8'))
+
+
+def _capture(world):
+    """What deltas compare: pet columns and goals, food, messages, code panel"""
+    if world.backend == 'numpy':
+        arrays = world.pets.arrays
+        names = list(arrays.names)
+        columns = {field: getattr(arrays, field).copy() for field in STAT_FIELDS}
+        ints = None  # The arrays only hold floats
+        ais = arrays.ais
+    else:
+        # Dict pets can hold ints or floats, and replays need to tell them apart
+        pets = list(world.pets.values())
+        names = list(world.pets)
+        columns = {field: np.array([pet[field] for pet in pets], dtype=float) for field in STAT_FIELDS}
+        ints = {field: np.array([type(pet[field]) is int for pet in pets], dtype=bool) for field in STAT_FIELDS}
+        ais = [pet['ai'] for pet in pets]
+    return {
+        'names': names,
+        'columns': columns,
+        'ints': ints,
+        'goals': np.array([GOAL_CODES.get(ai.current_goal, -1) for ai in ais], dtype=np.int8),
+        'food': [[food['id'], food['x'], food['y'], food['expires'], food['region']] for food in world.food_items],
+        'messages': [[message['text'], message['expires']] for message in world.messages],
+        'code': [world.show_code, world.current_code, world.next_code_display, world._code_turn],
+        'obstacles': len(world.obstacles),
+    }
+
+
+def _ais(world):
+    if world.backend == 'numpy':
+        return world.pets.arrays.ais
+    return [pet['ai'] for pet in world.pets.values()]
+
+
+def _pack_arrays(arrays):
+    """Named NumPy arrays as ([name, dtype, length] list, bytes)"""
+    layout = [[name, values.dtype.str, len(values)] for name, values in arrays.items()]
+    return layout, b''.join(values.tobytes() for values in arrays.values())
+
+
+def _unpack_arrays(layout, data):
+    arrays = {}
+    offset = 0
+    for name, dtype, length in layout:
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=length, offset=offset)
+        offset += arrays[name].nbytes
+    return arrays
+
+
+def _rng_states(rngs):
+    """random.Random states as JSON-able [version, gauss_next] pairs and one array of words"""
+    pairs = []
+    words = []
+    for rng in rngs:
+        version, internal, gauss_next = rng.getstate()
+        pairs.append([version, gauss_next])
+        words.extend(internal)
+    return pairs, np.array(words, dtype='<u4')
+
+
+def _set_rng_states(rngs, pairs, words):
+    for i, (rng, (version, gauss_next)) in enumerate(zip(rngs, pairs)):
+        rng.setstate((version, tuple(words[i * _RNG_WORDS:(i + 1) * _RNG_WORDS].tolist()), gauss_next))
+
+
+def pack_checkpoint(world, state=None):
+    """Everything about a world at its current tick, as bytes"""
+    scheduler = world.ai_scheduler
+    if scheduler.budget is not None:
+        raise ValueError("A thinking-time budget depends on the clock, so its world cannot be replayed")
+    if state is None:
+        state = _capture(world)
+    count = len(state['names'])
+    pets = world.pets.values()
+    ais = _ais(world)
+    spawner = world.food_spawner
+    own_rngs = [slot for slot, ai in enumerate(ais) if ai.rng is not None]
+    rngs, rng_words = _rng_states([world.rng, spawner.rng] + [ais[slot].rng for slot in own_rngs])
+    meta = {
+        'width': world.width,
+        'height': world.height,
+        'backend': world.backend,
+        'seed': world.seed,
+        'pet_rngs': world.pet_rngs,
+        'obstacles': [list(obstacle) for obstacle in world.obstacles],
+        'focus': world.focus,
+        'next_food_id': world._next_food_id,
+        'names': state['names'],
+        'colors': [list(pet['color']) for pet in pets],
+        'personalities': [ai.personality for ai in ais],
+        'food': state['food'],
+        'messages': state['messages'],
+        'code': state['code'],
+        # Simulation internals: random streams, timers and pet memories
+        'rngs': rngs,
+        'own_rngs': own_rngs,
+        'spawner': {
+            'regions': [[list(region.x_range), list(region.y_range), region.rate, region.cap,
+                         region.lifetime, region.count] for region in spawner.regions],
+            'arrivals': [list(arrival) for arrival in spawner.arrivals],
+        },
+        'scheduler': {
+            'period': scheduler.period,
+            'phases': list(scheduler.phases.items()),
+            'urgent': list(scheduler.urgent),
+            'postponed': list(scheduler.postponed),
+        },
+        'partners': world.partners.names,
+        'memories': [[ai.memory.capacity, ai.memory.count, list(ai.memory.latest)] for ai in ais],
+    }
+    arrays = {'rngs': rng_words}
+    for field, dtype in _MEMORY_ARRAYS:
+        arrays['memory_' + field] = np.concatenate(
+            [np.array(getattr(ai.memory, field)[:len(ai.memory)], dtype=dtype) for ai in ais] or
+            [np.zeros(0, dtype=dtype)])
+    if world.backend == 'numpy':
+        # Far-away pets' last steps, kept in the arrays instead of PetAI.last_move
+        arrays['last_dx'] = world.pets.arrays.last_dx.astype('<f8')
+        arrays['last_dy'] = world.pets.arrays.last_dy.astype('<f8')
+    else:
+        meta['last_moves'] = [ai.last_move for ai in ais]
+    meta['arrays'], array_bytes = _pack_arrays(arrays)
+    meta = zlib.compress(json.dumps(meta).encode('utf-8'))
+    array_bytes = zlib.compress(array_bytes)
+
+    parts = [_CHECKPOINT.pack(CHECKPOINT_MAGIC, world.tick, count, state['ints'] is not None, len(meta),
+                              len(array_bytes))]
+    parts.extend(state['columns'][field].astype('<f8').tobytes() for field in STAT_FIELDS)
+    parts.append(state['goals'].tobytes())
+    if state['ints'] is not None:
+        parts.extend(np.packbits(state['ints'][field]).tobytes() for field in STAT_FIELDS)
+    parts.append(meta)
+    parts.append(array_bytes)
+    return b''.join(parts)
+
+
+def _put_food(world, food_id, x, y, expires, region):
+    """Put a food item back without the side effects of add_food()"""
+    world.food[food_id] = {'id': food_id, 'x': x, 'y': y, 'region': region, 'expires': expires}
+    world._food_grid.insert(food_id, x, y)
+    world._food_expiry.schedule(food_id, expires)
+
+
+def _restore_memories(world, meta, arrays):
+    """Every pet's PetMemory, with partner ids from world.partners"""
+    for name in meta['partners']:
+        world.partners.id(name)  # Same ids as when saved: the table starts empty
+    offset = 0
+    for ai, (capacity, count, latest) in zip(_ais(world), meta['memories']):
+        memory = PetMemory(capacity, names=world.partners)
+        used = min(count, capacity)
+        for field, _ in _MEMORY_ARRAYS:
+            column = getattr(memory, field)
+            column[:used] = array(column.typecode, arrays['memory_' + field][offset:offset + used].tolist())
+        memory.latest = array('q', latest)
+        memory.count = count
+        ai.memory = memory
+        offset += used
+
+
+def world_from_checkpoint(data):
+    """A new PetWorld exactly as a checkpoint saw it"""
+    magic, tick, count, has_ints, meta_size, array_size = _CHECKPOINT.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError("Not a pet world checkpoint")
+    offset = _CHECKPOINT.size
+    columns = {}
+    for field in STAT_FIELDS:
+        columns[field] = np.frombuffer(data, dtype='<f8', count=count, offset=offset)
+        offset += 8 * count
+    goals = np.frombuffer(data, dtype=np.int8, count=count, offset=offset)
+    offset += count
+    ints = None
+    if has_ints:
+        ints = {}
+        for field in STAT_FIELDS:
+            packed = np.frombuffer(data, dtype=np.uint8, count=(count + 7) // 8, offset=offset)
+            ints[field] = np.unpackbits(packed, count=count).astype(bool)
+            offset += (count + 7) // 8
+    meta = json.loads(zlib.decompress(data[offset:offset + meta_size]))
+    offset += meta_size
+    arrays = _unpack_arrays(meta['arrays'], zlib.decompress(data[offset:offset + array_size]))
+
+    pets = {}
+    values = {field: columns[field].tolist() for field in STAT_FIELDS}
+    for i, name in enumerate(meta['names']):
+        pet = {field: int(values[field][i]) if ints is not None and ints[field][i] else values[field][i]
+               for field in STAT_FIELDS}
+        pet['color'] = tuple(meta['colors'][i])
+        pet['ai'] = PetAI(name, meta['personalities'][i])
+        pets[name] = pet
+
+    rng = random.Random()
+    world = PetWorld(meta['width'], meta['height'], pets, rng=rng, backend=meta['backend'],
+                     pet_rngs=meta['pet_rngs'])
+    world.seed = meta['seed']
+    for obstacle in meta['obstacles']:
+        world.add_obstacle(*obstacle)
+
+    spawner = world.food_spawner = FoodSpawner()
+    for x_range, y_range, rate, cap, lifetime, region_count in meta['spawner']['regions']:
+        region = SpawnRegion(tuple(x_range), tuple(y_range), rate, cap, lifetime)
+        region.count = region_count
+        spawner.regions.append(region)
+    spawner.arrivals = [tuple(arrival) for arrival in meta['spawner']['arrivals']]
+    saved = meta['scheduler']
+    scheduler = world.ai_scheduler = AIScheduler(saved['period'])
+    scheduler.phases = dict(saved['phases'])
+    scheduler.urgent = dict.fromkeys(saved['urgent'], True)
+    scheduler.postponed = dict.fromkeys(saved['postponed'], True)
+
+    world.tick = tick
+    world.focus = tuple(meta['focus']) if meta['focus'] is not None else None
+    world._next_food_id = meta['next_food_id']
+    world.show_code, world.current_code, world.next_code_display, world._code_turn = meta['code']
+    world.messages.extend({'text': text, 'expires': expires} for text, expires in meta['messages'])
+    for food in meta['food']:
+        _put_food(world, *food)
+    world._food_changed()
+
+    ais = _ais(world)
+    for ai, code in zip(ais, goals.tolist()):
+        ai.current_goal = GOALS[code] if code >= 0 else None
+    for slot in meta['own_rngs']:
+        ais[slot].rng = random.Random()
+    _set_rng_states([rng, spawner.rng] + [ais[slot].rng for slot in meta['own_rngs']], meta['rngs'],
+                    arrays['rngs'])
+    if world.backend == 'numpy':
+        world.pets.arrays.last_dx[:] = arrays['last_dx']
+        world.pets.arrays.last_dy[:] = arrays['last_dy']
+    else:
+        for ai, last_move in zip(ais, meta['last_moves']):
+            ai.last_move = last_move
+    _restore_memories(world, meta, arrays)
+    return world
+
+
+def pack_delta(previous, state, tick, inputs=()):
+    """What changed between two captured states, compressed.
+
+    inputs are the commands given just before the tick, as (name, args,
+    kwargs), for replaying it.
+    """
+    count = len(state['names'])
+    records = []
+    fields = 0
+    for number, field in enumerate(STAT_FIELDS):
+        new, old = state['columns'][field], previous['columns'][field]
+        changed = new != old
+        if state['ints'] is not None:
+            changed |= state['ints'][field] != previous['ints'][field]
+        slots = np.flatnonzero(changed)
+        if not len(slots):
+            continue
+        every = len(slots) == count
+        flags = (EVERY_PET if every else 0) | (HAS_INTS if state['ints'] is not None else 0)
+        records.append(_FIELD.pack(number, flags, len(slots)))
+        fields += 1
+        if not every:
+            records.append(slots.astype('<u4').tobytes())
+        # XOR with the old value: small changes leave mostly zero bytes to compress
+        records.append((new[slots].view('<u8') ^ old[slots].view('<u8')).tobytes())
+        if state['ints'] is not None:
+            records.append(np.packbits(state['ints'][field][slots]).tobytes())
+
+    slots = np.flatnonzero(state['goals'] != previous['goals'])
+    if len(slots):
+        records.append(_FIELD.pack(GOAL_FIELD, 0, len(slots)))
+        fields += 1
+        records.append(slots.astype('<u4').tobytes())
+        records.append(state['goals'][slots].tobytes())
+
+    # Food, messages and the code panel change rarely and are small
+    changes = {}
+    if state['food'] != previous['food']:
+        old_ids = {food[0] for food in previous['food']}
+        new_ids = {food[0] for food in state['food']}
+        changes['eaten'] = [food[0] for food in previous['food'] if food[0] not in new_ids]
+        changes['new_food'] = [food for food in state['food'] if food[0] not in old_ids]
+    if state['messages'] != previous['messages']:
+        changes['messages'] = state['messages']
+    if state['code'] != previous['code']:
+        changes['code'] = state['code']
+    if inputs:
+        changes['inputs'] = [[name, list(args), kwargs] for name, args, kwargs in inputs]
+    extra = json.dumps(changes, default=_plain).encode('utf-8') if changes else b''
+
+    header = _DELTA.pack(tick, fields, len(extra))
+    return zlib.compress(header + b''.join(records) + extra, 1)
+
+
+def _plain(value):
+    # NumPy numbers given to commands
+    return value.item()
+
+
+def _delta_inputs(data):
+    """The commands stored in a delta, as (name, args, kwargs)"""
+    raw = zlib.decompress(data)
+    extra_size = _DELTA.unpack_from(raw)[2]
+    if not extra_size:
+        return []
+    changes = json.loads(raw[len(raw) - extra_size:])
+    return changes.get('inputs', [])
+
+
+def _apply_delta(world, state, data):
+    """Move a world (and its captured state) on by one delta"""
+    raw = zlib.decompress(data)
+    tick, fields, extra_size = _DELTA.unpack_from(raw)
+    offset = _DELTA.size
+    count = len(state['names'])
+    pets = None if world.backend == 'numpy' else list(world.pets.values())
+    for _ in range(fields):
+        number, flags, changed = _FIELD.unpack_from(raw, offset)
+        offset += _FIELD.size
+        if flags & EVERY_PET:
+            slots = np.arange(count)
+        else:
+            slots = np.frombuffer(raw, dtype='<u4', count=changed, offset=offset).astype(np.intp)
+            offset += 4 * changed
+
+        if number == GOAL_FIELD:
+            codes = np.frombuffer(raw, dtype=np.int8, count=changed, offset=offset)
+            offset += changed
+            state['goals'][slots] = codes
+            ais = _ais(world)
+            for slot, code in zip(slots.tolist(), codes.tolist()):
+                ais[slot].current_goal = GOALS[code] if code >= 0 else None
+            continue
+
+        field = STAT_FIELDS[number]
+        column = state['columns'][field]
+        bits = np.frombuffer(raw, dtype='<u8', count=changed, offset=offset)
+        offset += 8 * changed
+        values = (column[slots].view('<u8') ^ bits).view('<f8')
+        column[slots] = values
+        if pets is None:
+            getattr(world.pets.arrays, field)[slots] = values
+            continue
+        packed = np.frombuffer(raw, dtype=np.uint8, count=(changed + 7) // 8, offset=offset)
+        offset += (changed + 7) // 8
+        is_int = np.unpackbits(packed, count=changed).astype(bool)
+        state['ints'][field][slots] = is_int
+        for slot, value, whole in zip(slots.tolist(), values.tolist(), is_int.tolist()):
+            pets[slot][field] = int(value) if whole else value
+
+    changes = json.loads(raw[offset:offset + extra_size]) if extra_size else {}
+    if 'eaten' in changes:
+        for food_id in changes['eaten']:
+            world.remove_food(world.food[food_id])
+        regions = world.food_spawner.regions
+        for food_id, x, y, expires, region in changes['new_food']:
+            _put_food(world, food_id, x, y, expires, region)
+            if region is not None:
+                regions[region].count += 1
+            world._next_food_id = max(world._next_food_id, food_id + 1)
+        world._food_changed()
+    if 'messages' in changes:
+        world.messages.clear()
+        world.messages.extend({'text': text, 'expires': expires} for text, expires in changes['messages'])
+    if 'code' in changes:
+        world.show_code, world.current_code, world.next_code_display, world._code_turn = changes['code']
+    world.tick = tick
+
+
+class History:
+    """Checkpoints and per-tick deltas of one PetWorld, within a memory budget.
+
+    Attaching a History makes a checkpoint straight away, then every tick
+    the world runs is stored as it happens, along with the commands given
+    before it. AIScheduler budgets must be off, since they depend on the
+    clock and could not be run again the same way.
+    """
+
+    def __init__(self, world, budget_bytes=HISTORY_BUDGET, checkpoint_every=CHECKPOINT_EVERY):
+        if np is None:
+            raise ImportError("World history needs NumPy: pip install numpy")
+        self.world = world
+        self.budget_bytes = budget_bytes
+        self.checkpoint_every = checkpoint_every
+        self.segments = []  # [first tick, checkpoint, deltas for the ticks after it], oldest first
+        self.size = 0       # Bytes held in segments
+        self.file = None    # Memory-mapped file the older segments may live in
+        self._state = None
+        self._inputs = []   # Commands given since the last tick
+        self._checkpoint(_capture(world))
+        self._attach()
+
+    def _attach(self):
+        self.world.observers.append(self.record)
+        self.world.input_observers.append(self.note_input)
+
+    def _checkpoint(self, state):
+        data = pack_checkpoint(self.world, state)
+        self.segments.append([self.world.tick, data, []])
+        self.size += len(data)
+        self._state = state
+
+    @property
+    def first_tick(self):
+        return self.segments[0][0]
+
+    @property
+    def last_tick(self):
+        start, _, deltas = self.segments[-1]
+        return start + len(deltas)
+
+    def note_input(self, name, args, kwargs):
+        """Keep a command for the next delta (PetWorld calls this after each one)"""
+        self._inputs.append((name, args, kwargs))
+
+    def record(self, world):
+        """Store the tick that just ran (PetWorld calls this after every tick)"""
+        start, _, deltas = self.segments[-1]
+        state = _capture(world)
+        previous = self._state
+        inputs, self._inputs = self._inputs, []
+        if world.tick - start >= self.checkpoint_every or world.tick != start + len(deltas) + 1 or \
+                state['names'] != previous['names'] or state['obstacles'] != previous['obstacles']:
+            # Time for a checkpoint, or something a delta cannot describe;
+            # the inputs are in the checkpoint already
+            self._checkpoint(state)
+        else:
+            data = pack_delta(previous, state, world.tick, inputs)
+            deltas.append(data)
+            self.size += len(data)
+            self._state = state
+
+        # Forget the oldest seconds once over budget
+        while self.size > self.budget_bytes and len(self.segments) > 1:
+            _, checkpoint, deltas = self.segments.pop(0)
+            self.size -= len(checkpoint) + sum(len(data) for data in deltas)
+
+    def world_at(self, tick, exact=True):
+        """A separate PetWorld as it was at tick.
+
+        The world runs again from the checkpoint before, with the same
+        commands. exact=False applies the stored deltas instead: quicker,
+        and the pets, food, messages and code panel are right, but random
+        streams, memories and food timing are the checkpoint's.
+        """
+        if not self.first_tick <= tick <= self.last_tick:
+            raise ValueError(f"Tick {tick} is not in the history ({self.first_tick}-{self.last_tick})")
+        index = max(i for i, segment in enumerate(self.segments) if segment[0] <= tick)
+        start, checkpoint, deltas = self.segments[index]
+        world = world_from_checkpoint(checkpoint)
+        if exact:
+            for data in deltas[:tick - start]:
+                for name, args, kwargs in _delta_inputs(data):
+                    getattr(world, name)(*args, **kwargs)
+                world.step()
+            return world
+        state = _capture(world)
+        for data in deltas[:tick - start]:
+            _apply_delta(world, state, data)
+        return world
+
+    def rewind(self, tick):
+        """Put the world back as it was at tick; history after it is dropped"""
+        restored = self.world_at(tick)
+        # Swap the old state inside the same world object, so the game and
+        # anything else holding the world sees the rewound one
+        observers, input_observers = self.world.observers, self.world.input_observers
+        vars(self.world).clear()
+        vars(self.world).update(vars(restored))
+        self.world.observers, self.world.input_observers = observers, input_observers
+
+        index = max(i for i, segment in enumerate(self.segments) if segment[0] <= tick)
+        del self.segments[index + 1:]
+        start, _, deltas = self.segments[index]
+        del deltas[tick - start:]
+        self.size = sum(len(checkpoint) + sum(len(data) for data in deltas)
+                        for _, checkpoint, deltas in self.segments)
+        self._state = _capture(self.world)
+        self._inputs = []
+        return self.world
+
+    def save(self, path):
+        """Write the whole history to a file History.load() can map"""
+        index = []
+        # Write then rename: the old file may be the one this history is mapped from
+        temp = path + '.tmp'
+        with open(temp, 'wb') as f:
+            f.write(FILE_MAGIC)
+            for start, checkpoint, deltas in self.segments:
+                index.append((start, f.tell(), len(checkpoint), len(deltas)))
+                f.write(checkpoint)
+                for data in deltas:
+                    f.write(struct.pack('<I', len(data)))
+                    f.write(data)
+            index_offset = f.tell()
+            for entry in index:
+                f.write(_INDEX.pack(*entry))
+            f.write(_FOOTER.pack(index_offset, len(index)))
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path, budget_bytes=HISTORY_BUDGET, checkpoint_every=CHECKPOINT_EVERY):
+        """A History read from a file; its world is at the last saved tick.
+
+        The file is memory-mapped, so only the index and the last
+        checkpoint are read up front: older ticks are read from disk
+        if you rewind to them.
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        if view[:len(FILE_MAGIC)] != FILE_MAGIC:
+            raise ValueError(f"{path} is not a pet world history")
+        index_offset, entries = _FOOTER.unpack_from(view, len(view) - _FOOTER.size)
+
+        segments = []
+        for i in range(entries):
+            start, offset, size, delta_count = _INDEX.unpack_from(view, index_offset + i * _INDEX.size)
+            checkpoint = view[offset:offset + size]
+            offset += size
+            deltas = []
+            for _ in range(delta_count):
+                length = struct.unpack_from('<I', view, offset)[0]
+                deltas.append(view[offset + 4:offset + 4 + length])
+                offset += 4 + length
+            segments.append([start, checkpoint, deltas])
+
+        loaded = cls.__new__(cls)
+        loaded.segments = segments
+        loaded.world = loaded.world_at(loaded.last_tick)
+        loaded.budget_bytes = budget_bytes
+        loaded.checkpoint_every = checkpoint_every
+        loaded.size = sum(len(checkpoint) + sum(len(data) for data in deltas)
+                          for _, checkpoint, deltas in segments)
+        loaded.file = mapped
+        loaded._state = _capture(loaded.world)
+        loaded._inputs = []
+        loaded._attach()
+        return loaded
+
+    def close(self):
+        """Stop recording and let go of any mapped file"""
+        if self.record in self.world.observers:
+            self.world.observers.remove(self.record)
+            self.world.input_observers.remove(self.note_input)
+        self.segments = []
+        self.size = 0
+        if self.file is not None:
+            self.file.close()
+            self.file = None
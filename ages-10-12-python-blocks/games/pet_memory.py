@@ -0,0 +1,142 @@
+# Pet Memory - what a pet remembers, in a fixed amount of space
+# Each PetAI keeps its last few events (meals, friends met) in a ring
+# buffer of plain arrays, so an hour-long game with thousands of pets
+# uses no more memory than the first minute did.
+#
+#   memory = PetMemory(capacity=128)
+#   memory.remember(tick=120, kind=ATE_FOOD, x=300, y=200)
+#   memory.last(ATE_FOOD)                    # -> MemoryRecord(120, 'ate_food', 300.0, 200.0, None)
+#   memory.partners(MET_FRIEND, since=60)    # -> {'Luna', ...}
+
+from array import array
+from collections import namedtuple
+
+EVENT_KINDS = ('ate_food', 'met_friend', 'helped_friend')
+ATE_FOOD, MET_FRIEND, HELPED_FRIEND = range(len(EVENT_KINDS))
+
+MEMORY_CAPACITY = 128
+
+MemoryRecord = namedtuple('MemoryRecord', 'tick kind x y partner')
+
+
+class NameTable:
+    """Pet names as small ints, so a record stores a number, not a string"""
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def id(self, name):
+        if name is None:
+            return -1
+        key = self.ids.get(name)
+        if key is None:
+            key = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return key
+
+    def name(self, key):
+        return self.names[key] if key >= 0 else None
+
+
+class PetMemory:
+    """Ring buffer of (tick, kind, x, y, partner) event records.
+
+    Every record also points at the previous record of the same kind, by
+    sequence number, so "the last meal" or "friends met lately" only
+    visit records of that kind. Record n lives in slot n % capacity until
+    it is overwritten, so anything older than the last capacity records
+    is known to be gone without looking.
+
+    Partners are stored as ids from a NameTable: the memory's own until
+    its pet joins a world, then the one every pet in that world shares.
+    """
+
+    def __init__(self, capacity=MEMORY_CAPACITY, names=None):
+        self.capacity = capacity
+        self.names = names if names is not None else NameTable()
+        self.ticks = array('q', bytes(8 * capacity))
+        self.kinds = array('b', bytes(capacity))
+        self.xs = array('f', bytes(4 * capacity))
+        self.ys = array('f', bytes(4 * capacity))
+        self.partner_ids = array('i', bytes(4 * capacity))
+        self.previous = array('q', bytes(8 * capacity))  # Sequence number of the previous record of this kind
+        self.latest = array('q', [-1] * len(EVENT_KINDS))  # Newest sequence number of each kind
+        self.count = 0  # Records ever written
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def use_names(self, names):
+        """Store partners as ids from another NameTable from now on"""
+        if names is self.names:
+            return
+        for slot in range(len(self)):
+            key = self.partner_ids[slot]
+            if key >= 0:
+                self.partner_ids[slot] = names.id(self.names.name(key))
+        self.names = names
+
+    def remember(self, tick, kind, x, y, partner=None):
+        """Write down an event, forgetting the oldest one if full"""
+        slot = self.count % self.capacity
+        latest = self.latest[kind]
+        self.ticks[slot] = tick
+        self.kinds[slot] = kind
+        self.xs[slot] = x
+        self.ys[slot] = y
+        self.partner_ids[slot] = self.names.id(partner)
+        self.previous[slot] = latest
+        self.latest[kind] = self.count
+        self.count += 1
+
+    def remember_all(self, tick, kinds, x, y, partner_ids):
+        """remember() for several events at the same spot in one go.
+
+        Partners are given as ids in this memory's NameTable (-1 for none),
+        which is how PetWorld(backend='numpy') has them for all its pets.
+        """
+        ticks, all_kinds, xs, ys = self.ticks, self.kinds, self.xs, self.ys
+        partners, previous, latest = self.partner_ids, self.previous, self.latest
+        capacity = self.capacity
+        count = self.count
+        for kind, partner in zip(kinds, partner_ids):
+            slot = count % capacity
+            ticks[slot] = tick
+            all_kinds[slot] = kind
+            xs[slot] = x
+            ys[slot] = y
+            partners[slot] = partner
+            previous[slot] = latest[kind]
+            latest[kind] = count
+            count += 1
+        self.count = count
+
+    def _record(self, slot):
+        return MemoryRecord(self.ticks[slot], EVENT_KINDS[self.kinds[slot]], self.xs[slot],
+                            self.ys[slot], self.names.name(self.partner_ids[slot]))
+
+    def _slots(self, kind, since):
+        """Slots of the kind's records at or after tick since, newest first"""
+        seq = self.latest[kind]
+        oldest = self.count - self.capacity  # Anything older is overwritten
+        while seq >= 0 and seq >= oldest:
+            slot = seq % self.capacity
+            if self.ticks[slot] < since:
+                return
+            yield slot
+            seq = self.previous[slot]
+
+    def last(self, kind):
+        """The newest remembered event of a kind, or None"""
+        for slot in self._slots(kind, since=0):
+            return self._record(slot)
+        return None
+
+    def recent(self, kind, since=0):
+        """Events of a kind from tick since onwards, newest first"""
+        return [self._record(slot) for slot in self._slots(kind, since)]
+
+    def partners(self, kind, since=0):
+        """Names of the pets involved in a kind of event since a tick"""
+        return {self.names.name(self.partner_ids[slot]) for slot in self._slots(kind, since)}
@@ -0,0 +1,78 @@
+# Pet Moves - PetAI.execute_action() for a whole population at once
+# pet_policy.py picks every pet's goal in one go; this works out every
+# pet's step for its goal the same way, with the shared flow fields for
+# food and rest and batched nearest-target searches for friends, so big
+# worlds need no Python loop over their pets. PetWorld(backend='numpy')
+# and ShardedWorld both move their pets with it.
+#
+#   dx, dy, done = act(codes, x, y, flow, food_x, food_y, (x, y, hunger, happiness, me))
+#   # Pets not done are explorers (and a few lost pets) for the caller to move
+
+from pet_arrays import np
+from pet_policy import FIND_FOOD, REST, HELP_FRIEND, SOCIALIZE, needy_mask
+from pet_spatial import nearest_points
+
+
+def move_toward(x, y, target_x, target_y):
+    """PetAI.move_toward() for arrays of pets and targets, as (dx, dy)"""
+    to_x = target_x - x
+    to_y = target_y - y
+    distance = np.sqrt(to_x * to_x + to_y * to_y)
+    moving = distance > 0
+    safe = np.where(moving, distance, 1)
+    return np.where(moving, np.trunc(to_x / safe * 2), 0), np.where(moving, np.trunc(to_y / safe * 2), 0)
+
+
+def act(codes, x, y, flow, food_x, food_y, friends):
+    """Every pet's step for its goal code, as PetAI.execute_action() takes it.
+
+    codes, x and y have one entry per moving pet; food_x and food_y hold
+    the world's food, oldest first. friends is (x, y, hunger, happiness,
+    me) for the pets the movers can walk to, where me is each mover's own
+    index in them (-1 if it is not there).
+
+    Returns (dx, dy, done). Pets not done are left to the caller:
+    explorers, which take random steps, hungry pets when there is no food
+    at all, and resting pets with no way to a resting spot.
+    """
+    count = len(codes)
+    dx = np.zeros(count)
+    dy = np.zeros(count)
+    done = np.zeros(count, dtype=bool)
+    cells = flow.cells(x, y)
+
+    # find_food and rest follow the flow fields where they have an arrow
+    for goal, arrays in ((FIND_FOOD, flow.food_arrays), (REST, flow.rest_arrays)):
+        movers = np.flatnonzero(codes == goal)
+        if len(movers) == 0:
+            continue
+        move_x, move_y, usable = arrays()
+        movers = movers[usable[cells[movers]]]
+        dx[movers] = move_x[cells[movers]]
+        dy[movers] = move_y[cells[movers]]
+        done[movers] = True
+
+    # Off the flow field (standing on food, or walled in): head straight for it
+    hungry = np.flatnonzero((codes == FIND_FOOD) & ~done)
+    if len(hungry) and len(food_x):
+        closest = nearest_points(x[hungry], y[hungry], food_x, food_y)
+        dx[hungry], dy[hungry] = move_toward(x[hungry], y[hungry], food_x[closest], food_y[closest])
+        done[hungry] = True
+
+    # Helpers walk to the nearest needy pet, socialisers to the nearest happy one
+    friend_x, friend_y, friend_hunger, friend_happiness, me = friends
+    for goal, wanted in ((HELP_FRIEND, needy_mask(friend_hunger, friend_happiness)),
+                         (SOCIALIZE, friend_happiness > 50)):
+        seekers = np.flatnonzero(codes == goal)
+        if len(seekers) == 0:
+            continue
+        done[seekers] = True  # Nobody to walk to means standing still
+        candidates = np.flatnonzero(wanted)
+        index = np.full(len(friend_x) + 1, -1)  # me == -1 picks the extra -1
+        index[candidates] = np.arange(len(candidates))
+        closest = nearest_points(x[seekers], y[seekers], friend_x[candidates], friend_y[candidates],
+                                 exclude=index[me[seekers]])
+        found = closest >= 0
+        seekers, friend = seekers[found], candidates[closest[found]]
+        dx[seekers], dy[seekers] = move_toward(x[seekers], y[seekers], friend_x[friend], friend_y[friend])
+    return dx, dy, done
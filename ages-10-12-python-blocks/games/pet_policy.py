@@ -0,0 +1,82 @@
+# Pet Policy - PetAI.think() for a whole population at once
+# Every PetAI runs the same if/elif cascade, only the personality weights
+# differ. Compiling the weights into one matrix lets NumPy run the cascade
+# for thousands of pets in a few array operations.
+#
+#   weights = compile_policy(pet['ai'] for pet in pets.values())
+#   codes = decide(weights, hunger, energy, happiness, needy_friends)
+#   GOALS[codes[0]]  # -> 'find_food', 'rest', ...
+
+from pet_arrays import np, personality_row
+
+GOALS = ('find_food', 'rest', 'help_friend', 'socialize', 'explore')
+FIND_FOOD, REST, HELP_FRIEND, SOCIALIZE, EXPLORE = range(len(GOALS))
+GOAL_CODES = {goal: code for code, goal in enumerate(GOALS)}
+
+
+def compile_policy(ais):
+    """One row of personality weights per PetAI (see PERSONALITY_FIELDS)"""
+    rows = [personality_row(ai.personality) for ai in ais]
+    if not rows:
+        return np.zeros((0, 5))
+    return np.array(rows, dtype=float)
+
+
+def decide(weights, hunger, energy, happiness, needy_friends):
+    """Goal code for every pet, exactly as PetAI.think() would choose.
+
+    weights comes from compile_policy() or PetArrays.personality, and
+    needy_friends counts the other pets that are hungry or sad.
+    """
+    w_hunger, w_energy, w_social, w_help, helpful = weights.T
+
+    # Same arithmetic, in the same order, as the scalar version
+    hunger_need = np.maximum(0, hunger - 30) / 70.0 * w_hunger
+    energy_need = np.maximum(0, 100 - energy) / 70.0 * w_energy
+    social_need = np.maximum(0, 50 - happiness) / 50.0 * w_social
+    help_need = needy_friends * w_help
+
+    # np.select picks the first true condition, like the if/elif cascade
+    return np.select(
+        [hunger_need > 0.7,
+         energy_need > 0.8,
+         (help_need > 0.5) & (helpful > 0.6),
+         social_need > 0.4],
+        [FIND_FOOD, REST, HELP_FRIEND, SOCIALIZE],
+        EXPLORE
+    ).astype(np.int8)
+
+
+def needy_mask(hunger, happiness):
+    """Which pets count as needing help"""
+    return (hunger > 70) | (happiness < 30)
+
+
+def check_equivalence(pets, game_state=None):
+    """Names of pets where decide() disagrees with the scalar PetAI.think().
+
+    The scalar version is the reference implementation; an empty list
+    means the compiled policy matches it. Each pet's current_goal is left
+    as it was.
+    """
+    names = list(pets)
+    pet_list = [pets[name] for name in names]
+    hunger = np.array([pet['hunger'] for pet in pet_list], dtype=float)
+    energy = np.array([pet['energy'] for pet in pet_list], dtype=float)
+    happiness = np.array([pet['happiness'] for pet in pet_list], dtype=float)
+    needy = needy_mask(hunger, happiness)
+    codes = decide(compile_policy(pet['ai'] for pet in pet_list),
+                   hunger, energy, happiness, needy.sum() - needy)
+
+    if game_state is None:
+        from pet_world import WorldSummary  # pet_world imports this module
+        game_state = {'pets': pets, 'food_items': [], 'summary': WorldSummary(pets)}
+
+    mismatches = []
+    for name, pet, code in zip(names, pet_list, codes):
+        ai = pet['ai']
+        saved_goal = ai.current_goal
+        if ai.think(game_state) != GOALS[code]:
+            mismatches.append(name)
+        ai.current_goal = saved_goal
+    return mismatches
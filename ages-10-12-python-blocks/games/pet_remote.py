@@ -0,0 +1,309 @@
+# Pet Remote - run the pet simulation in its own process
+# A slow AI tick then never holds up drawing or key presses: the game
+# draws whatever snapshot the simulation published last and sends key
+# presses over as commands.
+#
+#   world = RemoteWorld(seed=1)
+#   game = PyGamePetAI(world=world)    # or: python pygame_pet_ai.py --worker
+#   ...
+#   world.close()
+#
+# Snapshots go through a SnapshotBuffer: two slots in shared memory, each
+# guarded by a sequence number (a "seqlock"). The simulation always writes
+# the slot readers are not pointed at, and a reader that catches a slot
+# mid-write just tries again, so nobody ever waits on a lock. The game
+# process owns every buffer: when a snapshot outgrows its slots the
+# simulation asks for a bigger buffer and carries on until it arrives.
+
+import pickle
+import queue
+import time
+from multiprocessing import Process, Queue, shared_memory
+
+from pet_arrays import np
+from pet_world import PetWorld, TICKS_PER_SECOND
+
+# Header slots
+LATEST, SEQ_0, SEQ_1, LENGTH_0, LENGTH_1 = range(5)
+
+SNAPSHOT_BYTES = 1 << 20  # Room for one snapshot, per slot, at the least
+PET_SNAPSHOT_BYTES = 128  # Plus about this much per pet
+
+
+class SnapshotBuffer:
+    """Double-buffered byte snapshots in shared memory, one writer, any readers"""
+
+    def __init__(self, slot_bytes=SNAPSHOT_BYTES, name=None):
+        if np is None:
+            raise ImportError("Snapshot buffers need NumPy: pip install numpy")
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=40 + 2 * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            slot_bytes = (self.shm.size - 40) // 2
+        self.name = self.shm.name
+        self.slot_bytes = slot_bytes
+        self.header = np.ndarray((5,), dtype=np.int64, buffer=self.shm.buf)
+        self.slots = [self.shm.buf[40 + i * slot_bytes:40 + (i + 1) * slot_bytes] for i in range(2)]
+        if name is None:
+            self.header[:] = 0
+            self.header[LATEST] = -1  # Nothing published yet
+
+    def write(self, data):
+        """Publish data as the newest snapshot"""
+        if len(data) > self.slot_bytes:
+            raise ValueError(f"Snapshot of {len(data)} bytes does not fit in {self.slot_bytes}")
+        header = self.header
+        slot = 0 if header[LATEST] != 0 else 1
+        header[SEQ_0 + slot] += 1  # Odd: being written
+        self.slots[slot][:len(data)] = data
+        header[LENGTH_0 + slot] = len(data)
+        header[SEQ_0 + slot] += 1  # Even: complete
+        header[LATEST] = slot
+
+    def read(self, attempts=100):
+        """Bytes of the newest complete snapshot, or None"""
+        header = self.header
+        for _ in range(attempts):
+            slot = int(header[LATEST])
+            if slot < 0:
+                return None
+            seq = int(header[SEQ_0 + slot])
+            if seq % 2:
+                continue
+            data = bytes(self.slots[slot][:header[LENGTH_0 + slot]])
+            if int(header[SEQ_0 + slot]) == seq:
+                return data
+        return None
+
+    def close(self):
+        self.header = None
+        for slot in self.slots:
+            slot.release()
+        self.slots = []
+        self.shm.close()
+
+
+def world_snapshot(world):
+    """Everything PyGamePetAI draws, as plain data"""
+    return {
+        'tick': world.tick,
+        'size': (world.width, world.height),
+        'pets': [(name, pet['x'], pet['y'], pet['hunger'], pet['energy'], pet['happiness'], pet['color'])
+                 for name, pet in world.pets.items()],
+        'food': [(food['id'], food['x'], food['y']) for food in world.food_items],
+        'messages': [message['text'] for message in world.messages],
+        'show_code': world.show_code,
+        'current_code': world.current_code,
+        'obstacles': list(world.obstacles),
+    }
+
+
+def _simulate(buffer_name, commands, replies, world_options, seed, sim_hz, max_catch_up):
+    """The simulation process: apply commands, step at sim_hz, publish"""
+    world = PetWorld(seed=seed, **world_options)
+    buffer = SnapshotBuffer(name=buffer_name)
+    asked_for = 0  # Size of the bigger buffer asked for, if any
+
+    def publish():
+        nonlocal asked_for
+        data = pickle.dumps(world_snapshot(world))
+        if len(data) <= buffer.slot_bytes:
+            buffer.write(data)
+        elif len(data) > asked_for:
+            # Too big: skip it and ask the game for room to spare
+            asked_for = 2 * len(data)
+            replies.put(('grow', asked_for))
+
+
+    tick_time = 1.0 / sim_hz
+    last_time = time.perf_counter()
+    accumulator = 0.0
+    try:
+        publish()
+        while True:
+            # Wait for the next tick, waking early for commands
+            wait = max(0.0, tick_time - accumulator - (time.perf_counter() - last_time))
+            try:
+                command = commands.get(timeout=wait)
+            except queue.Empty:
+                command = None
+            while command is not None:
+                name, args = command
+                if name == 'stop':
+                    return
+                if name == 'use_buffer':
+                    buffer.close()
+                    buffer = SnapshotBuffer(name=args[0])
+                    asked_for = 0
+                else:
+                    getattr(world, name)(*args)
+                try:
+                    command = commands.get_nowait()
+                except queue.Empty:
+                    command = None
+
+            now = time.perf_counter()
+            accumulator += now - last_time
+            last_time = now
+            ticks = min(int(accumulator // tick_time), max_catch_up)
+            if ticks:
+                world.step(ticks)
+                accumulator -= ticks * tick_time
+                if accumulator >= tick_time:
+                    accumulator %= tick_time  # Too far behind: give up on the backlog
+            publish()
+    finally:
+        buffer.close()
+
+
+class RemoteWorld:
+    """Stand-in for a PetWorld that runs in another process.
+
+    Reading pets, food and messages shows the latest published snapshot;
+    add_food(), add_message(), toggle_code(), add_obstacle(), set_focus()
+    and clear_focus() are sent to the simulation as commands. The simulation
+    keeps its own clock, so step() only picks up the newest snapshot.
+    Snapshot slots start with room for the pets given and grow whenever a
+    snapshot outgrows them.
+    """
+
+    remote = True
+
+    COMMANDS = ('add_food', 'add_message', 'toggle_code', 'add_obstacle', 'set_focus', 'clear_focus')
+
+    def __init__(self, seed=None, sim_hz=TICKS_PER_SECOND, max_catch_up=8,
+                 snapshot_bytes=None, **world_options):
+        if snapshot_bytes is None:
+            pets = world_options.get('pets')
+            snapshot_bytes = SNAPSHOT_BYTES + PET_SNAPSHOT_BYTES * (len(pets) if pets is not None else 0)
+        self.buffers = [SnapshotBuffer(snapshot_bytes)]  # Oldest first; the newest is being written
+        self.commands = Queue()
+        self.replies = Queue()
+        self.process = None
+        self.data = None
+        self.snapshot = None
+        self.pets = {}
+        self.food_items = []
+        self.messages = []
+        try:
+            self.process = Process(target=_simulate, daemon=True,
+                                   args=(self.buffer.name, self.commands, self.replies, world_options,
+                                         seed, sim_hz, max_catch_up))
+            self.process.start()
+            self.wait_for_snapshot()
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def buffer(self):
+        """The buffer the simulation publishes to"""
+        return self.buffers[-1]
+
+    def wait_for_snapshot(self, timeout=10.0):
+        """Block until the simulation has published something"""
+        deadline = time.perf_counter() + timeout
+        while not self.refresh():
+            if time.perf_counter() > deadline:
+                raise TimeoutError("The simulation process did not start")
+            time.sleep(0.001)
+
+    def _grow(self):
+        """Hand the simulation the bigger buffers it asked for"""
+        while True:
+            try:
+                _, slot_bytes = self.replies.get_nowait()
+            except queue.Empty:
+                return
+            # Nobody opens the old buffers by name any more
+            self.buffer.shm.unlink()
+            self.buffers.append(SnapshotBuffer(slot_bytes))
+            self.commands.put(('use_buffer', (self.buffer.name,)))
+
+    def _read(self):
+        """Bytes of the newest snapshot in any buffer, dropping outgrown buffers"""
+        for i in range(len(self.buffers) - 1, -1, -1):
+            data = self.buffers[i].read()
+            if data is not None:
+                for old in self.buffers[:i]:
+                    old.close()
+                del self.buffers[:i]
+                return data
+        return None
+
+    def refresh(self):
+        """Pick up the newest snapshot; True if there was a new one"""
+        self._grow()
+        data = self._read()
+        if data is None:
+            if not self.process.is_alive():
+                self.close()
+                raise RuntimeError("The simulation process stopped")
+            return False
+        if data == self.data:
+            return False
+
+        self.data = data
+        snapshot = self.snapshot = pickle.loads(data)
+        self.pets = {name: {'x': x, 'y': y, 'hunger': hunger, 'energy': energy,
+                            'happiness': happiness, 'color': color}
+                     for name, x, y, hunger, energy, happiness, color in snapshot['pets']}
+        self.food_items = [{'id': food_id, 'x': x, 'y': y} for food_id, x, y in snapshot['food']]
+        self.messages = [{'text': text} for text in snapshot['messages']]
+        return True
+
+    @property
+    def tick(self):
+        return self.snapshot['tick']
+
+    @property
+    def width(self):
+        return self.snapshot['size'][0]
+
+    @property
+    def height(self):
+        return self.snapshot['size'][1]
+
+    @property
+    def show_code(self):
+        return self.snapshot['show_code']
+
+    @property
+    def current_code(self):
+        return self.snapshot['current_code']
+
+    @property
+    def obstacles(self):
+        return self.snapshot['obstacles']
+
+    def step(self, n_ticks=1):
+        """The simulation steps itself; just catch up with it"""
+        self.refresh()
+        return self
+
+    def __getattr__(self, name):
+        if name in self.COMMANDS:
+            return lambda *args: self.commands.put((name, args))
+        raise AttributeError(name)
+
+    def close(self):
+        """Stop the simulation process and free the shared memory"""
+        try:
+            if self.process is not None and self.process.is_alive():
+                self.commands.put(('stop', ()))
+                self.process.join(timeout=5)
+                if self.process.is_alive():
+                    self.process.terminate()
+        finally:
+            buffers, self.buffers = self.buffers, []
+            for i, buffer in enumerate(buffers):
+                buffer.close()
+                if i == len(buffers) - 1:
+                    buffer.shm.unlink()  # Older ones went when they were outgrown
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,260 @@
+# Pet Replay - record a game session and play it back exactly
+# A seeded PetWorld always does the same thing given the same inputs, so
+# a session is just the seed, the starting pets and every command (food
+# dropped, pets added, camera moved...) with the tick it arrived
+# on. Replaying runs headless as fast as the CPU allows and checks the end
+# state against the digest saved with the recording.
+#
+#   world = RecordedWorld(PetWorld(seed=42), 'session.petlog')
+#   world.step(600); world.add_food(); world.step(600)
+#   world.close()
+#
+#   world, matched = replay('session.petlog')     # matched is True
+#
+#   python pygame_pet_ai.py --seed 42 --record session.petlog
+#   python pet_replay.py session.petlog
+
+import hashlib
+import inspect
+import json
+import struct
+import zlib
+
+from pet_world import PetAI, PetWorld
+
+MAGIC = b'PETLOG\x00\x01'
+
+# Commands that change the world, numbered in the log (new ones go at the end)
+COMMANDS = ('add_food', 'add_message', 'toggle_code', 'add_obstacle', 'set_focus', 'clear_focus',
+            'add_pet')
+END = 255  # Last record: the final tick and the state digest
+
+_RECORD = struct.Struct('<IBB')  # tick, command, number of arguments
+_END = struct.Struct('<IB')      # tick, END
+
+
+def state_digest(world):
+    """SHA-256 of everything that plays out in a world: pets, food, messages, code panel"""
+    digest = hashlib.sha256()
+    digest.update(repr(world.tick).encode())
+    for name, pet in world.pets.items():
+        digest.update(repr((name, pet['x'], pet['y'], pet['hunger'], pet['energy'], pet['happiness'],
+                            pet['ai'].current_goal)).encode())
+    for food in world.food_items:
+        digest.update(repr((food['id'], food['x'], food['y'], food['expires'])).encode())
+    digest.update(repr([message['text'] for message in world.messages]).encode())
+    digest.update(repr((world.show_code, world.current_code)).encode())
+    return digest.digest()
+
+
+def _pack_args(args):
+    parts = []
+    for arg in args:
+        if arg is None:
+            parts.append(b'n')
+        elif isinstance(arg, bool):
+            parts.append(b'b' + bytes([arg]))
+        elif isinstance(arg, int):
+            parts.append(b'i' + struct.pack('<q', arg))
+        elif isinstance(arg, float):
+            parts.append(b'f' + struct.pack('<d', arg))
+        elif isinstance(arg, str):
+            text = arg.encode('utf-8')
+            parts.append(b's' + struct.pack('<H', len(text)) + text)
+        elif isinstance(arg, (tuple, list)):
+            # Containers hold their items packed the same way, so a colour
+            # comes back a tuple and a personality a dict of floats
+            tag = b't' if isinstance(arg, tuple) else b'l'
+            parts.append(tag + struct.pack('<H', len(arg)) + _pack_args(arg))
+        elif isinstance(arg, dict):
+            items = [item for pair in arg.items() for item in pair]
+            parts.append(b'd' + struct.pack('<H', len(arg)) + _pack_args(items))
+        else:
+            raise TypeError(f"Cannot record a {type(arg).__name__} argument")
+    return b''.join(parts)
+
+
+def _unpack_args(data, offset, count):
+    args = []
+    for _ in range(count):
+        tag = data[offset:offset + 1]
+        offset += 1
+        if tag == b'n':
+            args.append(None)
+        elif tag == b'b':
+            args.append(bool(data[offset]))
+            offset += 1
+        elif tag == b'i':
+            args.append(struct.unpack_from('<q', data, offset)[0])
+            offset += 8
+        elif tag == b'f':
+            args.append(struct.unpack_from('<d', data, offset)[0])
+            offset += 8
+        elif tag == b's':
+            length = struct.unpack_from('<H', data, offset)[0]
+            args.append(data[offset + 2:offset + 2 + length].decode('utf-8'))
+            offset += 2 + length
+        elif tag in (b't', b'l', b'd'):
+            length = struct.unpack_from('<H', data, offset)[0]
+            items, offset = _unpack_args(data, offset + 2, 2 * length if tag == b'd' else length)
+            if tag == b't':
+                args.append(tuple(items))
+            elif tag == b'l':
+                args.append(items)
+            else:
+                args.append(dict(zip(items[::2], items[1::2])))
+        else:
+            raise ValueError(f"Bad argument tag {tag!r} in the log")
+    return args, offset
+
+
+def world_header(world):
+    """What it takes to rebuild a world as it is before its first tick"""
+    return {
+        'seed': world.seed,
+        'pet_rngs': world.pet_rngs,
+        'width': world.width,
+        'height': world.height,
+        'backend': world.backend,
+        'obstacles': [list(obstacle) for obstacle in world.obstacles],
+        'pets': [[name, pet['x'], pet['y'], pet['hunger'], pet['energy'], pet['happiness'],
+                  list(pet['color']), pet['ai'].personality] for name, pet in world.pets.items()],
+    }
+
+
+def world_from_header(header):
+    """A fresh PetWorld just like the recorded one was at tick 0"""
+    pets = {}
+    for name, x, y, hunger, energy, happiness, color, personality in header['pets']:
+        pets[name] = {'x': x, 'y': y, 'hunger': hunger, 'energy': energy, 'happiness': happiness,
+                      'color': tuple(color), 'ai': PetAI(name, personality)}
+    world = PetWorld(header['width'], header['height'], pets, backend=header['backend'],
+                     seed=header['seed'], pet_rngs=header['pet_rngs'])
+    for obstacle in header['obstacles']:
+        world.add_obstacle(*obstacle)
+    return world
+
+
+class RecordedWorld:
+    """Stand-in for a PetWorld that logs every command it is given.
+
+    Commands are logged from the world's input_observers, after they
+    have worked, and everything else (stepping, reading pets and food)
+    goes straight to the world. Only a seeded world that has not run yet can be recorded,
+    and AIScheduler budgets must be off, since they depend on the clock.
+    """
+
+    def __init__(self, world, path):
+        if world.seed is None:
+            raise ValueError("Only a PetWorld(seed=...) can be recorded")
+        if world.tick != 0:
+            raise ValueError("Start recording before the world takes its first step")
+        if world.ai_scheduler.budget is not None:
+            raise ValueError("A thinking-time budget depends on the clock and cannot be replayed")
+        self.world = world
+        self.path = path
+        self.file = open(path, 'wb')
+        header = zlib.compress(json.dumps(world_header(world)).encode('utf-8'))
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        world.input_observers.append(self.note_input)
+
+    def __getattr__(self, name):
+        return getattr(self.world, name)
+
+    def note_input(self, name, args, kwargs):
+        """Log a command once the world has carried it out, so one that fails is left out"""
+        if name not in COMMANDS:
+            return
+        if kwargs:
+            # Logged with every argument in place, defaults included
+            bound = inspect.signature(getattr(self.world, name)).bind(*args, **kwargs)
+            bound.apply_defaults()
+            args = bound.args
+        self.file.write(_RECORD.pack(self.world.tick, COMMANDS.index(name), len(args)) + _pack_args(args))
+
+    def close(self):
+        """Finish the log with the final tick and state digest"""
+        if self.file.closed:
+            return
+        self.world.input_observers.remove(self.note_input)
+        self.file.write(_END.pack(self.world.tick, END) + state_digest(self.world))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_log(path):
+    """(header, [(tick, command, args)], (final tick, digest) or None)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a pet session log")
+    offset = len(MAGIC)
+    length = struct.unpack_from('<I', data, offset)[0]
+    offset += 4
+    header = json.loads(zlib.decompress(data[offset:offset + length]))
+    offset += length
+
+    records = []
+    end = None
+    while offset < len(data):
+        tick, command = _END.unpack_from(data, offset)
+        if command == END:
+            offset += _END.size
+            end = (tick, data[offset:offset + 32])
+            break
+        _, _, count = _RECORD.unpack_from(data, offset)
+        args, offset = _unpack_args(data, offset + _RECORD.size, count)
+        records.append((tick, COMMANDS[command], args))
+    return header, records, end
+
+
+def replay(path, until=None):
+    """Play a log back headless; returns (world, matched).
+
+    matched says whether the end state is the recorded one, or is None
+    if the log has no end record or until stopped the replay early.
+    """
+    header, records, end = read_log(path)
+    world = world_from_header(header)
+    for tick, command, args in records:
+        if until is not None and tick > until:
+            break
+        world.step(tick - world.tick)
+        getattr(world, command)(*args)
+
+    final = end[0] if end is not None else world.tick
+    if until is not None and until < final:
+        final = until
+    world.step(final - world.tick)
+
+    if end is None or world.tick != end[0]:
+        return world, None
+    return world, state_digest(world) == end[1]
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+    parser = argparse.ArgumentParser(description="Replay a recorded pet session headless")
+    parser.add_argument('log', help="a log written with pygame_pet_ai.py --record")
+    parser.add_argument('--until', type=int, help="stop at this tick")
+    args = parser.parse_args()
+
+    header, records, end = read_log(args.log)
+    print(f"🎬 Replaying {args.log}: seed {header['seed']}, {len(header['pets'])} pets, {len(records)} inputs")
+    start = time.perf_counter()
+    world, matched = replay(args.log, args.until)
+    seconds = time.perf_counter() - start
+    print(f"⏩ {world.tick} ticks in {seconds:.2f}s ({world.tick / max(seconds, 1e-9):.0f} ticks/s)")
+    print(f"🔑 State digest {state_digest(world).hex()[:16]}")
+    if matched is True:
+        print("✅ Same as the recording")
+    elif matched is False:
+        print("❌ Different from the recording!")
+        sys.exit(1)
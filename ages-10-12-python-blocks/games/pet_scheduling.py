@@ -0,0 +1,250 @@
+# Pet Scheduling - deciding *when* things happen in the pet simulation
+# Instead of counting every timer down every tick, things are filed under
+# the tick they are due and only looked at when that tick comes round.
+
+import heapq
+import random
+import time
+
+from pet_arrays import np
+
+
+class ExpiryQueue:
+    """Keys that expire at a given tick, in a min-heap.
+
+    Cancelling (e.g. food that was eaten) only forgets the key; its heap
+    entry is skipped when it surfaces, and the heap is compacted once
+    most of it is stale.
+    """
+
+    def __init__(self):
+        self.heap = []   # (expires, order, key)
+        self.live = {}   # key -> expires
+        self.order = 0   # Keeps keys due on the same tick in insertion order
+
+    def __len__(self):
+        return len(self.live)
+
+    def __contains__(self, key):
+        return key in self.live
+
+    def schedule(self, key, expires):
+        """File key to expire at the end of tick expires"""
+        self.live[key] = expires
+        heapq.heappush(self.heap, (expires, self.order, key))
+        self.order += 1
+
+    def cancel(self, key):
+        if self.live.pop(key, None) is not None and len(self.heap) > 2 * len(self.live) + 64:
+            self.heap = [entry for entry in self.heap if self.live.get(entry[2]) == entry[0]]
+            heapq.heapify(self.heap)
+
+    def pop_expired(self, tick):
+        """Remove and return the keys due at or before tick, soonest first"""
+        expired = []
+        heap = self.heap
+        while heap and heap[0][0] <= tick:
+            expires, _, key = heapq.heappop(heap)
+            if self.live.get(key) == expires:
+                del self.live[key]
+                expired.append(key)
+        return expired
+
+    def next_expiry(self):
+        """Tick of the next live expiry, or None"""
+        heap = self.heap
+        while heap and self.live.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def clear(self):
+        self.heap.clear()
+        self.live.clear()
+
+
+class SpawnRegion:
+    """A rectangle where food appears at random, rate items per tick on average"""
+
+    def __init__(self, x_range, y_range, rate, cap, lifetime=None):
+        self.x_range = x_range      # (low, high), inclusive like randint
+        self.y_range = y_range
+        self.rate = rate
+        self.cap = cap              # Most food items the region holds at once
+        self.lifetime = lifetime    # None means the world's usual food lifetime
+        self.count = 0
+
+    def contains(self, x, y):
+        return self.x_range[0] <= x <= self.x_range[1] and self.y_range[0] <= y <= self.y_range[1]
+
+
+class FoodSpawner:
+    """Food arrivals as a Poisson process per region.
+
+    Rather than flipping a coin every tick, the spawner samples how long
+    until the next arrival and sleeps until then, so quiet ticks cost one
+    comparison. Arrivals in a full region are skipped. The spawner has its
+    own random generator, so a seed always gives the same arrival times
+    and spots, however the pets use their own randomness.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.regions = []
+        self.arrivals = []  # (arrival time in ticks, region index)
+
+    def add_region(self, x_range, y_range, rate=0.02, cap=3, lifetime=None, start_tick=0):
+        """Start spawning in a new region; returns its index"""
+        region = SpawnRegion(x_range, y_range, rate, cap, lifetime)
+        self.regions.append(region)
+        index = len(self.regions) - 1
+        if rate > 0:
+            heapq.heappush(self.arrivals, (start_tick + self.rng.expovariate(rate), index))
+        return index
+
+    @property
+    def next_tick(self):
+        """First tick with an arrival due, or None"""
+        return int(self.arrivals[0][0]) if self.arrivals else None
+
+    def due(self, tick):
+        """Spawns arriving during tick, as (region index, x, y, lifetime)"""
+        spawns = []
+        arrivals = self.arrivals
+        rng = self.rng
+        while arrivals and arrivals[0][0] < tick + 1:
+            when, index = heapq.heappop(arrivals)
+            region = self.regions[index]
+            # Always roll the spot, so the random stream never depends on the caps
+            x = rng.randint(*region.x_range)
+            y = rng.randint(*region.y_range)
+            if region.count < region.cap:
+                region.count += 1
+                spawns.append((index, x, y, region.lifetime))
+            heapq.heappush(arrivals, (when + rng.expovariate(region.rate), index))
+        return spawns
+
+    def claim(self, x, y):
+        """Count food dropped by hand against the region it lands in"""
+        for index, region in enumerate(self.regions):
+            if region.contains(x, y):
+                region.count += 1
+                return index
+        return None
+
+    def release(self, index):
+        """A region's food item was eaten or spoiled"""
+        if index is not None:
+            self.regions[index].count -= 1
+
+
+class AIScheduler:
+    """Decides which pets re-plan (call PetAI.think()) on each tick.
+
+    Each pet re-plans every period ticks, on its own phase so the work is
+    spread evenly, and keeps acting on its current_goal in between. Pets
+    woken by something urgent (food landing nearby) re-plan on the next
+    chance they get. With a budget in seconds, once thinking has used it
+    up for the tick the remaining on-schedule pets are postponed; they
+    jump the budget next tick so nobody waits more than one extra tick.
+    The default period of 1 with no budget re-plans every pet every tick.
+
+    PetWorld(backend='numpy') asks about all its pets at once with plan()
+    and re-plans them in chunks with think_in_turn().
+    """
+
+    def __init__(self, period=1, budget=None, clock=time.perf_counter):
+        self.period = max(1, period)
+        self.budget = budget
+        self.clock = clock
+        self.phases = {}     # name -> tick % period when the pet re-plans
+        self.urgent = {}     # names to re-plan as soon as possible
+        self.postponed = {}  # names the budget pushed back a tick
+        self.spent = 0.0     # Seconds of thinking so far this tick
+
+    def phase(self, name):
+        """Pets get phases round-robin in the order they are first seen"""
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = len(self.phases) % self.period
+        return phase
+
+    def wake(self, name):
+        """Re-plan this pet at its next turn, whatever its phase"""
+        self.urgent[name] = True
+
+    def forget(self, name):
+        self.phases.pop(name, None)
+        self.urgent.pop(name, None)
+        self.postponed.pop(name, None)
+
+    def start_tick(self):
+        self.spent = 0.0
+
+    def should_think(self, name, tick):
+        """Whether this pet re-plans now or keeps its current goal"""
+        if self.urgent.pop(name, None) or self.postponed.pop(name, None):
+            return True
+        if self.period > 1 and tick % self.period != self.phase(name):
+            return False
+        if self.budget is not None and self.spent >= self.budget:
+            self.postponed[name] = True
+            return False
+        return True
+
+    def think(self, ai, game_state):
+        """Run ai.think(), charging its time to this tick's budget"""
+        if self.budget is None:
+            return ai.think(game_state)
+        start = self.clock()
+        goal = ai.think(game_state)
+        self.spent += self.clock() - start
+        return goal
+
+    def phase_array(self, names):
+        """phase() for a list of names, as a NumPy array"""
+        return np.fromiter((self.phase(name) for name in names), np.int64, len(names))
+
+    def plan(self, names, tick, asking, slots, phases=None):
+        """should_think() for a whole population, before the budget.
+
+        names lists the pets by slot, asking is a bool array of the pets
+        that want to know and slots maps names to slots; phases can be a
+        saved phase_array(names). Returns two bool arrays: pets woken or
+        postponed earlier, who re-plan whatever the budget, and the rest
+        whose phase is up.
+        """
+        woken = np.zeros(len(names), dtype=bool)
+        for flags in (self.urgent, self.postponed):
+            for name in [name for name in flags if name in slots and asking[slots[name]]]:
+                woken[slots[name]] = True
+                del flags[name]
+        due = asking & ~woken
+        if self.period > 1:
+            if phases is None:
+                phases = self.phase_array(names)
+            due &= phases == tick % self.period
+        return woken, due
+
+    def think_in_turn(self, think, slots, names, chunk=256):
+        """Call think(some_slots) for on-schedule pets, a chunk at a time.
+
+        Once the budget for the tick is used up, the pets still waiting
+        are postponed, like should_think() does one pet at a time.
+        """
+        if self.budget is None:
+            think(slots)
+            return
+        for first in range(0, len(slots), chunk):
+            if self.spent >= self.budget:
+                for slot in slots[first:].tolist():
+                    self.postponed[names[slot]] = True
+                return
+            self.timed(think, slots[first:first + chunk])
+
+    def timed(self, think, slots):
+        """Call think(slots), charging its time to this tick's budget"""
+        if len(slots) == 0:
+            return
+        start = self.clock()
+        think(slots)
+        self.spent += self.clock() - start
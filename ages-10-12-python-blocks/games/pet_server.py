@@ -0,0 +1,558 @@
+# Pet Server - a whole class sharing one pet world over the network
+# The server owns the only real PetWorld: it steps it at 60 ticks a
+# second, players send it commands (look here, drop food, adopt a pet),
+# and a few times a second it tells each player what changed near them.
+#
+#   server = PetServer(PetWorld(3000, 3000, seed=1))
+#   await server.start('127.0.0.1', 8765)
+#
+#   client = await PetClient.connect('127.0.0.1', 8765, 'Sam')
+#   await client.command('view', 0, 0, 800, 600)
+#   await client.command('adopt', 'Rex')
+#   await client.receive()          # client.pets, client.food_items... now up to date
+#
+#   python pet_server.py --world 3000x3000              # serve a classroom
+#   python pet_server.py --bots 30 --seconds 10         # try it with 30 test players
+#
+# Updates are deltas: each player only hears about pets and food inside
+# the area it is looking at, and for pets it already knows about, only
+# the fields that moved since the last update, as small whole numbers.
+# A player whose connection falls behind skips updates instead of
+# queueing them, so a slow laptop never slows down the rest of the class.
+
+import asyncio
+import json
+import math
+import random
+import struct
+import time
+import zlib
+
+from pet_arrays import PERSONALITY_FIELDS
+from pet_memory import NameTable
+from pet_world import PetWorld, PET_COLORS, TICKS_PER_SECOND
+
+SEND_HZ = 20                 # Updates per second sent to each player
+INTEREST_MARGIN = 200        # World pixels around a player's view they also hear about
+MAX_VIEW = 4000              # Largest view side a player may ask for
+MAX_INTEREST_PETS = 256      # Pets per player update, nearest the view centre first
+MAX_QUEUED_BYTES = 64 << 10  # Unsent bytes after which a player skips updates
+MAX_COMMAND_BYTES = 4096     # Longest command a player may send
+COMMANDS_PER_SECOND = 10     # Commands a player may send on average...
+COMMAND_BURST = 20           # ...and all at once
+PETS_PER_PLAYER = 3
+MAX_NAME_LENGTH = 20
+
+# Frame: payload bytes, kind
+_FRAME = struct.Struct('<IB')
+JOIN, COMMAND, WELCOME, STATE, ERROR = b'JCWSE'  # As byte values
+
+# State update: tick, server clock when sent, pets moved, pets gone, bytes of JSON
+_STATE = struct.Struct('<IdIII')
+# Moved pet: id, which fields changed
+_MOVED = struct.Struct('<IB')
+
+# Pet fields sent to players, and how many steps per unit they are rounded to
+FIELDS = ('x', 'y', 'hunger', 'energy', 'happiness')
+STEPS = (4, 4, 10, 10, 10)
+
+COMMANDS = ('view', 'add_food', 'adopt')
+
+
+def _frame(kind, payload):
+    return _FRAME.pack(len(payload), kind) + payload
+
+
+async def _read_frame(reader, max_bytes=None):
+    size, kind = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    if max_bytes is not None and size > max_bytes:
+        raise ValueError(f"Frame of {size} bytes is too big")
+    return kind, await reader.readexactly(size)
+
+
+def _numbers(args, count):
+    """A command's arguments as count finite floats, or ValueError"""
+    if len(args) != count:
+        raise ValueError(f"Expected {count} numbers")
+    for arg in args:
+        if isinstance(arg, bool) or not isinstance(arg, (int, float)) or not math.isfinite(arg):
+            raise ValueError(f"{arg!r} is not a number")
+    return [float(arg) for arg in args]
+
+
+def _quantize(pet):
+    return tuple(round(pet[field] * steps) for field, steps in zip(FIELDS, STEPS))
+
+
+class Player:
+    """One connected player, and what the server last told it"""
+
+    def __init__(self, number, name, writer):
+        self.number = number
+        self.name = name
+        self.writer = writer
+        self.view = None     # (x0, y0, x1, y1) the player is looking at
+        self.pets = {}       # pet id -> rounded fields last sent
+        self.food = set()    # food ids last sent
+        self.messages = []
+        self.code = None
+        self.adopted = 0
+        self.tokens = COMMAND_BURST
+        self.tokens_time = time.monotonic()
+        self.bytes_sent = 0
+        self.updates = 0
+        self.skipped = 0
+
+    def allow_command(self):
+        """Token bucket: COMMANDS_PER_SECOND on average, COMMAND_BURST at once"""
+        now = time.monotonic()
+        self.tokens = min(COMMAND_BURST, self.tokens + (now - self.tokens_time) * COMMANDS_PER_SECOND)
+        self.tokens_time = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def send(self, kind, payload):
+        data = _frame(kind, payload)
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+
+    def error(self, text):
+        self.send(ERROR, text.encode('utf-8'))
+
+
+class PetServer:
+    """Runs one PetWorld for everyone and keeps each player up to date.
+
+    The world only changes inside the tick loop: player commands wait in
+    a queue until the start of the next tick, so every player sees the
+    same world in the same order.
+    """
+
+    def __init__(self, world, sim_hz=TICKS_PER_SECOND, send_hz=SEND_HZ, max_catch_up=8):
+        self.world = world
+        self.sim_hz = sim_hz
+        self.send_every = max(1, round(sim_hz / send_hz))
+        self.max_catch_up = max_catch_up
+        self.players = {}
+        self.pending = []       # (player, command, args) for the next tick
+        self.pet_ids = NameTable()
+        self.owners = {}        # pet name -> player name
+        self._next_player = 1
+        self.server = None
+        self.loop_task = None
+        self.tick_seconds = 0.0  # Time spent stepping and sending, for stats
+        self.slowest_tick = 0.0
+        self.ticks_run = 0
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Listen for players and start the tick loop; returns the port"""
+        self.server = await asyncio.start_server(self._serve, host, port)
+        self.loop_task = asyncio.create_task(self._tick_loop())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.loop_task.cancel()
+        self.server.close()
+        for player in list(self.players.values()):
+            player.writer.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        player = None
+        try:
+            kind, payload = await _read_frame(reader, MAX_COMMAND_BYTES)
+            if kind != JOIN:
+                return
+            number = self._next_player
+            self._next_player += 1
+            name = payload.decode('utf-8').strip()[:MAX_NAME_LENGTH] or f"Player {number}"
+            player = self.players[number] = Player(number, name, writer)
+            world = self.world
+            player.send(WELCOME, json.dumps({
+                'player': number,
+                'name': name,
+                'size': [world.width, world.height],
+                'obstacles': [list(obstacle) for obstacle in world.obstacles],
+                'tick': world.tick,
+                'send_hz': self.sim_hz / self.send_every,
+            }).encode('utf-8'))
+
+            while True:
+                kind, payload = await _read_frame(reader, MAX_COMMAND_BYTES)
+                if kind != COMMAND:
+                    raise ValueError(f"Unexpected frame kind {kind}")
+                if not player.allow_command():
+                    player.error("Slow down! Too many commands")
+                    continue
+                command = json.loads(payload)
+                if not isinstance(command, list) or not command or command[0] not in COMMANDS:
+                    player.error(f"Unknown command: use one of {', '.join(COMMANDS)}")
+                    continue
+                self.pending.append((player, command[0], command[1:]))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # Gone, or sending nonsense: either way, goodbye
+        finally:
+            if player is not None:
+                del self.players[player.number]
+                self._update_focus()
+            writer.close()
+
+    def _apply(self, player, command, args):
+        """Carry out one player command, or tell the player why not"""
+        world = self.world
+        try:
+            if command == 'view':
+                x0, y0, x1, y1 = _numbers(args, 4)
+                if not (x0 < x1 and y0 < y1 and x1 - x0 <= MAX_VIEW and y1 - y0 <= MAX_VIEW):
+                    raise ValueError(f"Views must be at most {MAX_VIEW} pixels a side")
+                player.view = (x0, y0, x1, y1)
+                self._update_focus()
+
+            elif command == 'add_food':
+                x, y = (int(number) for number in _numbers(args, 2))
+                min_x, min_y, max_x, max_y = world.bounds
+                if not (min_x <= x <= max_x and min_y <= y <= max_y) or world.flow.is_blocked(x, y):
+                    raise ValueError("Food has to go somewhere pets can reach")
+                world.add_food(x, y)
+
+            elif command == 'adopt':
+                name = str(args[0]).strip()[:MAX_NAME_LENGTH]
+                personality = args[1] if len(args) > 1 else None
+                if not name or name in world.pets:
+                    raise ValueError(f"Pick another name: {name!r} is taken")
+                if player.adopted >= PETS_PER_PLAYER:
+                    raise ValueError(f"Everyone can adopt {PETS_PER_PLAYER} pets")
+                if personality is None:
+                    personality = {field: round(world.rng.random(), 2) for field in PERSONALITY_FIELDS}
+                weights = _numbers([personality[field] for field in PERSONALITY_FIELDS], len(PERSONALITY_FIELDS))
+                personality = {field: min(1.0, max(0.0, weight)) for field, weight in zip(PERSONALITY_FIELDS, weights)}
+                # New pets arrive in the middle of what their owner is looking at
+                min_x, min_y, max_x, max_y = world.bounds
+                x0, y0, x1, y1 = player.view if player.view is not None else world.bounds
+                x = min(max((x0 + x1) / 2, min_x), max_x)
+                y = min(max((y0 + y1) / 2, min_y), max_y)
+                colors = list(PET_COLORS.values())
+                world.add_pet(name, x, y, personality, color=colors[player.number % len(colors)])
+                player.adopted += 1
+                self.owners[name] = player.name
+                world.add_message(f"🐾 {player.name} adopted {name}!")
+        except (TypeError, ValueError, KeyError, IndexError) as e:
+            player.error(f"{command}: {e}")
+
+    def _update_focus(self):
+        # Simulate in full everywhere somebody is looking
+        views = [player.view for player in self.players.values() if player.view is not None]
+        if not views:
+            self.world.clear_focus()
+            return
+        self.world.set_focus(min(view[0] for view in views), min(view[1] for view in views),
+                             max(view[2] for view in views), max(view[3] for view in views))
+
+    async def _tick_loop(self):
+        loop = asyncio.get_running_loop()
+        tick_time = 1.0 / self.sim_hz
+        next_time = loop.time()
+        while True:
+            # Always give players a turn, even when behind
+            await asyncio.sleep(max(0.0, next_time - loop.time()))
+            start = time.perf_counter()
+
+            pending, self.pending = self.pending, []
+            for player, command, args in pending:
+                if player.number in self.players:
+                    try:
+                        self._apply(player, command, args)
+                    except Exception as e:
+                        # One bad command must never stop the world for everyone
+                        print(f"⚠️  Dropped {command} from {player.name}: {e!r}")
+            self.world.step()
+            self.ticks_run += 1
+            if self.world.tick % self.send_every == 0:
+                self.send_updates()
+
+            spent = time.perf_counter() - start
+            self.tick_seconds += spent
+            self.slowest_tick = max(self.slowest_tick, spent)
+            next_time += tick_time
+            if loop.time() - next_time > self.max_catch_up * tick_time:
+                next_time = loop.time()  # Too far behind: give up on the backlog
+
+    def send_updates(self):
+        """Send every player what changed near it since its last update"""
+        world = self.world
+        now = time.monotonic()
+        messages = [message['text'] for message in world.messages]
+        code = [world.show_code, world.current_code]
+        for player in list(self.players.values()):
+            if player.view is None:
+                continue
+            if player.writer.transport.get_write_buffer_size() > MAX_QUEUED_BYTES:
+                # Still sending the last ones: skip this update rather than
+                # fall further behind. The next delta covers both.
+                player.skipped += 1
+                continue
+            player.send(STATE, self.pack_update(player, messages, code, now))
+            player.updates += 1
+
+    def _interest(self, player):
+        """(id, name, pet) for the pets a player should hear about"""
+        x0, y0, x1, y1 = player.view
+        pets = self.world.pets_in(x0 - INTEREST_MARGIN, y0 - INTEREST_MARGIN,
+                                  x1 + INTEREST_MARGIN, y1 + INTEREST_MARGIN)
+        if len(pets) > MAX_INTEREST_PETS:
+            cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+            pets.sort(key=lambda item: (item[1]['x'] - cx) ** 2 + (item[1]['y'] - cy) ** 2)
+            del pets[MAX_INTEREST_PETS:]
+        return [(self.pet_ids.id(name), name, pet) for name, pet in pets]
+
+    def pack_update(self, player, messages, code, now):
+        """One player's delta: pets that arrived, moved or left, food and messages"""
+        known = player.pets
+        seen = {}
+        entered = []
+        moved = []
+        for pet_id, name, pet in self._interest(player):
+            fields = seen[pet_id] = _quantize(pet)
+            old = known.get(pet_id)
+            if old is None:
+                entered.append([pet_id, name, self.owners.get(name), list(pet['color'])] + list(fields))
+                continue
+            if old == fields:
+                continue
+            changes = [new - was for new, was in zip(fields, old)]
+            if any(not -32768 <= change <= 32767 for change in changes):
+                entered.append([pet_id, name, self.owners.get(name), list(pet['color'])] + list(fields))
+                continue
+            mask = 0
+            values = []
+            for bit, change in enumerate(changes):
+                if change:
+                    mask |= 1 << bit
+                    values.append(change)
+            moved.append(_MOVED.pack(pet_id, mask) + struct.pack(f'<{len(values)}h', *values))
+        left = [pet_id for pet_id in known if pet_id not in seen]
+        player.pets = seen
+
+        changes = {}
+        if entered:
+            changes['entered'] = entered
+        x0, y0, x1, y1 = player.view
+        x0, y0, x1, y1 = x0 - INTEREST_MARGIN, y0 - INTEREST_MARGIN, x1 + INTEREST_MARGIN, y1 + INTEREST_MARGIN
+        food = {food['id']: food for food in self.world.food_items
+                if x0 <= food['x'] < x1 and y0 <= food['y'] < y1}
+        if food.keys() != player.food:
+            changes['food_added'] = [[food_id, item['x'], item['y']] for food_id, item in food.items()
+                                     if food_id not in player.food]
+            changes['food_gone'] = [food_id for food_id in player.food if food_id not in food]
+            player.food = set(food)
+        if messages != player.messages:
+            changes['messages'] = player.messages = messages
+        if code != player.code:
+            changes['code'] = player.code = code
+        extra = json.dumps(changes).encode('utf-8') if changes else b''
+
+        header = _STATE.pack(self.world.tick, now, len(moved), len(left), len(extra))
+        return zlib.compress(header + b''.join(moved) + struct.pack(f'<{len(left)}I', *left) + extra, 1)
+
+
+class PetClient:
+    """A player's copy of the world near it, kept up to date by the server.
+
+    pets, food_items, messages, show_code and current_code look like a
+    PetWorld's, so the same drawing code can show them.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.welcome = None
+        self.tick = 0
+        self.pets = {}          # name -> {'x', 'y', 'hunger', 'energy', 'happiness', 'color', 'owner'}
+        self.food = {}          # food id -> {'id', 'x', 'y'}
+        self.messages = []
+        self.show_code = False
+        self.current_code = ""
+        self.errors = []
+        self._names = {}        # pet id -> name
+        self._fields = {}       # pet id -> rounded fields
+        self.bytes_received = 0
+        self.updates = 0
+        self.latencies = []     # Seconds from the server sending an update to it arriving
+
+    @classmethod
+    async def connect(cls, host, port, name=''):
+        reader, writer = await asyncio.open_connection(host, port)
+        client = cls(reader, writer)
+        writer.write(_frame(JOIN, name.encode('utf-8')))
+        await writer.drain()
+        while client.welcome is None:
+            await client.receive()
+        return client
+
+    @property
+    def width(self):
+        return self.welcome['size'][0]
+
+    @property
+    def height(self):
+        return self.welcome['size'][1]
+
+    @property
+    def obstacles(self):
+        return [tuple(obstacle) for obstacle in self.welcome['obstacles']]
+
+    @property
+    def food_items(self):
+        return self.food.values()
+
+    async def command(self, name, *args):
+        """Ask the server to do something: view, add_food or adopt"""
+        if name not in COMMANDS:
+            raise ValueError(f"Unknown command {name!r}: use one of {', '.join(COMMANDS)}")
+        self.writer.write(_frame(COMMAND, json.dumps([name, *args]).encode('utf-8')))
+        await self.writer.drain()
+
+    async def receive(self):
+        """Wait for the next message from the server and apply it"""
+        kind, payload = await _read_frame(self.reader)
+        self.bytes_received += _FRAME.size + len(payload)
+        if kind == WELCOME:
+            self.welcome = json.loads(payload)
+            self.tick = self.welcome['tick']
+        elif kind == STATE:
+            self._apply_update(zlib.decompress(payload))
+        elif kind == ERROR:
+            self.errors.append(payload.decode('utf-8'))
+        return kind
+
+    def _apply_update(self, data):
+        tick, sent, moved, left, extra_size = _STATE.unpack_from(data)
+        self.latencies.append(time.monotonic() - sent)
+        self.tick = tick
+        self.updates += 1
+        offset = _STATE.size
+        for _ in range(moved):
+            pet_id, mask = _MOVED.unpack_from(data, offset)
+            offset += _MOVED.size
+            count = bin(mask).count('1')
+            changes = iter(struct.unpack_from(f'<{count}h', data, offset))
+            offset += 2 * count
+            fields = self._fields[pet_id] = tuple(
+                value + next(changes) if mask & (1 << bit) else value
+                for bit, value in enumerate(self._fields[pet_id]))
+            self._set_fields(self.pets[self._names[pet_id]], fields)
+        for pet_id in struct.unpack_from(f'<{left}I', data, offset):
+            del self._fields[pet_id]
+            del self.pets[self._names.pop(pet_id)]
+        offset += 4 * left
+
+        changes = json.loads(data[offset:offset + extra_size]) if extra_size else {}
+        for pet_id, name, owner, color, *fields in changes.get('entered', ()):
+            self._names[pet_id] = name
+            self._fields[pet_id] = tuple(fields)
+            pet = self.pets[name] = {'color': tuple(color), 'owner': owner}
+            self._set_fields(pet, fields)
+        for food_id in changes.get('food_gone', ()):
+            del self.food[food_id]
+        for food_id, x, y in changes.get('food_added', ()):
+            self.food[food_id] = {'id': food_id, 'x': x, 'y': y}
+        if 'messages' in changes:
+            self.messages = [{'text': text} for text in changes['messages']]
+        if 'code' in changes:
+            self.show_code, self.current_code = changes['code']
+
+    @staticmethod
+    def _set_fields(pet, fields):
+        for field, steps, value in zip(FIELDS, STEPS, fields):
+            pet[field] = value / steps
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def _bot(host, port, number, seconds, seed):
+    """A test player: looks around, adopts a pet, drops food now and then"""
+    rng = random.Random(seed)
+    client = await PetClient.connect(host, port, f"Bot {number}")
+    width, height = client.width, client.height
+    x, y = rng.uniform(0, max(0, width - 800)), rng.uniform(0, max(0, height - 600))
+    await client.command('view', x, y, x + 800, y + 600)
+    await client.command('adopt', f"Bot{number}Pet")
+
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    next_action = loop.time() + 1
+    while loop.time() < end:
+        try:
+            await asyncio.wait_for(client.receive(), timeout=max(0.01, end - loop.time()))
+        except asyncio.TimeoutError:
+            break
+        if loop.time() >= next_action:
+            next_action += 1
+            # Wander a little and sometimes feed the pets in view
+            x = min(max(0, x + rng.uniform(-100, 100)), max(0, width - 800))
+            y = min(max(0, y + rng.uniform(-100, 100)), max(0, height - 600))
+            await client.command('view', x, y, x + 800, y + 600)
+            if rng.random() < 0.3:
+                await client.command('add_food', int(x + 400), int(y + 300))
+    await client.close()
+    return client
+
+
+async def _run_bots(server, host, port, bots, seconds):
+    clients = await asyncio.gather(*(_bot(host, port, i, seconds, i) for i in range(bots)))
+    await server.close()
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    received = sum(client.bytes_received for client in clients)
+    print(f"👥 {bots} players for {seconds}s, {len(server.world.pets)} pets in the world")
+    print(f"⏱️  {server.ticks_run / seconds:.1f} ticks/s, {1000 * server.tick_seconds / max(1, server.ticks_run):.2f} ms "
+          f"per tick on average, slowest {1000 * server.slowest_tick:.1f} ms")
+    print(f"📡 {received / bots / seconds / 1024:.1f} KB/s per player, "
+          f"{sum(client.updates for client in clients) / bots / seconds:.1f} updates/s per player")
+    if latencies:
+        print(f"📬 Latency: median {1000 * latencies[len(latencies) // 2]:.1f} ms, "
+              f"99th percentile {1000 * latencies[int(len(latencies) * 0.99)]:.1f} ms")
+
+
+async def _main(args):
+    width, height = (int(size) for size in args.world.lower().split('x'))
+    pets = None
+    if args.pets:
+        from pet_shards import random_pets
+        from pet_world import PetAI
+        pets = {name: dict(pet, ai=PetAI(name, pet['personality']))
+                for name, pet in random_pets(args.pets, width, height, seed=args.seed or 0).items()}
+    world = PetWorld(width, height, pets, backend=args.backend, seed=args.seed)
+    server = PetServer(world, send_hz=args.send_hz)
+    port = await server.start(args.host, args.port)
+    print(f"🌍 Pet world {width}x{height} on {args.host}:{port}")
+    if args.bots:
+        await _run_bots(server, args.host, port, args.bots, args.seconds)
+    else:
+        await server.loop_task
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Share one pet world with a whole class")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--world', default='3000x3000', help="world size in pixels")
+    parser.add_argument('--pets', type=int, default=0, help="start with this many random pets")
+    parser.add_argument('--backend', choices=('dict', 'numpy'), default='dict')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--send-hz', type=float, default=SEND_HZ, help="updates per second to each player")
+    parser.add_argument('--bots', type=int, default=0, help="connect this many test players, then report")
+    parser.add_argument('--seconds', type=float, default=10, help="how long the test players play")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        print("👋 Server stopped")
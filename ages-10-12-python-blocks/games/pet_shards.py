@@ -0,0 +1,466 @@
+# Pet Shards - one huge pet world split across worker processes
+# The arena is cut into vertical strips and each strip's pets are updated
+# by a worker in a multiprocessing pool. Pet state lives in shared memory,
+# so workers read their neighbours directly instead of sending them around.
+#
+#   world = ShardedWorld(random_pets(100000, 3200, 2400), width=3200, height=2400, shards=8)
+#   world.step(60)
+#   world.close()
+#
+# Each tick has two phases, both run by every shard in parallel:
+#   1. decide and move: the shard's own pets, from the state at the start
+#      of the tick (like PetWorld(backend='numpy'))
+#   2. interact: happiness from friends and which food each pet can reach
+# Stats are double-buffered: phase 1 writes the buffer the tick is building
+# while everyone still reads the finished one, so ghosts (pets just over a
+# strip border) are never seen half-updated. The main process then settles
+# food, swaps the buffers and hands pets that crossed a border to the shard
+# that now owns them.
+
+import math
+import random
+from collections.abc import Mapping
+from multiprocessing import Pool, shared_memory
+
+from pet_arrays import np, personality_row
+from pet_flow import arena_flow
+from pet_moves import act, move_toward
+from pet_policy import REST, EXPLORE, GOALS, decide, needy_mask
+from pet_spatial import close_pairs
+from pet_world import EAT_RADIUS, PET_COLORS, SOCIAL_RADIUS, FoodAndMessages
+
+# Rows of the stats block
+X, Y, HUNGER, ENERGY, HAPPINESS = range(5)
+
+# Slots in the shared header
+TICK, CURRENT, PET_COUNT, FOOD_COUNT, FOOD_VERSION, NEEDY, OBSTACLE_COUNT, SEED = range(8)
+
+# How far past its strip a shard looks for friends to walk to
+GHOST_MARGIN = 2 * SOCIAL_RADIUS
+
+MAX_FOOD = 1024
+MAX_OBSTACLES = 256
+
+
+class SharedState:
+    """Every array the shards share, laid out in one shared memory block"""
+
+    def __init__(self, capacity, name=None):
+        self.capacity = capacity
+        layout = [
+            ('header', (8,), 'int64'),
+            ('stats', (2, 5, capacity), 'float64'),   # [buffer, field, pet]
+            ('goals', (2, capacity), 'int8'),
+            ('owner', (capacity,), 'int32'),          # Shard updating each pet
+            ('personality', (capacity, 5), 'float64'),
+            ('food', (MAX_FOOD, 2), 'float64'),
+            ('obstacles', (MAX_OBSTACLES, 4), 'float64'),
+        ]
+        size = sum(8 * math.ceil(np.dtype(dtype).itemsize * math.prod(shape) / 8)
+                   for _, shape, dtype in layout)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+        offset = 0
+        self.fields = [field for field, _, _ in layout]
+        for field, shape, dtype in layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            setattr(self, field, array)
+            offset += 8 * math.ceil(array.nbytes / 8)
+
+    def close(self):
+        # The arrays must go before the block can be closed
+        for field in self.fields:
+            setattr(self, field, None)
+        self.shm.close()
+
+
+def random_pets(count, width=800, height=600, seed=0):
+    """A crowd of pets with random stats and personalities, for big demos"""
+    rng = random.Random(seed)
+    colors = list(PET_COLORS.values())
+    pets = {}
+    for i in range(count):
+        pets[f"Pet{i}"] = {
+            'x': rng.uniform(25, width - 25),
+            'y': rng.uniform(25, height - 150),
+            'hunger': rng.uniform(0, 100),
+            'energy': rng.uniform(0, 100),
+            'happiness': rng.uniform(0, 100),
+            'color': colors[i % len(colors)],
+            'personality': {'hunger': rng.random(), 'energy': rng.random(), 'social': rng.random(),
+                            'help_others': rng.random(), 'helpful': rng.random()},
+        }
+    return pets
+
+
+# Per-process state for the shard functions, set up by _init_worker
+_worker = {}
+
+
+def _init_worker(name, capacity, config):
+    _worker.clear()
+    _worker['state'] = SharedState(capacity, name)
+    _worker['config'] = config
+    _worker['flow'] = None
+    _worker['food_version'] = None
+
+
+def _flow():
+    """This process's flow fields, rebuilt when walls appear and refed when food changes"""
+    state, config = _worker['state'], _worker['config']
+    header = state.header
+    flow = _worker['flow']
+    obstacles = int(header[OBSTACLE_COUNT])
+    if flow is None or len(flow.obstacles) != obstacles:
+        flow = arena_flow(config['width'], config['height'], config['bounds'])
+        for x0, y0, x1, y1 in state.obstacles[:obstacles].tolist():
+            flow.add_obstacle(x0, y0, x1, y1)
+        _worker['flow'] = flow
+        _worker['food_version'] = None
+    if _worker['food_version'] != header[FOOD_VERSION]:
+        flow.set_food(map(tuple, state.food[:header[FOOD_COUNT]].tolist()))
+        _worker['food_version'] = int(header[FOOD_VERSION])
+    return flow
+
+
+def _strip(shard):
+    config = _worker['config']
+    return shard * config['strip_width'], (shard + 1) * config['strip_width']
+
+
+def _move_shard(shard):
+    """Phase 1: decide, move and tire the pets this shard owns"""
+    state, config = _worker['state'], _worker['config']
+    header = state.header
+    count = int(header[PET_COUNT])
+    current = int(header[CURRENT])
+    now, new = state.stats[current], state.stats[1 - current]
+
+    mine = np.flatnonzero(state.owner[:count] == shard)
+    if len(mine) == 0:
+        return 0
+
+    # Thinking, with the compiled policy, from the start-of-tick state
+    x, y = now[X, mine], now[Y, mine]
+    hunger, energy, happiness = now[HUNGER, mine], now[ENERGY, mine], now[HAPPINESS, mine]
+    needy = needy_mask(hunger, happiness)
+    codes = decide(state.personality[mine], hunger, energy, happiness, header[NEEDY] - needy)
+
+    # Steps as on PetWorld's NumPy backend; helpers and socialisers see
+    # their own shard's pets plus ghosts within GHOST_MARGIN of the strip
+    left, right = _strip(shard)
+    all_x = now[X, :count]
+    visible = np.flatnonzero(((all_x >= left - GHOST_MARGIN) & (all_x < right + GHOST_MARGIN))
+                             | (state.owner[:count] == shard))
+    food = state.food[:header[FOOD_COUNT]]
+    flow = _flow()
+    dx, dy, done = act(codes, x, y, flow, food[:, 0], food[:, 1],
+                       (all_x[visible], now[Y, visible], now[HUNGER, visible], now[HAPPINESS, visible],
+                        np.searchsorted(visible, mine)))
+
+    # Explorers wander; the random numbers depend only on seed, tick and shard
+    rng = np.random.default_rng([int(header[SEED]), int(header[TICK]), shard])
+    left_over = np.flatnonzero(~done)
+    exploring = left_over[codes[left_over] == EXPLORE]
+    dx[exploring], dy[exploring] = rng.integers(-2, 3, (2, len(exploring)))
+
+    # Pets walled off from the resting spots head for a random one; hungry
+    # pets with no food anywhere (and no memory to fall back on) stand still
+    lost = left_over[codes[left_over] == REST]
+    if len(lost):
+        spots = np.array(flow.rest_spots, dtype=float)[rng.integers(0, len(flow.rest_spots), len(lost))]
+        dx[lost], dy[lost] = move_toward(x[lost], y[lost], spots[:, 0], spots[:, 1])
+
+    # Move, staying in bounds and out of walls
+    min_x, min_y, max_x, max_y = config['bounds']
+    new_x = np.clip(x + dx, min_x, max_x)
+    new_y = np.clip(y + dy, min_y, max_y)
+    if header[OBSTACLE_COUNT]:
+        blocked = flow.blocked_array()
+        stuck = blocked[flow.cells(new_x, new_y)] & ~blocked[flow.cells(x, y)]
+        new_x[stuck] = x[stuck]
+        new_y[stuck] = y[stuck]
+
+    new[X, mine] = new_x
+    new[Y, mine] = new_y
+    new[HUNGER, mine] = np.minimum(hunger + 0.1, 100)
+    new[ENERGY, mine] = np.clip(energy + np.where(codes == REST, 1.0, -0.05), 0, 100)
+    new[HAPPINESS, mine] = happiness
+    state.goals[1 - current, mine] = codes
+    return len(mine)
+
+
+def _interact_shard(shard):
+    """Phase 2: cheer up pets near friends and find food in reach.
+
+    Returns {food index: lowest pet index in reach} for the main process
+    to settle, since a food item near a border can be reached from two
+    shards.
+    """
+    state = _worker['state']
+    header = state.header
+    count = int(header[PET_COUNT])
+    new = state.stats[1 - int(header[CURRENT])]
+
+    mine = np.flatnonzero(state.owner[:count] == shard)
+    if len(mine) == 0:
+        return {}
+    x, y = new[X, mine], new[Y, mine]
+
+    # Friends can be ghosts: anyone within SOCIAL_RADIUS of the strip
+    left, right = _strip(shard)
+    all_x = new[X, :count]
+    visible = np.flatnonzero((all_x >= left - SOCIAL_RADIUS) & (all_x < right + SOCIAL_RADIUS))
+    pet_idx, other_idx = close_pairs(x, y, all_x[visible], new[Y, visible], SOCIAL_RADIUS)
+    friends = np.bincount(pet_idx[mine[pet_idx] != visible[other_idx]], minlength=len(mine))
+    new[HAPPINESS, mine] = np.minimum(new[HAPPINESS, mine] + 1.0 * friends, 100)
+
+    food_count = int(header[FOOD_COUNT])
+    if food_count == 0:
+        return {}
+    food = state.food[:food_count]
+    pet_idx, food_idx = close_pairs(x, y, food[:, 0], food[:, 1], EAT_RADIUS)
+    reach = {}
+    for pet, food_index in zip(mine[pet_idx].tolist(), food_idx.tolist()):
+        if pet < reach.get(food_index, count):
+            reach[food_index] = pet
+    return reach
+
+
+class ShardPets(Mapping):
+    """ShardedWorld.pets: name -> pet dict for the finished tick.
+
+    Only the pets asked for get a dict, so drawing the few on screen does
+    not cost a dict for every pet in the world.
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self._snapshot = None
+
+    def snapshot(self):
+        """world.snapshot(), taken at most once per tick"""
+        world = self.world
+        snapshot = self._snapshot
+        if snapshot is None or snapshot['tick'] != world.tick or len(snapshot['x']) != len(world.names):
+            snapshot = self._snapshot = world.snapshot()
+        return snapshot
+
+    def pet(self, slot):
+        snapshot = self.snapshot()
+        return {
+            'x': snapshot['x'][slot].item(), 'y': snapshot['y'][slot].item(),
+            'hunger': snapshot['hunger'][slot].item(), 'energy': snapshot['energy'][slot].item(),
+            'happiness': snapshot['happiness'][slot].item(), 'color': self.world.colors[slot],
+        }
+
+    def __getitem__(self, name):
+        return self.pet(self.world.slots[name])
+
+    def __iter__(self):
+        return iter(self.world.names)
+
+    def __len__(self):
+        return len(self.world.names)
+
+
+class ShardedWorld(FoodAndMessages):
+    """A PetWorld-like world whose pets are updated by worker processes.
+
+    Pets are simpler than in PetWorld: each has stats and a personality but
+    no PetAI object, and decides and moves like the NumPy backend.
+    Helpers and socialisers only see pets within GHOST_MARGIN of their
+    shard. Food, messages and the code panel work as in PetWorld, in the
+    main process. PyGamePetAI can draw one directly.
+
+    processes=0 runs the shards one after another in this process, which
+    is handy for debugging and on single-core machines.
+    """
+
+    def __init__(self, pets, width=800, height=600, shards=4, processes=None,
+                 capacity=None, seed=0):
+        if np is None:
+            raise ImportError("The sharded world needs NumPy: pip install numpy")
+
+        self.width = width
+        self.height = height
+        self.shards = shards
+        self.bounds = (25, 25, width - 25, height - 150)
+        self.rng = random.Random(seed)
+        self.tick = 0
+
+        capacity = capacity or max(64, len(pets))
+        self.state = SharedState(capacity)
+        header = self.state.header
+        header[:] = 0
+        header[SEED] = seed
+        self.state.owner[:] = -1
+
+        self.names = []
+        self.colors = []
+        self.slots = {}  # name -> index in the shared arrays
+        self.pets = ShardPets(self)
+        for name, pet in pets.items():
+            self._append(name, pet)
+
+        self.config = {
+            'width': width,
+            'height': height,
+            'bounds': self.bounds,
+            'strip_width': width / shards,
+        }
+        self._assign_owners()
+
+        # The walls, for where food may land; workers keep their own copies
+        self.flow = arena_flow(width, height, self.bounds)
+        self._start_food_and_messages()
+
+        if processes == 0:
+            _init_worker(self.state.name, capacity, self.config)
+            self.pool = None
+        else:
+            self.pool = Pool(processes or shards, initializer=_init_worker,
+                             initargs=(self.state.name, capacity, self.config))
+
+    def _append(self, name, pet):
+        state = self.state
+        slot = len(self.names)
+        if slot == state.capacity:
+            raise ValueError(f"The sharded world is full ({state.capacity} pets)")
+        current = int(state.header[CURRENT])
+        for field, row in (('x', X), ('y', Y), ('hunger', HUNGER), ('energy', ENERGY), ('happiness', HAPPINESS)):
+            state.stats[current, row, slot] = pet[field]
+        ai = pet.get('ai')
+        personality = ai.personality if ai is not None else pet.get('personality', {})
+        state.personality[slot] = personality_row(personality)
+        self.names.append(name)
+        self.colors.append(pet.get('color', PET_COLORS['pet1']))
+        self.slots[name] = slot
+        state.header[PET_COUNT] = slot + 1
+
+    def add_pet(self, name, x, y, personality, hunger=30, energy=80, happiness=70, color=None):
+        """Add a pet; it joins its shard from the next tick"""
+        self._append(name, {'x': x, 'y': y, 'hunger': hunger, 'energy': energy,
+                            'happiness': happiness, 'color': color, 'personality': personality})
+        self._assign_owners()
+
+    def _assign_owners(self):
+        """Give each pet to the shard whose strip it is standing in"""
+        state = self.state
+        count = int(state.header[PET_COUNT])
+        current = state.stats[int(state.header[CURRENT])]
+        strips = (current[X, :count] // self.config['strip_width']).astype(np.int32)
+        state.owner[:count] = np.clip(strips, 0, self.shards - 1)
+        state.header[NEEDY] = np.count_nonzero(needy_mask(current[HUNGER, :count], current[HAPPINESS, :count]))
+
+    def _run(self, function):
+        if self.pool is None:
+            return [function(shard) for shard in range(self.shards)]
+        return self.pool.map(function, range(self.shards))
+
+    def step(self, n_ticks=1):
+        """Advance every shard by n_ticks fixed ticks"""
+        state = self.state
+        header = state.header
+        for _ in range(n_ticks):
+            header[TICK] = self.tick
+            self.spawn_food()
+
+            self._run(_move_shard)
+            reach = {}
+            for shard_reach in self._run(_interact_shard):
+                for food_index, pet in shard_reach.items():
+                    reach[food_index] = min(pet, reach.get(food_index, pet))
+
+            # Settle food in the buffer being built, then make it current
+            new = state.stats[1 - int(header[CURRENT])]
+            if reach:
+                food = list(self.food.values())
+                for food_index in sorted(reach):
+                    self.remove_food(food[food_index])
+                for pet in sorted(reach.values()):
+                    new[HUNGER, pet] = max(0, new[HUNGER, pet] - 30)
+                    new[HAPPINESS, pet] = min(100, new[HAPPINESS, pet] + 10)
+                    self.add_message(f"{self.names[pet]} found food! 🍎")
+            header[CURRENT] = 1 - header[CURRENT]
+            self._assign_owners()  # Pets that crossed a border change shard
+
+            self.update_food()
+            self.update_messages()
+            self._update_code_panel()
+            self.tick += 1
+        header[TICK] = self.tick
+        return self
+
+    def snapshot(self):
+        """Copies of the finished tick's arrays: x, y, hunger, energy, happiness, goals"""
+        state = self.state
+        count = int(state.header[PET_COUNT])
+        current = int(state.header[CURRENT])
+        stats = state.stats[current, :, :count].copy()
+        return {
+            'tick': self.tick,
+            'x': stats[X], 'y': stats[Y],
+            'hunger': stats[HUNGER], 'energy': stats[ENERGY], 'happiness': stats[HAPPINESS],
+            'goals': state.goals[current, :count].copy(),
+        }
+
+    def pets_in(self, x0, y0, x1, y1):
+        """(name, pet) for every pet whose centre is inside the rectangle"""
+        pets = self.pets
+        snapshot = pets.snapshot()
+        x, y = snapshot['x'], snapshot['y']
+        inside = np.flatnonzero((x >= x0) & (x < x1) & (y >= y0) & (y < y1))
+        return [(self.names[slot], pets.pet(slot)) for slot in inside.tolist()]
+
+    def _food_changed(self):
+        state = self.state
+        food = list(self.food.values())[:MAX_FOOD]
+        for i, item in enumerate(food):
+            state.food[i] = (item['x'], item['y'])
+        state.header[FOOD_COUNT] = len(food)
+        state.header[FOOD_VERSION] += 1
+
+    def _food_fits(self, x, y):
+        # The shared food block has room for MAX_FOOD items
+        return len(self.food) < MAX_FOOD and super()._food_fits(x, y)
+
+    def _pet_goal(self, turn):
+        return self.names[turn], GOALS[self.state.goals[int(self.state.header[CURRENT]), turn]]
+
+    @property
+    def obstacles(self):
+        """Wall rectangles as (x0, y0, x1, y1)"""
+        return self.flow.obstacles
+
+    def add_obstacle(self, x0, y0, x1, y1):
+        """Put a wall in the arena; workers rebuild their flow fields"""
+        state = self.state
+        count = int(state.header[OBSTACLE_COUNT])
+        if count == MAX_OBSTACLES:
+            raise ValueError(f"The sharded world has room for {MAX_OBSTACLES} walls")
+        state.obstacles[count] = (x0, y0, x1, y1)
+        state.header[OBSTACLE_COUNT] = count + 1
+        self.flow.add_obstacle(x0, y0, x1, y1)
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        elif _worker.get('state') is not None:
+            _worker['state'].close()
+            _worker.clear()
+        self.state.close()
+        self.state.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
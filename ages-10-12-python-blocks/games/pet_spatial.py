@@ -0,0 +1,354 @@
+# Pet Spatial - "who is near me?" lookups for the pet simulation
+# Splits the arena into square cells so a pet only compares itself with
+# pets and food in the cells around it instead of with everything.
+
+import math
+
+from pet_arrays import np
+
+
+class SpatialGrid:
+    """Uniform spatial hash of keyed points, updated as they move"""
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}   # (cx, cy) -> {key: (x, y)}
+        self.where = {}   # key -> (cx, cy)
+        self.extent = None  # (min_cx, min_cy, max_cx, max_cy) ever occupied
+
+    def _cell(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, key):
+        return key in self.where
+
+    def clear(self):
+        self.cells.clear()
+        self.where.clear()
+        self.extent = None
+
+    def _add(self, key, cell, x, y):
+        self.cells.setdefault(cell, {})[key] = (x, y)
+        self.where[key] = cell
+        cx, cy = cell
+        if self.extent is None:
+            self.extent = (cx, cy, cx, cy)
+        else:
+            min_cx, min_cy, max_cx, max_cy = self.extent
+            if not (min_cx <= cx <= max_cx and min_cy <= cy <= max_cy):
+                self.extent = (min(min_cx, cx), min(min_cy, cy), max(max_cx, cx), max(max_cy, cy))
+
+    def insert(self, key, x, y):
+        self._add(key, self._cell(x, y), x, y)
+
+    def move(self, key, x, y):
+        """Update a point, only re-bucketing it when it changes cell"""
+        old_cell = self.where.get(key)
+        cell = self._cell(x, y)
+        if old_cell == cell:
+            self.cells[cell][key] = (x, y)
+            return
+        if old_cell is not None:
+            self._discard(old_cell, key)
+        self._add(key, cell, x, y)
+
+    def remove(self, key):
+        cell = self.where.pop(key, None)
+        if cell is not None:
+            self._discard(cell, key)
+
+    def _discard(self, cell, key):
+        bucket = self.cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self.cells[cell]
+
+    def query(self, x, y, radius):
+        """Keys of the points strictly closer than radius to (x, y)"""
+        size = self.cell_size
+        found = []
+        for cx in range(int((x - radius) // size), int((x + radius) // size) + 1):
+            for cy in range(int((y - radius) // size), int((y + radius) // size) + 1):
+                bucket = self.cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for key, (px, py) in bucket.items():
+                    if math.sqrt((x - px)**2 + (y - py)**2) < radius:
+                        found.append(key)
+        return found
+
+    def nearest(self, x, y, exclude=None):
+        """Key of the closest point to (x, y), or None if the grid is empty.
+
+        Searches outward one ring of cells at a time and stops once no
+        unsearched cell can hold anything closer. Ties go to the smallest
+        key, so integer keys in insertion order behave like min() on a list.
+        """
+        if self.extent is None:
+            return None
+
+        size = self.cell_size
+        cx, cy = self._cell(x, y)
+        min_cx, min_cy, max_cx, max_cy = self.extent
+        last_ring = max(cx - min_cx, max_cx - cx, cy - min_cy, max_cy - cy)
+
+        best_key = None
+        best_distance = math.inf
+        ring = 0
+        while ring <= last_ring:
+            for cell in _ring_cells(cx, cy, ring):
+                bucket = self.cells.get(cell)
+                if not bucket:
+                    continue
+                for key, (px, py) in bucket.items():
+                    if key == exclude:
+                        continue
+                    distance = (x - px)**2 + (y - py)**2
+                    if distance < best_distance or (distance == best_distance and key < best_key):
+                        best_key = key
+                        best_distance = distance
+
+            # Every cell further out is at least ring * size away
+            if best_key is not None and best_distance < (ring * size)**2:
+                break
+            ring += 1
+        return best_key
+
+
+def _ring_cells(cx, cy, ring):
+    """Cells at exactly Chebyshev distance ring from (cx, cy)"""
+    if ring == 0:
+        yield (cx, cy)
+        return
+    for dx in range(-ring, ring + 1):
+        yield (cx + dx, cy - ring)
+        yield (cx + dx, cy + ring)
+    for dy in range(-ring + 1, ring):
+        yield (cx - ring, cy + dy)
+        yield (cx + ring, cy + dy)
+
+
+class TargetIndex:
+    """Nearest-target lookups built once per tick and shared by every PetAI.
+
+    Food comes from the world's live food grid, so food eaten earlier in
+    the tick is never chosen. Needy and happy pets are indexed from their
+    stats at the start of the tick.
+    """
+
+    def __init__(self, pets, food_grid, food_by_id, cell_size=80):
+        self.food_grid = food_grid
+        self.food_by_id = food_by_id
+        self.pet_list = []
+        self.keys = {}  # pet name -> key in the needy and happy grids
+        self.needy = SpatialGrid(cell_size)
+        self.happy = SpatialGrid(cell_size)
+
+        arrays = getattr(pets, 'arrays', None)
+        if arrays is not None:
+            # PetTable: pick the needy and happy pets out of the arrays in one go
+            self.pet_list = list(arrays.views)
+            self.keys = dict(zip(arrays.names, range(len(arrays))))
+            x, y, hunger, happiness = arrays.x, arrays.y, arrays.hunger, arrays.happiness
+            for grid, chosen in ((self.needy, (hunger > 70) | (happiness < 30)), (self.happy, happiness > 50)):
+                slots = np.flatnonzero(chosen)
+                for key, px, py in zip(slots.tolist(), x[slots].tolist(), y[slots].tolist()):
+                    grid.insert(key, px, py)
+            return
+
+        for key, (name, pet) in enumerate(pets.items()):
+            x, y = pet['x'], pet['y']
+            self.pet_list.append(pet)
+            self.keys[name] = key
+            if pet['hunger'] > 70 or pet['happiness'] < 30:
+                self.needy.insert(key, x, y)
+            if pet['happiness'] > 50:
+                self.happy.insert(key, x, y)
+
+    def nearest_food(self, x, y):
+        food_id = self.food_grid.nearest(x, y)
+        return self.food_by_id[food_id] if food_id is not None else None
+
+    def nearest_needy_pet(self, x, y, exclude=None):
+        key = self.needy.nearest(x, y, self.keys.get(exclude))
+        return self.pet_list[key] if key is not None else None
+
+    def nearest_happy_pet(self, x, y, exclude=None):
+        key = self.happy.nearest(x, y, self.keys.get(exclude))
+        return self.pet_list[key] if key is not None else None
+
+
+def close_pairs(ax, ay, bx, by, radius):
+    """All (i, j) with point a[i] strictly closer than radius to b[j].
+
+    Vectorized grid search for the NumPy backend: b is bucketed by
+    sorting on cell id, then each a point only meets the b points in
+    the 3x3 block of cells around it, one column of three cells at a time.
+    """
+    if len(ax) == 0 or len(bx) == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+
+    # Cell coordinates, shifted so they are all non-negative
+    a_cx = np.floor_divide(ax, radius).astype(np.int64)
+    a_cy = np.floor_divide(ay, radius).astype(np.int64)
+    b_cx = np.floor_divide(bx, radius).astype(np.int64)
+    b_cy = np.floor_divide(by, radius).astype(np.int64)
+    min_cx = min(a_cx.min(), b_cx.min()) - 1
+    min_cy = min(a_cy.min(), b_cy.min()) - 1
+    a_cx -= min_cx
+    a_cy -= min_cy
+    b_cx -= min_cx
+    b_cy -= min_cy
+    rows = max(a_cy.max(), b_cy.max()) + 2
+    columns = max(a_cx.max(), b_cx.max()) + 2
+
+    # Column-major cell ids, so the three cells of a block column are one sorted run
+    b_cell = b_cx * rows + b_cy
+    order = np.argsort(b_cell, kind='stable')
+    sorted_cells = b_cell[order]
+    if columns * rows <= 16 * (len(ax) + len(bx)) + 65536:
+        # Where each cell's run starts, looked up instead of searched for
+        cell_start = np.searchsorted(sorted_cells, np.arange(columns * rows + 1))
+        runs = lambda first, last: (cell_start[first], cell_start[last + 1])
+    else:
+        runs = lambda first, last: (np.searchsorted(sorted_cells, first, side='left'),
+                                    np.searchsorted(sorted_cells, last, side='right'))
+
+    pairs_a = []
+    pairs_b = []
+    for dcx in (-1, 0, 1):
+        first = (a_cx + dcx) * rows + a_cy - 1
+        start, end = runs(first, first + 2)
+        counts = end - start
+        total = counts.sum()
+        if total == 0:
+            continue
+        # Expand each a point's [start, end) run into one row per candidate
+        a_idx = np.repeat(np.arange(len(ax)), counts)
+        b_idx = order[np.repeat(start - (np.cumsum(counts) - counts), counts) + np.arange(total)]
+        pairs_a.append(a_idx)
+        pairs_b.append(b_idx)
+
+    if not pairs_a:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+    a_idx = np.concatenate(pairs_a)
+    b_idx = np.concatenate(pairs_b)
+    close = (ax[a_idx] - bx[b_idx]) ** 2 + (ay[a_idx] - by[b_idx]) ** 2 < radius ** 2
+    return a_idx[close], b_idx[close]
+
+
+# Below this many query/point pairs, nearest_points() just compares them all
+BRUTE_FORCE_PAIRS = 1 << 21
+
+
+def nearest_points(qx, qy, px, py, exclude=None):
+    """Index of the closest p point to each q point, -1 where there is none.
+
+    SpatialGrid.nearest() for a whole batch of queries: ties go to the
+    smallest index, and exclude (one p index per query, -1 for none)
+    skips a point, such as the pet asking. The points are bucketed by
+    sorting on cell id, with cells about one point big; each query
+    searches a block of cells around it, doubling the block until
+    nothing outside it can be closer, and once few queries are left
+    they compare against every point.
+    """
+    count = len(qx)
+    nearest = np.full(count, -1, dtype=np.intp)
+    if count == 0 or len(px) == 0:
+        return nearest
+    if exclude is None:
+        exclude = np.full(count, -1, dtype=np.intp)
+    if count * len(px) <= BRUTE_FORCE_PAIRS:
+        return _nearest_brute(qx, qy, px, py, exclude, np.arange(count), nearest)
+
+    # The grid covers the points; queries outside it start from its edge
+    min_x, min_y = px.min(), py.min()
+    width, height = px.max() - min_x, py.max() - min_y
+    size = math.sqrt(width * height / len(px)) or max(width, height, 1.0) / len(px)
+    columns = int(width // size) + 1
+    rows = int(height // size) + 1
+
+    # Row-major cell ids, so each row of a block is one run of the sorted points
+    p_cell = ((py - min_y) // size).astype(np.int64) * columns + ((px - min_x) // size).astype(np.int64)
+    order = np.argsort(p_cell, kind='stable')
+    # Where each cell's run starts in the sorted points, plus one past the end
+    cell_start = np.searchsorted(p_cell[order], np.arange(columns * rows + 1))
+    q_x, q_y = qx - min_x, qy - min_y
+    q_cx = np.clip(q_x // size, 0, columns - 1).astype(np.int64)
+    q_cy = np.clip(q_y // size, 0, rows - 1).astype(np.int64)
+
+    best = np.full(count, np.inf)
+    pending = np.arange(count)
+    radius = 1
+    while len(pending):
+        if len(pending) * len(px) <= BRUTE_FORCE_PAIRS:
+            return _nearest_brute(qx, qy, px, py, exclude, pending, nearest)
+
+        cx, cy = q_cx[pending], q_cy[pending]
+        left, right = np.maximum(cx - radius, 0), np.minimum(cx + radius, columns - 1)
+        top, bottom = np.maximum(cy - radius, 0), np.minimum(cy + radius, rows - 1)
+        for row in range(-radius, radius + 1):
+            row = cy + row
+            inside = (row >= top) & (row <= bottom)
+            row = np.where(inside, row, 0) * columns
+            start = cell_start[row + left]
+            counts = np.where(inside, cell_start[row + right + 1] - start, 0)
+            total = counts.sum()
+            if total == 0:
+                continue
+
+            # One entry per (query, candidate), grouped by query
+            firsts = np.cumsum(counts) - counts
+            q = np.repeat(pending, counts)
+            p = order[np.repeat(start - firsts, counts) + np.arange(total)]
+            distance = (qx[q] - px[p]) ** 2 + (qy[q] - py[p]) ** 2
+            distance[p == exclude[q]] = np.inf
+
+            # Closest candidate per query, smallest index among equals
+            seen = counts > 0
+            firsts = firsts[seen]
+            row_best = np.minimum.reduceat(distance, firsts)
+            ties = distance == np.repeat(row_best, counts[seen])
+            row_index = np.minimum.reduceat(np.where(ties, p, len(px)), firsts)
+            who = pending[seen]
+            better = (row_best < best[who]) | ((row_best == best[who]) & (row_index < nearest[who]))
+            best[who[better]] = row_best[better]
+            nearest[who[better]] = row_index[better]
+
+        # Anything else is in the grid's cells left of, right of, above or below the block
+        x, y = q_x[pending], q_y[pending]
+        grid_x, grid_y = columns * size, rows * size
+        reach = np.minimum(
+            np.minimum(_rect_distance(x, y, 0, left * size, 0, grid_y, left > 0),
+                       _rect_distance(x, y, (right + 1) * size, grid_x, 0, grid_y, right < columns - 1)),
+            np.minimum(_rect_distance(x, y, 0, grid_x, 0, top * size, top > 0),
+                       _rect_distance(x, y, 0, grid_x, (bottom + 1) * size, grid_y, bottom < rows - 1)))
+        pending = pending[~(best[pending] < reach * (1 - 1e-9))]
+        radius *= 2
+    return nearest
+
+
+def _rect_distance(x, y, x0, x1, y0, y1, present):
+    """Squared distance from each point to its rectangle, inf where there is none"""
+    dx = np.maximum(np.maximum(x0 - x, x - x1), 0)
+    dy = np.maximum(np.maximum(y0 - y, y - y1), 0)
+    return np.where(present, dx * dx + dy * dy, np.inf)
+
+
+def _nearest_brute(qx, qy, px, py, exclude, queries, nearest):
+    """nearest_points() for the chosen queries by comparing every pair"""
+    chunk = max(1, BRUTE_FORCE_PAIRS // len(px))
+    for first in range(0, len(queries), chunk):
+        q = queries[first:first + chunk]
+        distance = (qx[q, None] - px) ** 2 + (qy[q, None] - py) ** 2
+        skip = np.flatnonzero(exclude[q] >= 0)
+        distance[skip, exclude[q[skip]]] = np.inf
+        index = distance.argmin(axis=1)
+        found = distance[np.arange(len(q)), index] < np.inf
+        nearest[q] = np.where(found, index, -1)
+    return nearest
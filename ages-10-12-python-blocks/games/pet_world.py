@@ -0,0 +1,944 @@
+# Pet World - headless simulation core for the Python Pet AI game
+# Runs the pets, food and messages without pygame, so it can be
+# fast-forwarded for classroom replays and batch experiments.
+#
+#   world = PetWorld()
+#   world.step(600)                                  # 10 seconds of game time
+#   world.run_until(lambda w: w.pets['Luna']['hunger'] > 70)
+#   world.add_obstacle(380, 25, 400, 350)            # A wall to walk around
+#
+# PetWorld(backend='numpy') keeps the pets in NumPy arrays (see pet_arrays.py)
+# for ecosystems with thousands of pets.
+#
+# PetWorld(seed=42) makes every random choice come from that seed, so the
+# same seed and the same inputs always play out the same way (pet_replay.py
+# records and replays sessions). With pet_rngs=True every pet also gets a
+# random stream of its own, so adding a pet does not change what the
+# others do.
+#
+# Worlds can be much bigger than the screen. The map is split into
+# CHUNK_SIZE squares; after world.set_focus(x0, y0, x1, y1) (usually what
+# the camera sees) only pets in chunks near the focus are simulated in
+# full, and pets further away re-plan every FAR_PET_PERIOD ticks and keep
+# walking the same way in between.
+
+import random
+import math
+from collections import deque
+from functools import lru_cache, wraps
+from itertools import islice
+
+from pet_arrays import PetTable, np
+from pet_flow import FLOW_MAX_CELLS, arena_flow
+from pet_memory import ATE_FOOD, HELPED_FRIEND, MET_FRIEND, NameTable, PetMemory
+from pet_spatial import SpatialGrid, TargetIndex, close_pairs
+from pet_moves import act
+from pet_policy import EXPLORE, GOALS, GOAL_CODES, HELP_FRIEND, REST, decide, needy_mask
+from pet_scheduling import AIScheduler, ExpiryQueue, FoodSpawner
+
+# One tick is one frame of the original 60 FPS game
+TICKS_PER_SECOND = 60
+FOOD_LIFETIME = 300      # Food disappears after 5 seconds
+MESSAGE_LIFETIME = 180   # 3 seconds at 60 FPS
+MAX_MESSAGES = 5
+
+SOCIAL_RADIUS = 40       # Pets closer than this cheer each other up
+EAT_RADIUS = 30          # Pets closer than this to food eat it
+FOOD_ALERT_RADIUS = 150  # Pets this close to new food re-plan straight away
+MEET_LOG_INTERVAL = 60   # Each pet notes down the friends around it once a second
+CODE_DISPLAY_INTERVAL = 60  # The code panel moves on to the next pet once a second
+
+CHUNK_SIZE = 256         # Side of a map chunk, in world pixels
+FOCUS_MARGIN = 1         # Chunks around the focus that are still simulated in full
+FAR_PET_PERIOD = 8       # Pets far from the focus re-plan once every this many ticks
+CLASSIC_FOOD_AREA = 700 * 400  # Where food lands in the original 800x600 arena
+
+# What the code panel shows for each goal, filled in with the pet's name
+CODE_TEMPLATES = {
+    'find_food': """# {pet_name}'s AI Decision
+if my_hunger > 70:
+    goal = 'find_food'
+    move_toward(closest_food)
+    print('{pet_name}: I need food!')""",
+
+    'help_friend': """# {pet_name}'s AI Decision
+if friend.happiness < 30:
+    goal = 'help_friend'
+    move_toward(friend)
+    print('{pet_name}: My friend needs help!')""",
+
+    'socialize': """# {pet_name}'s AI Decision
+if my_happiness < 50:
+    goal = 'socialize'
+    find_happy_friend()
+    print('{pet_name}: Time to make friends!')""",
+
+    'rest': """# {pet_name}'s AI Decision
+if my_energy < 20:
+    goal = 'rest'
+    find_quiet_spot()
+    print('{pet_name}: I need to rest...')"""
+}
+
+
+@lru_cache(maxsize=4096)
+def code_for(pet_name, action):
+    """The code panel text for a pet's action, filled in once and reused"""
+    template = CODE_TEMPLATES.get(action)
+    return template.format(pet_name=pet_name) if template is not None else "# AI thinking..."
+
+
+PET_COLORS = {
+    'pet1': (255, 105, 180),        # Hot pink
+    'pet2': (60, 179, 113),         # Sea green
+    'pet3': (255, 165, 0),          # Orange
+}
+
+
+class PetAI:
+    """Simple AI system for pet behavior"""
+
+    def __init__(self, pet_name, personality_weights):
+        self.name = pet_name
+        self.personality = personality_weights
+        self.memory = PetMemory()  # Recent meals and friends, see pet_memory.py
+        self.current_goal = None
+        self.rng = None  # This pet's own random stream, if the world gives it one
+        self.last_move = None  # Kept up by far-away pets between re-plans (in PetArrays with NumPy)
+
+    def think(self, game_state):
+        """AI decision making based on needs and personality"""
+
+        # Analyze current situation
+        my_pet = game_state['pets'][self.name]
+        summary = game_state.get('summary')
+        if summary is not None:
+            # PetWorld keeps a running count of pets that need help
+            needy_friends = summary.needy_count(exclude=self.name)
+        else:
+            other_pets = [p for name, p in game_state['pets'].items() if name != self.name]
+            needy_friends = sum(1 for p in other_pets if p['hunger'] > 70 or p['happiness'] < 30)
+
+        # Calculate urgency for different needs
+        needs = {
+            'hunger': max(0, my_pet['hunger'] - 30) / 70.0,  # 0-1 scale
+            'energy': max(0, 100 - my_pet['energy']) / 70.0,
+            'social': max(0, 50 - my_pet['happiness']) / 50.0,
+            'help_others': needy_friends
+        }
+
+        # Weight needs by personality
+        weighted_needs = {}
+        for need, urgency in needs.items():
+            weight = self.personality.get(need, 0.5)
+            weighted_needs[need] = urgency * weight
+
+        # Choose action based on highest weighted need
+        if weighted_needs['hunger'] > 0.7:
+            self.current_goal = 'find_food'
+        elif weighted_needs['energy'] > 0.8:
+            self.current_goal = 'rest'
+        elif weighted_needs['help_others'] > 0.5 and self.personality.get('helpful', 0) > 0.6:
+            self.current_goal = 'help_friend'
+        elif weighted_needs['social'] > 0.4:
+            self.current_goal = 'socialize'
+        else:
+            self.current_goal = 'explore'
+
+        return self.current_goal
+
+    def execute_action(self, action, game_state):
+        """Execute the chosen action"""
+
+        my_pet = game_state['pets'][self.name]
+        rng = self.rng if self.rng is not None else game_state.get('rng', random)
+
+        # PetWorld shares one nearest-target index between all pets each tick,
+        # and flow fields that point every spot toward food and rest
+        targets = game_state.get('targets')
+        flow = game_state.get('flow')
+
+        if action == 'find_food':
+            # Move toward food
+            if flow is not None:
+                movement = flow.food_move(my_pet['x'], my_pet['y'])
+                if movement is not None:
+                    return movement
+            # Off the flow field (e.g. stuck in a wall): head straight for it
+            if targets is not None:
+                closest_food = targets.nearest_food(my_pet['x'], my_pet['y'])
+                if closest_food is not None:
+                    return self.move_toward(my_pet, closest_food)
+            elif game_state['food_items']:
+                closest_food = min(game_state['food_items'],
+                                 key=lambda f: self.distance_to(my_pet, f))
+                return self.move_toward(my_pet, closest_food)
+
+            # No food anywhere: go back to where I last found some
+            meal = self.memory.last(ATE_FOOD)
+            if meal is not None:
+                return self.move_toward(my_pet, {'x': meal.x, 'y': meal.y})
+
+        elif action == 'help_friend':
+            # Find pet that needs help
+            if targets is not None:
+                friend = targets.nearest_needy_pet(my_pet['x'], my_pet['y'], self.name)
+                if friend is not None:
+                    return self.move_toward(my_pet, friend)
+                return None
+
+            other_pets = [p for name, p in game_state['pets'].items() if name != self.name]
+            needy_pets = [p for p in other_pets if p['hunger'] > 70 or p['happiness'] < 30]
+
+            if needy_pets:
+                friend = needy_pets[0]
+                return self.move_toward(my_pet, friend)
+
+        elif action == 'socialize':
+            # Move toward other happy pets
+            if targets is not None:
+                friend = targets.nearest_happy_pet(my_pet['x'], my_pet['y'], self.name)
+                if friend is not None:
+                    return self.move_toward(my_pet, friend)
+                return None
+
+            other_pets = [p for name, p in game_state['pets'].items()
+                         if name != self.name and p['happiness'] > 50]
+            if other_pets:
+                friend = rng.choice(other_pets)
+                return self.move_toward(my_pet, friend)
+
+        elif action == 'rest':
+            # Find quiet corner
+            if flow is not None:
+                movement = flow.rest_move(my_pet['x'], my_pet['y'])
+                if movement is not None:
+                    return movement
+            corner = {'x': rng.choice([50, 750]), 'y': rng.choice([50, 550])}
+            return self.move_toward(my_pet, corner)
+
+        else:  # explore
+            # Random movement
+            return {
+                'dx': rng.randint(-2, 2),
+                'dy': rng.randint(-2, 2)
+            }
+
+    def distance_to(self, pet, target):
+        """Calculate distance between pet and target"""
+        return math.sqrt((pet['x'] - target['x'])**2 + (pet['y'] - target['y'])**2)
+
+    def move_toward(self, pet, target):
+        """Calculate movement vector toward target"""
+        dx = target['x'] - pet['x']
+        dy = target['y'] - pet['y']
+        distance = math.sqrt(dx*dx + dy*dy)
+
+        if distance > 0:
+            # Normalize and scale movement
+            speed = 2
+            return {
+                'dx': int((dx / distance) * speed),
+                'dy': int((dy / distance) * speed)
+            }
+        return {'dx': 0, 'dy': 0}
+
+
+def default_pets():
+    """The three starter pets from the original game"""
+    return {
+        'Buddy': {
+            'x': 200, 'y': 200,
+            'hunger': 30,
+            'energy': 80,
+            'happiness': 70,
+            'color': PET_COLORS['pet1'],
+            'ai': PetAI('Buddy', {'helpful': 0.8, 'social': 0.7, 'hunger': 0.6})
+        },
+        'Luna': {
+            'x': 400, 'y': 300,
+            'hunger': 50,
+            'energy': 60,
+            'happiness': 40,
+            'color': PET_COLORS['pet2'],
+            'ai': PetAI('Luna', {'helpful': 0.4, 'social': 0.3, 'hunger': 0.8})
+        },
+        'Dash': {
+            'x': 600, 'y': 150,
+            'hunger': 20,
+            'energy': 90,
+            'happiness': 80,
+            'color': PET_COLORS['pet3'],
+            'ai': PetAI('Dash', {'helpful': 0.6, 'social': 0.9, 'hunger': 0.4})
+        }
+    }
+
+
+class WorldSummary:
+    """Who needs help, who is happy and who is hungry, for one tick.
+
+    Built once per tick and refreshed whenever a pet's stats change, so
+    PetAI.think() can read the counts instead of scanning every pet.
+    """
+
+    def __init__(self, pets):
+        self.pets = pets
+        self.needy = {}    # Used as ordered sets of pet names
+        self.happy = {}
+        self.hungry = {}
+        for name, pet in pets.items():
+            self.refresh(name, pet)
+
+    def refresh(self, name, pet=None):
+        """Re-file one pet after its hunger or happiness changed"""
+        if pet is None:
+            pet = self.pets[name]
+        hungry = pet['hunger'] > 70
+        _mark(self.needy, name, hungry or pet['happiness'] < 30)
+        _mark(self.happy, name, pet['happiness'] > 50)
+        _mark(self.hungry, name, hungry)
+
+    def needy_count(self, exclude=None):
+        """How many pets (other than exclude) are hungry or sad"""
+        return len(self.needy) - (exclude in self.needy)
+
+    def happy_count(self, exclude=None):
+        return len(self.happy) - (exclude in self.happy)
+
+    def hungry_count(self, exclude=None):
+        return len(self.hungry) - (exclude in self.hungry)
+
+
+def _mark(names, name, present):
+    if present:
+        names[name] = True
+    else:
+        names.pop(name, None)
+
+
+def default_food_spawner(width, height, seed=None):
+    """The FoodSpawner a world of this size gets unless it is given one.
+
+    Food arrives at random times: about one every 50 ticks, at most 3 at
+    once in the original arena, and as much again for each arena's worth
+    of space in a bigger world.
+    """
+    spawner = FoodSpawner(seed=seed)
+    scale = max(1, round((width - 100) * (height - 200) / CLASSIC_FOOD_AREA))
+    spawner.add_region((50, width - 50), (50, height - 150), rate=0.02 * scale, cap=3 * scale)
+    return spawner
+
+
+def command(method):
+    """Mark a world method as an input from outside the simulation.
+
+    Calls made between ticks (not by the simulation itself, nor by
+    another command) are passed to the world's input_observers as
+    observer(name, args, kwargs) once they have worked, which is how
+    pet_history.History replays them after a rewind.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def run(self, *args, **kwargs):
+        if self._busy:
+            return method(self, *args, **kwargs)
+        self._busy = True
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            self._busy = False
+        for observer in self.input_observers:
+            observer(name, args, kwargs)
+        return result
+    return run
+
+
+class FoodAndMessages:
+    """Food, the message log and the code panel, for PetWorld and ShardedWorld.
+
+    A world using this has width, height, tick, rng, flow and pets, calls
+    _start_food_and_messages() from __init__ and can hook in with:
+    _food_added(food) and _food_gone(food) for each item, _food_changed()
+    after any change, _food_fits(x, y) for where spawned food may land and
+    _pet_goal(turn) for the code panel.
+    """
+
+    input_observers = ()  # See command()
+    _busy = False         # True while stepping or running a command
+
+    def _start_food_and_messages(self, food_spawner=None):
+        self.food = {}  # food id -> food item, oldest first
+        self.messages = deque(maxlen=MAX_MESSAGES)  # Keep last 5 messages
+
+        # Food is filed under the tick it spoils instead of counting down
+        self._food_expiry = ExpiryQueue()
+        self._next_food_id = 0
+
+        if food_spawner is None:
+            food_spawner = default_food_spawner(self.width, self.height, self.rng.getrandbits(32))
+        self.food_spawner = food_spawner
+
+        # Code display, changed on a timer rather than by dice rolls
+        self.show_code = False
+        self.current_code = ""
+        self.next_code_display = CODE_DISPLAY_INTERVAL
+        self._code_turn = 0
+
+    def _food_added(self, food):
+        pass
+
+    def _food_gone(self, food):
+        pass
+
+    def _food_changed(self):
+        pass
+
+    def _food_fits(self, x, y):
+        """Whether food the spawner picked this spot for may land here"""
+        return not (self.flow.obstacles and self.flow.is_blocked(x, y))
+
+    @property
+    def food_items(self):
+        """All food in the world, oldest first"""
+        return self.food.values()
+
+    @command
+    def add_food(self, x=None, y=None, lifetime=FOOD_LIFETIME, region=None):
+        """Drop a food item, at a random spot unless x and y are given"""
+        if x is None:
+            x = self.rng.randint(50, self.width - 50)
+        if y is None:
+            y = self.rng.randint(50, self.height - 150)
+        if region is None:
+            region = self.food_spawner.claim(x, y)
+
+        # Food ids count up, so the food grid breaks ties in spawn order
+        food = {
+            'id': self._next_food_id,
+            'x': x,
+            'y': y,
+            'region': region,
+            'expires': self.tick + lifetime - 1  # Gone at the end of this tick
+        }
+        self._next_food_id += 1
+        self.food[food['id']] = food
+        self._food_expiry.schedule(food['id'], food['expires'])
+        self._food_added(food)
+        self._food_changed()
+        return food
+
+    def remove_food(self, food):
+        """Take a food item out of the world (eaten or spoiled)"""
+        del self.food[food['id']]
+        self._food_expiry.cancel(food['id'])
+        self.food_spawner.release(food['region'])
+        self._food_gone(food)
+        self._food_changed()
+
+    def spawn_food(self):
+        """Add the food the spawner has due this tick"""
+        spawner = self.food_spawner
+        if spawner.next_tick is None or spawner.next_tick > self.tick:
+            return  # Nothing arrives this tick
+        for region, x, y, lifetime in spawner.due(self.tick):
+            if not self._food_fits(x, y):
+                spawner.release(region)  # Landed in a wall
+                continue
+            self.add_food(x, y, lifetime if lifetime is not None else FOOD_LIFETIME, region)
+
+    def update_food(self):
+        """Spoil food whose time is up"""
+        spoiled = self._food_expiry.pop_expired(self.tick)
+        for food_id in spoiled:
+            food = self.food.pop(food_id)
+            self.food_spawner.release(food['region'])
+            self._food_gone(food)
+        if spoiled:
+            self._food_changed()
+
+    @command
+    def add_message(self, message):
+        """Add message to game log"""
+        self.messages.append({
+            'text': message,
+            'expires': self.tick + MESSAGE_LIFETIME - 1  # 3 seconds at 60 FPS
+        })
+
+    def update_messages(self):
+        """Drop messages whose time is up"""
+        # Every message lives equally long, so the oldest always goes first
+        messages = self.messages
+        while messages and messages[0]['expires'] <= self.tick:
+            messages.popleft()
+
+    def _update_code_panel(self):
+        """Show what the next pet is thinking, once every CODE_DISPLAY_INTERVAL ticks"""
+        if self.tick >= self.next_code_display:
+            self.show_next_code()
+            self.next_code_display = self.tick + CODE_DISPLAY_INTERVAL
+
+    def generate_code_display(self, pet_name, action):
+        """Show Python code representation of AI thinking"""
+        self.current_code = code_for(pet_name, action)
+        self.show_code = True
+
+    def show_next_code(self):
+        """Put the next pet's current goal up on the code panel, taking turns"""
+        if not self.pets:
+            return
+        turn = self._code_turn % len(self.pets)
+        self._code_turn = turn + 1
+        self.generate_code_display(*self._pet_goal(turn))
+
+    @command
+    def toggle_code(self):
+        """Show or hide the Python code panel"""
+        self.show_code = not self.show_code
+
+
+class PetWorld(FoodAndMessages):
+    """Pets, food and messages advanced one fixed tick at a time.
+
+    Nothing here touches the screen or fonts: PyGamePetAI draws a
+    PetWorld, and scripts can step one as fast as the CPU allows.
+    """
+
+    def __init__(self, width=800, height=600, pets=None, rng=None, backend='dict', food_spawner=None,
+                 ai_scheduler=None, seed=None, pet_rngs=False):
+        self.width = width
+        self.height = height
+        if seed is not None:
+            rng = random.Random(seed)
+        self.rng = rng if rng is not None else random
+        self.seed = seed
+        self.pet_rngs = pet_rngs
+        self.tick = 0
+
+        # Where pet centres may go: the bottom 150 pixels are the status panel
+        self.bounds = (25, 25, width - 25, height - 150)
+
+        # Game state
+        if pets is None:
+            pets = default_pets()
+        if backend == 'numpy':
+            pets = PetTable.from_dicts(pets)
+        elif backend != 'dict':
+            raise ValueError(f"Unknown pet backend {backend!r}: use 'dict' or 'numpy'")
+        self.backend = backend
+        self.pets = pets
+
+        # Partner names in this world's pet memories, as small ids
+        self.partners = NameTable()
+        for pet in pets.values():
+            pet['ai'].memory.use_names(self.partners)
+        if pet_rngs:
+            for name, pet in pets.items():
+                self._seed_pet(name, pet['ai'])
+        self._start_food_and_messages(food_spawner)
+
+        # Who re-plans when; AIScheduler(period=4) spreads thinking over 4 ticks
+        self.ai_scheduler = ai_scheduler if ai_scheduler is not None else AIScheduler()
+        self._phases = (None, None)  # ((PetArrays.version, period), phase per slot) for numpy
+        self._partner_ids = (None, None)  # ((PetArrays.version, partners), partners id per slot)
+
+        # Shared directions to food and to the resting corners, and the walls
+        self.flow = arena_flow(width, height, self.bounds)
+
+        # Chunks simulated in full, as (cx0, cy0, cx1, cy1); None means all
+        self.focus = None
+
+        # Called as observer(world) after every tick, e.g. by pet_history.History,
+        # and as observer(name, args, kwargs) after every command()
+        self.observers = []
+        self.input_observers = []
+
+        # Spatial indexes over pets and food, kept up to date as things move
+        self._pet_grid = SpatialGrid(SOCIAL_RADIUS)
+        self._food_grid = SpatialGrid(SOCIAL_RADIUS)
+
+    def step(self, n_ticks=1):
+        """Advance the simulation by n_ticks fixed ticks"""
+        for _ in range(n_ticks):
+            self._busy = True  # Food and messages from here on are not inputs
+            try:
+                self.spawn_food()
+                self.update_pets()
+                self.update_food()
+                self.update_messages()
+
+                self._update_code_panel()
+            finally:
+                self._busy = False
+
+            self.tick += 1
+            for observer in self.observers:
+                observer(self)
+        return self
+
+    def run_until(self, condition, max_ticks=None):
+        """Step until condition(world) is true; returns the ticks taken.
+
+        Stops early after max_ticks if given, so a condition that never
+        comes true cannot hang a batch job.
+        """
+        ticks = 0
+        while not condition(self):
+            if max_ticks is not None and ticks >= max_ticks:
+                break
+            self.step()
+            ticks += 1
+        return ticks
+
+    @command
+    def set_focus(self, x0, y0, x1, y1):
+        """Simulate pets in full only in the chunks around this area"""
+        self.focus = (int(x0 // CHUNK_SIZE) - FOCUS_MARGIN, int(y0 // CHUNK_SIZE) - FOCUS_MARGIN,
+                      int(x1 // CHUNK_SIZE) + FOCUS_MARGIN, int(y1 // CHUNK_SIZE) + FOCUS_MARGIN)
+
+    @command
+    def clear_focus(self):
+        """Simulate every pet in full again"""
+        self.focus = None
+
+    def is_far(self, x, y):
+        """Whether a spot is outside the chunks simulated in full"""
+        if self.focus is None:
+            return False
+        cx0, cy0, cx1, cy1 = self.focus
+        return not (cx0 <= x // CHUNK_SIZE <= cx1 and cy0 <= y // CHUNK_SIZE <= cy1)
+
+    def pets_in(self, x0, y0, x1, y1):
+        """(name, pet) for every pet whose centre is inside the rectangle"""
+        if self.backend == 'numpy':
+            arrays = self.pets.arrays
+            x, y = arrays.x, arrays.y
+            inside = np.flatnonzero((x >= x0) & (x < x1) & (y >= y0) & (y < y1))
+            return [(arrays.names[slot], arrays.views[slot]) for slot in inside.tolist()]
+        return [(name, pet) for name, pet in self.pets.items()
+                if x0 <= pet['x'] < x1 and y0 <= pet['y'] < y1]
+
+    @property
+    def obstacles(self):
+        """Wall rectangles as (x0, y0, x1, y1)"""
+        return self.flow.obstacles
+
+    @command
+    def add_obstacle(self, x0, y0, x1, y1):
+        """Put a wall in the arena that pets walk around"""
+        self.flow.add_obstacle(x0, y0, x1, y1)
+
+    def _food_changed(self):
+        self.flow.set_food((food['x'], food['y']) for food in self.food.values())
+
+    def _food_added(self, food):
+        self._food_grid.insert(food['id'], food['x'], food['y'])
+
+        # Pets that could reach the food should not wait for their turn to think
+        if self.ai_scheduler.period > 1 or self.ai_scheduler.budget is not None:
+            for pet_name in self._pets_near(food['x'], food['y'], FOOD_ALERT_RADIUS):
+                self.ai_scheduler.wake(pet_name)
+
+    def _food_gone(self, food):
+        self._food_grid.remove(food['id'])
+
+    def _pets_near(self, x, y, radius):
+        """Names of the pets closer than radius to (x, y)"""
+        if self.backend == 'numpy':
+            arrays = self.pets.arrays
+            near = np.flatnonzero((arrays.x - x) ** 2 + (arrays.y - y) ** 2 < radius ** 2)
+            return [arrays.names[slot] for slot in near.tolist()]
+        return self._pet_grid.query(x, y, radius)
+
+    @command
+    def add_pet(self, name, x, y, personality, hunger=30, energy=80, happiness=70, color=None):
+        """Add a new AI pet to the world"""
+        pet = {
+            'x': x, 'y': y,
+            'hunger': hunger,
+            'energy': energy,
+            'happiness': happiness,
+            'color': color if color is not None else PET_COLORS['pet1'],
+            'ai': PetAI(name, personality)
+        }
+        pet['ai'].memory.use_names(self.partners)
+        if self.pet_rngs:
+            self._seed_pet(name, pet['ai'])
+        if self.backend == 'numpy':
+            return self.pets.add(name, pet)
+        self.pets[name] = pet
+        return pet
+
+    def _seed_pet(self, name, ai):
+        """Give a pet its own random stream, from the world seed and its name"""
+        ai.rng = random.Random(f"{self.seed}:{name}")
+
+    def _sync_pet_grid(self):
+        """Catch the pet grid up with pets moved or added from outside"""
+        pet_grid = self._pet_grid
+        for name, pet in self.pets.items():
+            pet_grid.move(name, pet['x'], pet['y'])
+        if len(pet_grid) != len(self.pets):
+            pet_grid.clear()
+            for name, pet in self.pets.items():
+                pet_grid.insert(name, pet['x'], pet['y'])
+
+    def _game_state(self, summary=True):
+        """What every PetAI gets to look at this tick"""
+        game_state = {
+            'pets': self.pets,
+            'food_items': self.food_items,
+            'rng': self.rng,
+            'targets': TargetIndex(self.pets, self._food_grid, self.food),
+            'flow': self.flow
+        }
+        if summary:
+            game_state['summary'] = WorldSummary(self.pets)
+        return game_state
+
+    def update_pets(self):
+        """Update pet AI and states"""
+
+        if self.backend == 'numpy':
+            self._update_pets_vectorized()
+            return
+
+        game_state = self._game_state()
+        summary = game_state['summary']
+        self._sync_pet_grid()
+        pet_grid = self._pet_grid
+        food_grid = self._food_grid
+        scheduler = self.ai_scheduler
+        scheduler.start_tick()
+        flow = self.flow
+
+        min_x, min_y, max_x, max_y = self.bounds
+
+        for index, (pet_name, pet) in enumerate(self.pets.items()):
+            # AI thinking, unless the pet is sticking with its current goal
+            ai = pet['ai']
+            if ai.current_goal is not None and self.is_far(pet['x'], pet['y']):
+                # Far from the camera: re-plan on its own turn, coast otherwise
+                if (self.tick + index) % FAR_PET_PERIOD:
+                    action = ai.current_goal
+                    movement = ai.last_move
+                else:
+                    action = scheduler.think(ai, game_state)
+                    movement = ai.last_move = ai.execute_action(action, game_state)
+            else:
+                if ai.current_goal is None or scheduler.should_think(pet_name, self.tick):
+                    action = scheduler.think(ai, game_state)
+                else:
+                    action = ai.current_goal
+                movement = ai.last_move = ai.execute_action(action, game_state)
+
+            # Apply movement
+            if movement:
+                x = max(min_x, min(max_x, pet['x'] + movement['dx']))
+                y = max(min_y, min(max_y, pet['y'] + movement['dy']))
+                if flow.obstacles and flow.is_blocked(x, y) and not flow.is_blocked(pet['x'], pet['y']):
+                    # Slide along the wall if one direction is still open
+                    if not flow.is_blocked(x, pet['y']):
+                        y = pet['y']
+                    elif not flow.is_blocked(pet['x'], y):
+                        x = pet['x']
+                    else:
+                        x, y = pet['x'], pet['y']
+                pet['x'] = x
+                pet['y'] = y
+                pet_grid.move(pet_name, pet['x'], pet['y'])
+
+            # Update pet stats over time
+            pet['hunger'] = min(100, pet['hunger'] + 0.1)  # Gradually get hungry
+
+            if action == 'rest':
+                pet['energy'] = min(100, pet['energy'] + 1)
+            else:
+                pet['energy'] = max(0, pet['energy'] - 0.05)
+
+            # Check food collision
+            for food_id in food_grid.query(pet['x'], pet['y'], EAT_RADIUS):
+                pet['hunger'] = max(0, pet['hunger'] - 30)
+                pet['happiness'] = min(100, pet['happiness'] + 10)
+                food = self.food[food_id]
+                ai.memory.remember(self.tick, ATE_FOOD, food['x'], food['y'])
+                self.remove_food(food)
+                self.add_message(f"{pet_name} found food! 🍎")
+
+            # Social interactions with the pets in the neighbouring cells
+            note_friends = (self.tick + index) % MEET_LOG_INTERVAL == 0
+            for other_name in pet_grid.query(pet['x'], pet['y'], SOCIAL_RADIUS):
+                if other_name != pet_name:
+                    # Pets interact when close
+                    other_pet = self.pets[other_name]
+                    if note_friends:
+                        self._note_meeting(ai, action, pet, other_name, other_pet)
+                    pet['happiness'] = min(100, pet['happiness'] + 0.5)
+                    other_pet['happiness'] = min(100, other_pet['happiness'] + 0.5)
+                    # More happiness can only move a pet out of needy or into happy
+                    if other_name in summary.needy or other_name not in summary.happy:
+                        summary.refresh(other_name, other_pet)
+
+            # Keep the summary right for the pets that think after this one
+            summary.refresh(pet_name, pet)
+
+    def _note_meeting(self, ai, action, pet, other_name, other_pet):
+        """Add a friend met to a pet's memory, as helped if they needed it"""
+        needy = other_pet['hunger'] > 70 or other_pet['happiness'] < 30
+        kind = HELPED_FRIEND if action == 'help_friend' and needy else MET_FRIEND
+        ai.memory.remember(self.tick, kind, pet['x'], pet['y'], other_name)
+
+    def _update_pets_vectorized(self):
+        """update_pets() for the NumPy backend.
+
+        Every pet decides from the state at the start of the tick using the
+        compiled policy in pet_policy.py and works out its step with
+        pet_moves.py, then all pets move and drift together, so results
+        differ slightly from the dict backend where each pet sees the ones
+        before it already moved. Explorers take their random steps from one
+        generator per tick (or their own streams with pet_rngs=True).
+        """
+
+        arrays = self.pets.arrays
+        count = len(arrays)
+        if count == 0:
+            return
+        ais = arrays.ais
+        x, y = arrays.x, arrays.y
+        hunger, happiness = arrays.hunger, arrays.happiness
+
+        # Pets keep their current goal unless it is their turn to re-plan
+        goals = np.fromiter((GOAL_CODES.get(ai.current_goal, -1) for ai in ais), np.int8, count)
+        forced = goals < 0
+        coasting = np.zeros(count, dtype=bool)
+        if self.focus is not None:
+            # Pets far from the focus coast along until their own turn comes
+            cx0, cy0, cx1, cy1 = self.focus
+            cx, cy = x // CHUNK_SIZE, y // CHUNK_SIZE
+            far = (cx < cx0) | (cx > cx1) | (cy < cy0) | (cy > cy1)
+            turn = (self.tick + np.arange(count)) % FAR_PET_PERIOD == 0
+            coasting = far & ~turn & ~forced
+            forced |= far & turn
+        codes = self._rethink(goals, forced, ~forced & ~coasting)
+        for slot in np.flatnonzero(codes != goals).tolist():
+            ais[slot].current_goal = GOALS[codes[slot]]
+
+        # Work out every step with the shared flow fields and target searches
+        acting = np.flatnonzero(~coasting)
+        food = list(self.food.values())
+        food_x = np.array([f['x'] for f in food], dtype=float)
+        food_y = np.array([f['y'] for f in food], dtype=float)
+        act_dx, act_dy, done = act(codes[acting], x[acting], y[acting], self.flow, food_x, food_y,
+                                   (x, y, hunger, happiness, acting))
+        dx, dy = arrays.last_dx, arrays.last_dy  # Coasting pets keep their last step
+        dx[acting] = act_dx
+        dy[acting] = act_dy
+        self._move_the_rest(acting[~done], codes, dx, dy)
+        resting = codes == REST
+
+        # Movement, hunger and energy for every pet at once
+        flow = self.flow
+        if flow.obstacles:
+            old_x, old_y = x.copy(), y.copy()
+        arrays.apply_tick(dx, dy, resting, self.bounds)
+        if flow.obstacles:
+            # Pets that would walk into a wall stay where they were
+            # (pets already inside one may walk out)
+            blocked = flow.blocked_array()
+            stuck = blocked[flow.cells(x, y)] & ~blocked[flow.cells(old_x, old_y)]
+            x[stuck] = old_x[stuck]
+            y[stuck] = old_y[stuck]
+
+        # Check food collision: each food goes to the first pet within reach
+        if food:
+            pet_idx, food_idx = close_pairs(x, y, food_x, food_y, EAT_RADIUS)
+            if len(pet_idx):
+                eaters = np.full(len(food), count)
+                np.minimum.at(eaters, food_idx, pet_idx)
+                eaten = np.flatnonzero(eaters < count)
+                meals = np.bincount(eaters[eaten], minlength=count)
+                np.maximum(hunger - 30 * meals, 0, out=hunger)
+                np.minimum(happiness + 10 * meals, 100, out=happiness)
+                for f in eaten:
+                    ais[eaters[f]].memory.remember(self.tick, ATE_FOOD, food[f]['x'], food[f]['y'])
+                    self.remove_food(food[f])
+                for slot in np.sort(eaters[eaten]):
+                    self.add_message(f"{arrays.names[slot]} found food! 🍎")
+
+        # Social interactions: each close pair cheers both pets up, once
+        # from each side like the dict backend's loop
+        pet_idx, other_idx = close_pairs(x, y, x, y, SOCIAL_RADIUS)
+        friends = np.bincount(pet_idx[pet_idx != other_idx], minlength=count)
+        np.minimum(happiness + 1.0 * friends, 100, out=happiness)
+
+        # Each pet notes down its friends once a second, on its own tick
+        noting = (pet_idx != other_idx) & ((self.tick + pet_idx) % MEET_LOG_INTERVAL == 0)
+        if noting.any():
+            self._note_meetings(pet_idx[noting], other_idx[noting], codes)
+
+    def _note_meetings(self, slots, others, codes):
+        """_note_meeting() for (pet, friend) slot pairs, one memory write per pet"""
+        arrays = self.pets.arrays
+        order = np.argsort(slots, kind='stable')
+        slots, others = slots[order], others[order]
+        helped = (codes[slots] == HELP_FRIEND) & needy_mask(arrays.hunger[others], arrays.happiness[others])
+        kinds = np.where(helped, HELPED_FRIEND, MET_FRIEND).tolist()
+        if self._partner_ids[0] != (arrays.version, self.partners):
+            ids = np.array([self.partners.id(name) for name in arrays.names])
+            self._partner_ids = ((arrays.version, self.partners), ids)
+        partners = self._partner_ids[1][others].tolist()
+
+        # Each pet's pairs are one run of the sorted slots
+        starts = np.flatnonzero(np.diff(slots, prepend=-1))
+        ends = np.append(starts[1:], len(slots)).tolist()
+        x, y, ais = arrays.x, arrays.y, arrays.ais
+        for slot, start, end in zip(slots[starts].tolist(), starts.tolist(), ends):
+            ais[slot].memory.remember_all(self.tick, kinds[start:end], x[slot], y[slot], partners[start:end])
+
+    def _rethink(self, goals, forced, asking):
+        """Goal codes after this tick's re-planning with the compiled policy.
+
+        Pets without a goal (forced) always re-plan; the AIScheduler
+        decides which of the asking pets do, and the rest keep goals.
+        """
+        arrays = self.pets.arrays
+        hunger, energy, happiness = arrays.hunger, arrays.energy, arrays.happiness
+        needy = needy_mask(hunger, happiness)
+        needy_friends = np.count_nonzero(needy) - needy
+        codes = goals.copy()
+
+        def think(slots):
+            codes[slots] = decide(arrays.personality[slots], hunger[slots], energy[slots],
+                                  happiness[slots], needy_friends[slots])
+
+        scheduler = self.ai_scheduler
+        scheduler.start_tick()
+        if scheduler.period > 1 and self._phases[0] != (arrays.version, scheduler.period):
+            self._phases = ((arrays.version, scheduler.period), scheduler.phase_array(arrays.names))
+        woken, due = scheduler.plan(arrays.names, self.tick, asking, self.pets.slots, self._phases[1])
+        scheduler.timed(think, np.flatnonzero(forced | woken))
+        scheduler.think_in_turn(think, np.flatnonzero(due), arrays.names)
+        return codes
+
+    def _move_the_rest(self, slots, codes, dx, dy):
+        """Steps for the pets pet_moves.act() leaves over: explorers and lost pets"""
+        arrays = self.pets.arrays
+        if not self.pet_rngs:
+            # Explorers share one generator per tick
+            exploring = slots[codes[slots] == EXPLORE]
+            if len(exploring):
+                steps = np.random.default_rng(self.rng.getrandbits(64)).integers(-2, 3, (2, len(exploring)))
+                dx[exploring], dy[exploring] = steps
+                slots = slots[codes[slots] != EXPLORE]
+
+        # The rest (own random streams, no food anywhere, walled off from
+        # the resting spots) go one at a time, like on the dict backend
+        for slot in slots.tolist():
+            ai = arrays.ais[slot]
+            game_state = {'pets': {ai.name: arrays.views[slot]}, 'food_items': (), 'rng': self.rng}
+            movement = ai.execute_action(GOALS[codes[slot]], game_state)
+            dx[slot], dy[slot] = (movement['dx'], movement['dy']) if movement else (0, 0)
+
+    def _pet_goal(self, turn):
+        pet_name = next(islice(self.pets, turn, None))
+        return pet_name, self.pets[pet_name]['ai'].current_goal
@@ -2,120 +2,291 @@
 # Intermediate game with Python code and simple AI concepts
 
 import pygame
-import random
 import math
 import json
+import time
+from collections import OrderedDict
+from itertools import islice
 from datetime import datetime
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pet_world import CHUNK_SIZE, PetAI, PetWorld, PET_COLORS
+
 # Initialize Pygame
 pygame.init()
 
-class PetAI:
-    """Simple AI system for pet behavior"""
-    
-    def __init__(self, pet_name, personality_weights):
-        self.name = pet_name
-        self.personality = personality_weights
-        self.memory = []
-        self.current_goal = None
-        
-    def think(self, game_state):
-        """AI decision making based on needs and personality"""
-        
-        # Analyze current situation
-        my_pet = game_state['pets'][self.name]
-        other_pets = [p for name, p in game_state['pets'].items() if name != self.name]
-        
-        # Calculate urgency for different needs
-        needs = {
-            'hunger': max(0, my_pet['hunger'] - 30) / 70.0,  # 0-1 scale
-            'energy': max(0, 100 - my_pet['energy']) / 70.0,
-            'social': max(0, 50 - my_pet['happiness']) / 50.0,
-            'help_others': sum(1 for p in other_pets if p['hunger'] > 70 or p['happiness'] < 30)
-        }
-        
-        # Weight needs by personality
-        weighted_needs = {}
-        for need, urgency in needs.items():
-            weight = self.personality.get(need, 0.5)
-            weighted_needs[need] = urgency * weight
-        
-        # Choose action based on highest weighted need
-        if weighted_needs['hunger'] > 0.7:
-            self.current_goal = 'find_food'
-        elif weighted_needs['energy'] > 0.8:
-            self.current_goal = 'rest'
-        elif weighted_needs['help_others'] > 0.5 and self.personality.get('helpful', 0) > 0.6:
-            self.current_goal = 'help_friend'
-        elif weighted_needs['social'] > 0.4:
-            self.current_goal = 'socialize'
+# Pet sprites are drawn around this point, so the pet centre lines up
+# with (SPRITE_ORIGIN) inside the surface
+SPRITE_SIZE = (100, 65)
+SPRITE_ORIGIN = (40, 40)
+
+# How far a pet picture and label reach from the pet centre, in world pixels
+DRAW_MARGIN = 60
+
+ZOOM_LEVELS = (0.125, 0.25, 0.5, 1.0, 2.0)
+PAN_SPEED = 600  # Screen pixels per second while an arrow key is held
+
+# Level of detail: whole pets up close, coloured dots when they are small
+# or crowded, and a density heatmap when there are too many to draw
+LOD_FULL, LOD_DOTS, LOD_HEATMAP = 'full detail', 'dots', 'heatmap'
+PET_DIAMETER = 40           # Pet body size at zoom 1
+FULL_DETAIL_MIN_SIZE = 20   # Smaller on screen than this and pets become dots
+FULL_DETAIL_MAX_PETS = 300  # More pets on screen than this and they become dots
+DOTS_MAX_PETS = 5000        # More than this and the view becomes a heatmap
+HEATMAP_CELL = 16           # Screen pixels per heatmap square
+
+REWIND_SECONDS = 5  # How far back BACKSPACE goes
+
+MOOD_COLORS = {
+    'happy': (0, 200, 0),
+    'neutral': (255, 215, 0),
+    'sad': (220, 0, 0),
+}
+
+class Camera:
+    """Which part of the world is on screen, and how big it is drawn.
+    
+    x and y are the world position at the top-left of the screen. Zoom
+    steps through ZOOM_LEVELS so scaled pet pictures can be cached.
+    """
+    
+    def __init__(self, screen_width, screen_height, world_width, world_height, zoom=1.0):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.world_width = world_width
+        self.world_height = world_height
+        self.zoom = zoom
+        self.x = 0.0
+        self.y = 0.0
+        self.clamp()
+    
+    def clamp(self):
+        """Keep the view over the world, centring a world smaller than it"""
+        view_width = self.screen_width / self.zoom
+        view_height = self.screen_height / self.zoom
+        if view_width >= self.world_width:
+            self.x = (self.world_width - view_width) / 2
         else:
-            self.current_goal = 'explore'
-            
-        return self.current_goal
+            self.x = max(0.0, min(self.world_width - view_width, self.x))
+        if view_height >= self.world_height:
+            self.y = (self.world_height - view_height) / 2
+        else:
+            self.y = max(0.0, min(self.world_height - view_height, self.y))
+    
+    def pan(self, dx, dy):
+        """Move the view by (dx, dy) screen pixels"""
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self.clamp()
+    
+    def zoom_by(self, steps, anchor=None):
+        """Zoom in (steps > 0) or out, keeping the world point at anchor still"""
+        level = min(range(len(ZOOM_LEVELS)), key=lambda i: abs(ZOOM_LEVELS[i] - self.zoom))
+        zoom = ZOOM_LEVELS[max(0, min(len(ZOOM_LEVELS) - 1, level + steps))]
+        if anchor is None:
+            anchor = (self.screen_width / 2, self.screen_height / 2)
+        world_x, world_y = self.to_world(*anchor)
+        self.zoom = zoom
+        self.x = world_x - anchor[0] / zoom
+        self.y = world_y - anchor[1] / zoom
+        self.clamp()
+    
+    def to_screen(self, x, y):
+        return (int(round((x - self.x) * self.zoom)), int(round((y - self.y) * self.zoom)))
+    
+    def to_world(self, sx, sy):
+        return (self.x + sx / self.zoom, self.y + sy / self.zoom)
+    
+    def view_rect(self):
+        """The world area on screen, as (x0, y0, x1, y1)"""
+        return (self.x, self.y, self.x + self.screen_width / self.zoom, self.y + self.screen_height / self.zoom)
+    
+    def shows_everything(self):
+        """Whether the whole world fits on screen"""
+        x0, y0, x1, y1 = self.view_rect()
+        return x0 <= 0 and y0 <= 0 and x1 >= self.world_width and y1 >= self.world_height
+    
+    def visible_chunks(self, margin=DRAW_MARGIN):
+        """Chunks with anything that can show on screen, as (cx0, cy0, cx1, cy1)"""
+        x0, y0, x1, y1 = self.view_rect()
+        return (int((x0 - margin) // CHUNK_SIZE), int((y0 - margin) // CHUNK_SIZE),
+                int((x1 + margin) // CHUNK_SIZE), int((y1 + margin) // CHUNK_SIZE))
+    
+    def cull_rect(self):
+        """World rectangle covering the visible chunks"""
+        cx0, cy0, cx1, cy1 = self.visible_chunks()
+        return (cx0 * CHUNK_SIZE, cy0 * CHUNK_SIZE, (cx1 + 1) * CHUNK_SIZE, (cy1 + 1) * CHUNK_SIZE)
+    
+    @property
+    def signature(self):
+        return (self.x, self.y, self.zoom)
+
+class TextCache:
+    """Rendered text surfaces keyed by (font, text, color).
+    
+    Most text on screen never changes, so it only needs rasterizing once.
+    The least recently used surfaces are dropped when the cache is full,
+    and hits/misses show how well it is working.
+    """
+    
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()  # oldest first
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, font, text, color):
+        """Like font.render(text, True, color), but reuses earlier results"""
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+    
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def clear(self):
+        self.surfaces.clear()
+
+class PetSpriteCache:
+    """Pre-rendered pet pictures so each pet is one or two blits a frame.
+
+    A sprite only depends on the pet's color, its mood band (which mouth
+    it has) and which status indicators are showing, so pets that look
+    the same share one surface.
+    """
+    
+    def __init__(self, text_cache, font_small, font_medium, text_color, max_sprites=256):
+        self.text_cache = text_cache
+        self.font_small = font_small
+        self.font_medium = font_medium
+        self.text_color = text_color
+        self.max_sprites = max_sprites
+        self.sprites = OrderedDict()  # (color, mood, indicators) -> Surface, oldest first
+    
+    @staticmethod
+    def mood(happiness):
+        if happiness > 60:
+            return 'happy'
+        elif happiness < 30:
+            return 'sad'
+        return 'neutral'
     
-    def execute_action(self, action, game_state):
-        """Execute the chosen action"""
+    @staticmethod
+    def sprite_key(pet):
+        """What a pet's picture depends on"""
+        happiness = pet['happiness']
+        indicators = (pet['hunger'] > 70, pet['energy'] < 30, happiness > 80)
+        return (tuple(pet['color']), PetSpriteCache.mood(happiness), indicators)
+    
+    @staticmethod
+    def dot_key(pet, radius):
+        """What a pet's dot depends on"""
+        return ('dot', tuple(pet['color']), PetSpriteCache.mood(pet['happiness']), radius)
+    
+    def dot(self, pet, radius):
+        """A pet as a dot of its colour ringed with its mood colour"""
+        key = self.dot_key(pet, radius)
+        surface = self.sprites.get(key)
+        if surface is not None:
+            self.sprites.move_to_end(key)
+            return surface
+        
+        _, color, mood, _ = key
+        surface = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+        pygame.draw.circle(surface, MOOD_COLORS[mood], (radius, radius), radius)
+        pygame.draw.circle(surface, color, (radius, radius), max(1, radius - 2))
+        self.sprites[key] = surface
+        if len(self.sprites) > self.max_sprites:
+            self.sprites.popitem(last=False)
+        return surface
+    
+    def sprite(self, pet, zoom=1.0):
+        """Sprite surface for a pet, drawing it the first time it is needed"""
+        key = self.sprite_key(pet)
+        if zoom != 1.0:
+            key = (key, zoom)
+        surface = self.sprites.get(key)
+        if surface is not None:
+            self.sprites.move_to_end(key)
+            return surface
+        
+        if zoom != 1.0:
+            # Scaled copy of the full-size picture
+            full = self.sprite(pet)
+            size = (max(1, round(SPRITE_SIZE[0] * zoom)), max(1, round(SPRITE_SIZE[1] * zoom)))
+            surface = pygame.transform.smoothscale(full, size)
+        else:
+            surface = self.render_sprite(*key)
+        self.sprites[key] = surface
+        if len(self.sprites) > self.max_sprites:
+            self.sprites.popitem(last=False)  # Forget the least recently used look
+        return surface
+    
+    def render_sprite(self, color, mood, indicators):
+        """Draw one pet look onto a transparent surface"""
+        surface = pygame.Surface(SPRITE_SIZE, pygame.SRCALPHA)
+        x, y = SPRITE_ORIGIN
         
-        my_pet = game_state['pets'][self.name]
+        # Pet body (circle)
+        pygame.draw.circle(surface, color, (x, y), 20)
+        pygame.draw.circle(surface, (0, 0, 0), (x, y), 20, 2)
         
-        if action == 'find_food':
-            # Move toward food
-            if game_state['food_items']:
-                closest_food = min(game_state['food_items'], 
-                                 key=lambda f: self.distance_to(my_pet, f))
-                return self.move_toward(my_pet, closest_food)
+        # Eyes
+        pygame.draw.circle(surface, (255, 255, 255), (x-8, y-5), 4)
+        pygame.draw.circle(surface, (255, 255, 255), (x+8, y-5), 4)
+        pygame.draw.circle(surface, (0, 0, 0), (x-8, y-5), 2)
+        pygame.draw.circle(surface, (0, 0, 0), (x+8, y-5), 2)
         
-        elif action == 'help_friend':
-            # Find pet that needs help
-            other_pets = [p for name, p in game_state['pets'].items() if name != self.name]
-            needy_pets = [p for p in other_pets if p['hunger'] > 70 or p['happiness'] < 30]
-            
-            if needy_pets:
-                friend = needy_pets[0]
-                return self.move_toward(my_pet, friend)
-        
-        elif action == 'socialize':
-            # Move toward other happy pets
-            other_pets = [p for name, p in game_state['pets'].items() 
-                         if name != self.name and p['happiness'] > 50]
-            if other_pets:
-                friend = random.choice(other_pets)
-                return self.move_toward(my_pet, friend)
-        
-        elif action == 'rest':
-            # Find quiet corner
-            corner = {'x': random.choice([50, 750]), 'y': random.choice([50, 550])}
-            return self.move_toward(my_pet, corner)
-        
-        else:  # explore
-            # Random movement
-            return {
-                'dx': random.randint(-2, 2),
-                'dy': random.randint(-2, 2)
-            }
-    
-    def distance_to(self, pet, target):
-        """Calculate distance between pet and target"""
-        return math.sqrt((pet['x'] - target['x'])**2 + (pet['y'] - target['y'])**2)
-    
-    def move_toward(self, pet, target):
-        """Calculate movement vector toward target"""
-        dx = target['x'] - pet['x']
-        dy = target['y'] - pet['y']
-        distance = math.sqrt(dx*dx + dy*dy)
-        
-        if distance > 0:
-            # Normalize and scale movement
-            speed = 2
-            return {
-                'dx': int((dx / distance) * speed),
-                'dy': int((dy / distance) * speed)
-            }
-        return {'dx': 0, 'dy': 0}
+        # Mouth (happy/sad based on happiness)
+        if mood == 'happy':
+            pygame.draw.arc(surface, (0, 0, 0), (x-8, y, 16, 10), 0, math.pi, 2)
+        elif mood == 'sad':
+            pygame.draw.arc(surface, (0, 0, 0), (x-8, y+5, 16, 10), math.pi, 2*math.pi, 2)
+        
+        # Status indicators
+        hungry, tired, very_happy = indicators
+        if hungry:
+            hunger_surface = self.text_cache.render(self.font_medium, "🍽️", self.text_color)
+            surface.blit(hunger_surface, (x+25, y-25))
+        
+        if tired:
+            tired_surface = self.text_cache.render(self.font_medium, "😴", self.text_color)
+            surface.blit(tired_surface, (x-35, y-25))
+        
+        if very_happy:
+            happy_surface = self.text_cache.render(self.font_medium, "😊", self.text_color)
+            surface.blit(happy_surface, (x, y-35))
+        
+        return surface
+    
+    def label(self, name):
+        """Rendered name label for a pet; old names age out of the text cache"""
+        return self.text_cache.render(self.font_small, name, self.text_color)
+    
+    def clear(self):
+        self.sprites.clear()
 
 class PyGamePetAI:
-    def __init__(self):
+    """Draws a PetWorld and turns key presses into world actions"""
+    
+    def __init__(self, world=None, dirty_rects=False, sim_hz=60, render_fps=60, max_catch_up=None,
+                 history=None):
         self.width = 800
         self.height = 600
         self.screen = pygame.display.set_mode((self.width, self.height))
@@ -127,221 +298,246 @@ class PyGamePetAI:
         # Colors
         self.colors = {
             'background': (135, 206, 235),  # Sky blue
-            'pet1': (255, 105, 180),        # Hot pink
-            'pet2': (60, 179, 113),         # Sea green  
-            'pet3': (255, 165, 0),          # Orange
+            'pet1': PET_COLORS['pet1'],     # Hot pink
+            'pet2': PET_COLORS['pet2'],     # Sea green  
+            'pet3': PET_COLORS['pet3'],     # Orange
             'food': (255, 215, 0),          # Gold
+            'wall': (139, 115, 85),         # Brown
             'text': (25, 25, 112),          # Dark blue
             'ui': (240, 248, 255)           # Alice blue
         }
         
-        # Game state
-        self.pets = {
-            'Buddy': {
-                'x': 200, 'y': 200,
-                'hunger': 30,
-                'energy': 80,
-                'happiness': 70,
-                'color': self.colors['pet1'],
-                'ai': PetAI('Buddy', {'helpful': 0.8, 'social': 0.7, 'hunger': 0.6})
-            },
-            'Luna': {
-                'x': 400, 'y': 300,
-                'hunger': 50,
-                'energy': 60,
-                'happiness': 40,
-                'color': self.colors['pet2'],
-                'ai': PetAI('Luna', {'helpful': 0.4, 'social': 0.3, 'hunger': 0.8})
-            },
-            'Dash': {
-                'x': 600, 'y': 150,
-                'hunger': 20,
-                'energy': 90,
-                'happiness': 80,
-                'color': self.colors['pet3'],
-                'ai': PetAI('Dash', {'helpful': 0.6, 'social': 0.9, 'hunger': 0.4})
-            }
-        }
+        # Game state lives in the headless simulation
+        self.world = world if world is not None else PetWorld(self.width, self.height)
+        self.history = history  # pet_history.History to rewind with, if any
         
-        self.food_items = []
-        self.messages = []
+        # The world can be bigger than the screen: the camera picks what shows
+        self.camera = Camera(self.width, self.height, getattr(self.world, 'width', self.width),
+                             getattr(self.world, 'height', self.height))
+        self.focus = None  # What the world was last told to simulate in full
+        self.lod = LOD_FULL  # How much detail pets were last drawn with
         
         # Fonts
         self.font_large = pygame.font.Font(None, 24)
         self.font_medium = pygame.font.Font(None, 18)
         self.font_small = pygame.font.Font(None, 14)
         
-        # Code display
-        self.show_code = False
-        self.current_code = ""
-        
-    def spawn_food(self):
-        """Randomly spawn food items"""
-        if len(self.food_items) < 3 and random.random() < 0.02:  # 2% chance per frame
-            food = {
-                'x': random.randint(50, self.width - 50),
-                'y': random.randint(50, self.height - 150),
-                'timer': 300  # Food disappears after 5 seconds
-            }
-            self.food_items.append(food)
-    
-    def update_pets(self):
-        """Update pet AI and states"""
-        
-        game_state = {
-            'pets': self.pets,
-            'food_items': self.food_items
-        }
-        
-        for pet_name, pet in self.pets.items():
-            # AI thinking
-            action = pet['ai'].think(game_state)
-            movement = pet['ai'].execute_action(action, game_state)
-            
-            # Apply movement
-            if movement:
-                pet['x'] = max(25, min(self.width - 25, pet['x'] + movement['dx']))
-                pet['y'] = max(25, min(self.height - 150, pet['y'] + movement['dy']))
-            
-            # Update pet stats over time
-            pet['hunger'] = min(100, pet['hunger'] + 0.1)  # Gradually get hungry
-            
-            if action == 'rest':
-                pet['energy'] = min(100, pet['energy'] + 1)
-            else:
-                pet['energy'] = max(0, pet['energy'] - 0.05)
-            
-            # Check food collision
-            for food in self.food_items[:]:  # Copy list to avoid modification during iteration
-                distance = math.sqrt((pet['x'] - food['x'])**2 + (pet['y'] - food['y'])**2)
-                if distance < 30:
-                    pet['hunger'] = max(0, pet['hunger'] - 30)
-                    pet['happiness'] = min(100, pet['happiness'] + 10)
-                    self.food_items.remove(food)
-                    self.add_message(f"{pet_name} found food! 🍎")
-            
-            # Social interactions
-            for other_name, other_pet in self.pets.items():
-                if other_name != pet_name:
-                    distance = math.sqrt((pet['x'] - other_pet['x'])**2 + (pet['y'] - other_pet['y'])**2)
-                    if distance < 40:
-                        # Pets interact when close
-                        pet['happiness'] = min(100, pet['happiness'] + 0.5)
-                        other_pet['happiness'] = min(100, other_pet['happiness'] + 0.5)
-            
-            # Generate code display based on AI actions
-            if random.random() < 0.1:  # Show code occasionally
-                self.generate_code_display(pet_name, action)
-    
-    def generate_code_display(self, pet_name, action):
-        """Show Python code representation of AI thinking"""
-        
-        code_templates = {
-            'find_food': f"""# {pet_name}'s AI Decision
-if my_hunger > 70:
-    goal = 'find_food'
-    move_toward(closest_food)
-    print('{pet_name}: I need food!')""",
-            
-            'help_friend': f"""# {pet_name}'s AI Decision  
-if friend.happiness < 30:
-    goal = 'help_friend'
-    move_toward(friend)
-    print('{pet_name}: My friend needs help!')""",
-            
-            'socialize': f"""# {pet_name}'s AI Decision
-if my_happiness < 50:
-    goal = 'socialize'
-    find_happy_friend()
-    print('{pet_name}: Time to make friends!')""",
-            
-            'rest': f"""# {pet_name}'s AI Decision
-if my_energy < 20:
-    goal = 'rest'
-    find_quiet_spot()
-    print('{pet_name}: I need to rest...')"""""
-        }
-        
-        self.current_code = code_templates.get(action, "# AI thinking...")
-        self.show_code = True
-    
-    def update_food(self):
-        """Update food items"""
-        for food in self.food_items[:]:
-            food['timer'] -= 1
-            if food['timer'] <= 0:
-                self.food_items.remove(food)
-    
-    def add_message(self, message):
-        """Add message to game log"""
-        self.messages.append({
-            'text': message,
-            'timer': 180  # 3 seconds at 60 FPS
-        })
-        if len(self.messages) > 5:
-            self.messages = self.messages[-5:]  # Keep last 5 messages
-    
-    def update_messages(self):
-        """Update message timers"""
-        for message in self.messages[:]:
-            message['timer'] -= 1
-            if message['timer'] <= 0:
-                self.messages.remove(message)
+        # Pre-rendered text and pet pictures
+        self.text_cache = TextCache()
+        self.sprite_cache = PetSpriteCache(self.text_cache, self.font_small, self.font_medium, self.colors['text'])
+        
+        # Screen regions drawn on top of the pets
+        self.ui_rect = pygame.Rect(0, self.height - 140, self.width, 140)
+        self.code_rect = pygame.Rect(self.width - 300, 20, 280, 120)
+        self.code_panels = OrderedDict()  # code -> pre-drawn panel, least recently shown first
+        
+        # The simulation runs at sim_hz fixed ticks per second whatever the
+        # frame rate; pets are drawn part-way between their last two ticks
+        self.sim_hz = sim_hz
+        self.render_fps = render_fps
+        if max_catch_up is None:
+            # Room for four frames' worth of ticks before giving up on catching up
+            max_catch_up = 4 * math.ceil(sim_hz / render_fps)
+        self.max_catch_up = max_catch_up
+        self.accumulator = 0.0
+        self.previous_positions = {}
+        self.alpha = 1.0
+        
+        # Dirty-rectangle mode only repaints what changed since the last frame
+        self.dirty_rects = dirty_rects
+        self.background = None       # Sky and walls to erase with
+        self.walls_drawn = 0
+        self.title_rect = None
+        self.drawn = {}              # entity key -> (rect, look) from the last frame
+        self.hud_signature = None
+        self.code_signature = None
+        self.camera_signature = None
+    
+    @property
+    def pets(self):
+        return self.world.pets
+    
+    @property
+    def food_items(self):
+        return self.world.food_items
+    
+    @property
+    def messages(self):
+        return self.world.messages
+    
+    @property
+    def show_code(self):
+        return self.world.show_code
+    
+    @property
+    def current_code(self):
+        return self.world.current_code
+        
+    def pet_position(self, pet, name):
+        """Where to draw a pet on screen, between its last two ticks' positions"""
+        previous = self.previous_positions.get(name)
+        if previous is None or self.alpha >= 1.0:
+            return self.camera.to_screen(int(pet['x']), int(pet['y']))
+        alpha = self.alpha
+        return self.camera.to_screen(int(round(previous[0] + (pet['x'] - previous[0]) * alpha)),
+                                     int(round(previous[1] + (pet['y'] - previous[1]) * alpha)))
     
     def draw_pet(self, pet, name):
         """Draw a pet with visual indicators"""
         
-        x, y = int(pet['x']), int(pet['y'])
+        x, y = self.pet_position(pet, name)
+        zoom = self.camera.zoom
         
-        # Pet body (circle)
-        pygame.draw.circle(self.screen, pet['color'], (x, y), 20)
-        pygame.draw.circle(self.screen, (0, 0, 0), (x, y), 20, 2)
-        
-        # Eyes
-        pygame.draw.circle(self.screen, (255, 255, 255), (x-8, y-5), 4)
-        pygame.draw.circle(self.screen, (255, 255, 255), (x+8, y-5), 4)
-        pygame.draw.circle(self.screen, (0, 0, 0), (x-8, y-5), 2)
-        pygame.draw.circle(self.screen, (0, 0, 0), (x+8, y-5), 2)
-        
-        # Mouth (happy/sad based on happiness)
-        if pet['happiness'] > 60:
-            # Happy mouth
-            pygame.draw.arc(self.screen, (0, 0, 0), (x-8, y, 16, 10), 0, math.pi, 2)
-        elif pet['happiness'] < 30:
-            # Sad mouth
-            pygame.draw.arc(self.screen, (0, 0, 0), (x-8, y+5, 16, 10), math.pi, 2*math.pi, 2)
+        # Body, face and status indicators come pre-drawn from the sprite cache
+        sprite = self.sprite_cache.sprite(pet, zoom)
+        sprite_rect = self.screen.blit(sprite, (x - round(SPRITE_ORIGIN[0] * zoom), y - round(SPRITE_ORIGIN[1] * zoom)))
         
         # Name label
-        name_surface = self.font_small.render(name, True, self.colors['text'])
-        name_rect = name_surface.get_rect(center=(x, y+35))
+        name_surface = self.sprite_cache.label(name)
+        name_rect = name_surface.get_rect(center=(x, y + round(35 * zoom)))
         self.screen.blit(name_surface, name_rect)
-        
-        # Status indicators
-        if pet['hunger'] > 70:
-            # Hungry indicator
-            hunger_surface = self.font_medium.render("🍽️", True, self.colors['text'])
-            self.screen.blit(hunger_surface, (x+25, y-25))
-        
-        if pet['energy'] < 30:
-            # Tired indicator  
-            tired_surface = self.font_medium.render("😴", True, self.colors['text'])
-            self.screen.blit(tired_surface, (x-35, y-25))
-        
-        if pet['happiness'] > 80:
-            # Happy indicator
-            happy_surface = self.font_medium.render("😊", True, self.colors['text'])
-            self.screen.blit(happy_surface, (x, y-35))
+        return sprite_rect.union(name_rect)
+    
+    def pet_rect(self, pet, name):
+        """Screen area draw_pet() will cover"""
+        x, y = self.pet_position(pet, name)
+        zoom = self.camera.zoom
+        sprite_rect = pygame.Rect((x - round(SPRITE_ORIGIN[0] * zoom), y - round(SPRITE_ORIGIN[1] * zoom)),
+                                  self.sprite_cache.sprite(pet, zoom).get_size())
+        name_rect = self.sprite_cache.label(name).get_rect(center=(x, y + round(35 * zoom)))
+        return sprite_rect.union(name_rect)
+    
+    def dot_radius(self):
+        return max(3, round(PET_DIAMETER / 4 * self.camera.zoom))
+    
+    def draw_pet_dot(self, pet, name):
+        """Draw a pet as a dot, for zoomed-out or crowded views"""
+        x, y = self.pet_position(pet, name)
+        radius = self.dot_radius()
+        return self.screen.blit(self.sprite_cache.dot(pet, radius), (x - radius, y - radius))
+    
+    def dot_rect(self, pet, name):
+        """Screen area draw_pet_dot() will cover"""
+        x, y = self.pet_position(pet, name)
+        radius = self.dot_radius()
+        return pygame.Rect(x - radius, y - radius, 2 * radius + 1, 2 * radius + 1)
+    
+    def pet_positions(self):
+        """x and y arrays for every pet, or None when the world keeps pets in dicts"""
+        arrays = getattr(self.pets, 'arrays', None)
+        if arrays is not None:
+            return arrays.x, arrays.y
+        snapshot = getattr(self.pets, 'snapshot', None)
+        if snapshot is not None:
+            snapshot = snapshot()
+            return snapshot['x'], snapshot['y']
+        return None
+    
+    def draw_heatmap(self, pets):
+        """Draw how crowded each part of the screen is instead of the pets"""
+        columns = -(-self.width // HEATMAP_CELL)
+        rows = -(-self.height // HEATMAP_CELL)
+        positions = self.pet_positions()
+        if positions is not None:
+            heat = self.heat_from_arrays(*positions, columns, rows)
+        else:
+            heat = self.heat_from_pets(pets, columns, rows)
+        self.screen.blit(pygame.transform.scale(heat, (columns * HEATMAP_CELL, rows * HEATMAP_CELL)), (0, 0))
+    
+    def heat_from_pets(self, pets, columns, rows):
+        """One pixel per square, counted pet by pet"""
+        camera = self.camera
+        scale = camera.zoom / HEATMAP_CELL
+        counts = {}
+        for name, pet in pets:
+            cell = (int((pet['x'] - camera.x) * scale), int((pet['y'] - camera.y) * scale))
+            counts[cell] = counts.get(cell, 0) + 1
+        
+        heat = pygame.Surface((columns, rows), pygame.SRCALPHA)
+        busiest = max(counts.values(), default=1)
+        for (cx, cy), count in counts.items():
+            if 0 <= cx < columns and 0 <= cy < rows:
+                level = count / busiest  # Yellow and faint to red and solid
+                heat.set_at((cx, cy), (255, int(255 * (1 - level)), 0, int(80 + 160 * level)))
+        return heat
+    
+    def heat_from_arrays(self, x, y, columns, rows):
+        """heat_from_pets() for array-backed worlds, binned in one go"""
+        camera = self.camera
+        scale = camera.zoom / HEATMAP_CELL
+        x0, y0, x1, y1 = camera.cull_rect()
+        visible = (x >= x0) & (x < x1) & (y >= y0) & (y < y1)
+        cx = ((x[visible] - camera.x) * scale).astype(np.int64)
+        cy = ((y[visible] - camera.y) * scale).astype(np.int64)
+        heat = pygame.Surface((columns, rows), pygame.SRCALPHA)
+        if len(cx) == 0:
+            return heat
+        
+        # Count every visible chunk's squares, even just off screen, so the
+        # busiest square matches heat_from_pets()
+        left, top = cx.min(), cy.min()
+        width = cx.max() - left + 1
+        counts = np.bincount((cy - top) * width + (cx - left), minlength=width * (cy.max() - top + 1))
+        counts = counts.reshape(-1, width)
+        level = np.zeros((columns, rows))
+        on_screen = counts[max(0, -top):max(0, rows - top), max(0, -left):max(0, columns - left)]
+        level[max(0, left):max(0, left) + on_screen.shape[1],
+              max(0, top):max(0, top) + on_screen.shape[0]] = on_screen.T / counts.max()
+        
+        filled = level > 0
+        pixels = pygame.surfarray.pixels3d(heat)
+        pixels[..., 0][filled] = 255
+        pixels[..., 1][filled] = (255 * (1 - level[filled])).astype(np.uint8)
+        del pixels
+        alpha = pygame.surfarray.pixels_alpha(heat)
+        alpha[filled] = (80 + 160 * level[filled]).astype(np.uint8)
+        del alpha
+        return heat
+    
+    def choose_lod(self, pet_count):
+        """Level of detail for this many pets on screen at the current zoom"""
+        if pet_count > DOTS_MAX_PETS:
+            return LOD_HEATMAP
+        if pet_count > FULL_DETAIL_MAX_PETS or PET_DIAMETER * self.camera.zoom < FULL_DETAIL_MIN_SIZE:
+            return LOD_DOTS
+        return LOD_FULL
+    
+    def food_position(self, food):
+        return self.camera.to_screen(int(food['x']), int(food['y']))
     
     def draw_food(self, food):
         """Draw food item"""
-        x, y = int(food['x']), int(food['y'])
-        pygame.draw.circle(self.screen, self.colors['food'], (x, y), 8)
-        pygame.draw.circle(self.screen, (255, 140, 0), (x, y), 8, 2)
+        x, y = self.food_position(food)
+        radius = max(2, round(8 * self.camera.zoom))
+        pygame.draw.circle(self.screen, self.colors['food'], (x, y), radius)
+        pygame.draw.circle(self.screen, (255, 140, 0), (x, y), radius, 2)
         
         # Food emoji
-        food_surface = self.font_small.render("🍎", True, self.colors['text'])
+        food_surface = self.text_cache.render(self.font_small, "🍎", self.colors['text'])
         food_rect = food_surface.get_rect(center=(x, y))
         self.screen.blit(food_surface, food_rect)
+        return food_rect.union(pygame.Rect(x - radius, y - radius, 2 * radius + 1, 2 * radius + 1))
+    
+    def food_rect(self, food):
+        """Screen area draw_food() will cover"""
+        x, y = self.food_position(food)
+        radius = max(2, round(8 * self.camera.zoom))
+        food_surface = self.text_cache.render(self.font_small, "🍎", self.colors['text'])
+        return food_surface.get_rect(center=(x, y)).union(pygame.Rect(x - radius, y - radius, 2 * radius + 1, 2 * radius + 1))
+    
+    def visible_pets(self):
+        """(name, pet) for the pets in chunks the camera can see"""
+        x0, y0, x1, y1 = self.camera.cull_rect()
+        pets_in = getattr(self.world, 'pets_in', None)
+        if pets_in is not None:
+            return pets_in(x0, y0, x1, y1)
+        return [(name, pet) for name, pet in self.pets.items()
+                if x0 <= pet['x'] < x1 and y0 <= pet['y'] < y1]
+    
+    def visible_food(self):
+        """Food items in chunks the camera can see"""
+        x0, y0, x1, y1 = self.camera.cull_rect()
+        return [food for food in self.food_items if x0 <= food['x'] < x1 and y0 <= food['y'] < y1]
     
     def draw_ui(self):
         """Draw user interface"""
@@ -351,13 +547,13 @@ if my_energy < 20:
         pygame.draw.rect(self.screen, self.colors['ui'], ui_rect)
         pygame.draw.rect(self.screen, self.colors['text'], ui_rect, 2)
         
-        # Pet status bars
+        # Pet status bars, for as many pets as fit
         y_start = self.height - 130
-        for i, (pet_name, pet) in enumerate(self.pets.items()):
+        for i, (pet_name, pet) in enumerate(islice(self.pets.items(), self.hud_pet_count())):
             x_start = 20 + i * 250
             
             # Pet name
-            name_surface = self.font_medium.render(f"{pet_name}", True, self.colors['text'])
+            name_surface = self.text_cache.render(self.font_medium, f"{pet_name}", self.colors['text'])
             self.screen.blit(name_surface, (x_start, y_start))
             
             # Status bars
@@ -367,7 +563,7 @@ if my_energy < 20:
                 bar_y = y_start + 20 + j * 15
                 
                 # Stat label
-                stat_surface = self.font_small.render(f"{stat_name}:", True, self.colors['text'])
+                stat_surface = self.text_cache.render(self.font_small, f"{stat_name}:", self.colors['text'])
                 self.screen.blit(stat_surface, (x_start, bar_y))
                 
                 # Progress bar
@@ -394,28 +590,47 @@ if my_energy < 20:
         # Messages
         message_y = self.height - 35
         for message in self.messages:
-            message_surface = self.font_small.render(message['text'], True, self.colors['text'])
+            message_surface = self.text_cache.render(self.font_small, message['text'], self.colors['text'])
             self.screen.blit(message_surface, (20, message_y))
             message_y -= 15
+        
+        # How much detail the pets are drawn with
+        lod_surface = self.text_cache.render(self.font_small, f"🔍 Detail: {self.lod}", self.colors['text'])
+        self.screen.blit(lod_surface, lod_surface.get_rect(bottomright=(self.width - 10, self.height - 10)))
     
     def draw_code_display(self):
         """Draw Python code representation"""
         
         if self.show_code and self.current_code:
-            # Code background
-            code_rect = pygame.Rect(self.width - 300, 20, 280, 120)
-            pygame.draw.rect(self.screen, (240, 240, 240), code_rect)
-            pygame.draw.rect(self.screen, self.colors['text'], code_rect, 2)
-            
-            # Code title
-            title_surface = self.font_medium.render("🐍 Python AI Code:", True, self.colors['text'])
-            self.screen.blit(title_surface, (code_rect.x + 5, code_rect.y + 5))
-            
-            # Code lines
-            code_lines = self.current_code.split('\n')
-            for i, line in enumerate(code_lines[:5]):  # Show first 5 lines
-                line_surface = self.font_small.render(line, True, self.colors['text'])
-                self.screen.blit(line_surface, (code_rect.x + 5, code_rect.y + 25 + i * 15))
+            panel = self.code_panels.get(self.current_code)
+            if panel is None:
+                panel = self.render_code_panel(self.current_code)
+                self.code_panels[self.current_code] = panel
+                if len(self.code_panels) > 64:
+                    self.code_panels.popitem(last=False)
+            else:
+                self.code_panels.move_to_end(self.current_code)
+            self.screen.blit(panel, self.code_rect)
+    
+    def render_code_panel(self, code):
+        """The whole code panel for one piece of code, as a surface"""
+        panel = pygame.Surface(self.code_rect.size)
+        
+        # Code background
+        panel_rect = panel.get_rect()
+        panel.fill((240, 240, 240))
+        pygame.draw.rect(panel, self.colors['text'], panel_rect, 2)
+        
+        # Code title
+        title_surface = self.text_cache.render(self.font_medium, "🐍 Python AI Code:", self.colors['text'])
+        panel.blit(title_surface, (5, 5))
+        
+        # Code lines
+        code_lines = code.split('\n')
+        for i, line in enumerate(code_lines[:5]):  # Show first 5 lines
+            line_surface = self.text_cache.render(self.font_small, line, self.colors['text'])
+            panel.blit(line_surface, (5, 25 + i * 15))
+        return panel
     
     def handle_events(self):
         """Handle pygame events"""
@@ -427,21 +642,242 @@ if my_energy < 20:
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
                     # Spawn food manually
-                    food = {
-                        'x': random.randint(50, self.width - 50),
-                        'y': random.randint(50, self.height - 150),
-                        'timer': 300
-                    }
-                    self.food_items.append(food)
-                    self.add_message("Food spawned! 🍎")
+                    self.world.add_food()
+                    self.world.add_message("Food spawned! 🍎")
                 
                 elif event.key == pygame.K_c:
                     # Toggle code display
-                    self.show_code = not self.show_code
+                    self.world.toggle_code()
                 
                 elif event.key == pygame.K_h:
                     # Show help
-                    self.add_message("SPACE: Spawn food, C: Toggle code, H: Help")
+                    self.world.add_message("SPACE: Spawn food, C: Toggle code, H: Help")
+                    self.world.add_message("Arrows: Look around, +/-: Zoom")
+                    if self.history is not None:
+                        self.world.add_message("BACKSPACE: Rewind")
+                
+                elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                    self.camera.zoom_by(1)
+                
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    self.camera.zoom_by(-1)
+                
+                elif event.key == pygame.K_BACKSPACE and self.history is not None:
+                    self.rewind()
+            
+            elif event.type == pygame.MOUSEWHEEL:
+                # Zoom around the mouse pointer
+                self.camera.zoom_by(1 if event.y > 0 else -1, pygame.mouse.get_pos())
+    
+    def rewind(self, seconds=REWIND_SECONDS):
+        """Put the world back a few seconds, as far as the history goes"""
+        tick = max(self.history.first_tick, self.world.tick - round(seconds * self.sim_hz))
+        self.history.rewind(tick)
+        self.world.add_message(f"⏪ Back to tick {tick}")
+        # Nothing drawn so far is from the rewound world, and its focus
+        # is set again from the camera
+        self.previous_positions = {}
+        if hasattr(self.world, 'clear_focus'):
+            self.world.clear_focus()
+        self.focus = None
+        self.background = None
+    
+    def move_camera(self, frame_time):
+        """Pan with the arrow keys and tell the world where to simulate in full"""
+        keys = pygame.key.get_pressed()
+        step = PAN_SPEED * frame_time
+        dx = (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * step
+        dy = (keys[pygame.K_DOWN] - keys[pygame.K_UP]) * step
+        if dx or dy:
+            self.camera.pan(dx, dy)
+        
+        # With the whole world on screen every pet is simulated in full
+        focus = None if self.camera.shows_everything() else self.camera.view_rect()
+        if focus != self.focus and hasattr(self.world, 'set_focus'):
+            if focus is None:
+                self.world.clear_focus()
+            else:
+                self.world.set_focus(*focus)
+            self.focus = focus
+    
+    def draw_title(self):
+        """Title and instructions at the top of the screen"""
+        
+        # Title
+        title_surface = self.text_cache.render(self.font_large, "🐍 Python Pet AI - Watch AI Pets Think!", self.colors['text'])
+        title_rect = title_surface.get_rect(center=(self.width // 2, 20))
+        self.screen.blit(title_surface, title_rect)
+        
+        # Instructions
+        instruction_surface = self.text_cache.render(self.font_small, "SPACE: Spawn Food | C: Toggle Code | H: Help", self.colors['text'])
+        instruction_rect = instruction_surface.get_rect(center=(self.width // 2, 45))
+        self.screen.blit(instruction_surface, instruction_rect)
+        return title_rect.union(instruction_rect)
+    
+    def draw_obstacles(self, surface):
+        """Draw the arena walls"""
+        camera = self.camera
+        for x0, y0, x1, y1 in self.world.obstacles:
+            left, top = camera.to_screen(x0, y0)
+            right, bottom = camera.to_screen(x1, y1)
+            pygame.draw.rect(surface, self.colors['wall'], (left, top, right - left, bottom - top))
+    
+    def draw_frame(self, pets=None):
+        """Paint the whole screen from scratch"""
+        
+        if pets is None:
+            pets = self.visible_pets()
+            self.lod = self.choose_lod(len(pets))
+        
+        self.screen.fill(self.colors['background'])
+        self.draw_obstacles(self.screen)
+        
+        # Draw game objects in the chunks on screen
+        for food in self.visible_food():
+            self.draw_food(food)
+        
+        if self.lod == LOD_HEATMAP:
+            self.draw_heatmap(pets)
+        else:
+            draw = self.draw_pet if self.lod == LOD_FULL else self.draw_pet_dot
+            for pet_name, pet in pets:
+                draw(pet, pet_name)
+        
+        # Draw UI
+        self.draw_ui()
+        
+        if self.show_code:
+            self.draw_code_display()
+        
+        self.draw_title()
+    
+    def hud_pet_count(self):
+        """How many pets' status bars fit across the panel"""
+        return len(range(20, self.width, 250))
+    
+    def current_hud_signature(self):
+        """Everything the status panel shows, to spot when it needs repainting"""
+        bars = tuple((name, int(pet['hunger']), int(pet['energy']), int(pet['happiness']))
+                     for name, pet in islice(self.pets.items(), self.hud_pet_count()))
+        return bars, tuple(message['text'] for message in self.messages), self.lod
+    
+    def draw_changes(self):
+        """Repaint only what changed since last frame; returns the rects to update"""
+        
+        screen = self.screen
+        pets = self.visible_pets()
+        self.lod = self.choose_lod(len(pets))
+        if self.lod == LOD_HEATMAP:
+            # The heatmap changes all over every frame, so repaint it all
+            self.draw_frame(pets)
+            self.background = None
+            return [screen.get_rect()]
+        
+        # Walls are part of the background, so a new wall, a camera move or
+        # a change of detail starts over
+        view_signature = (self.camera.signature, self.lod)
+        first_frame = (self.background is None or self.walls_drawn != len(self.world.obstacles)
+                       or self.camera_signature != view_signature)
+        if first_frame:
+            self.camera_signature = view_signature
+            # Erasing copies the sky and walls back from this surface
+            self.background = pygame.Surface(screen.get_size())
+            self.background.fill(self.colors['background'])
+            self.draw_obstacles(self.background)
+            self.walls_drawn = len(self.world.obstacles)
+            screen.blit(self.background, (0, 0))
+            self.title_rect = self.draw_title()
+            self.drawn = {}
+            self.hud_signature = self.code_signature = None
+        
+        # Where every food item and pet will be this frame, and how it looks
+        current = {}
+        layers = []  # [rect, draw, needs repaint] in painting order
+        for food in self.visible_food():
+            key = ('food', food.get('id'), food['x'], food['y'])
+            current[key] = (self.food_rect(food), None)
+            layers.append([current[key][0], lambda food=food: self.draw_food(food), current[key] != self.drawn.get(key)])
+        full_detail = self.lod == LOD_FULL
+        draw_pet = self.draw_pet if full_detail else self.draw_pet_dot
+        radius = self.dot_radius()
+        for name, pet in pets:
+            key = ('pet', name)
+            if full_detail:
+                current[key] = (self.pet_rect(pet, name), PetSpriteCache.sprite_key(pet))
+            else:
+                current[key] = (self.dot_rect(pet, name), PetSpriteCache.dot_key(pet, radius))
+            layers.append([current[key][0], lambda pet=pet, name=name: draw_pet(pet, name), current[key] != self.drawn.get(key)])
+        
+        # Erase things that moved, changed or disappeared
+        dirty = []
+        for key, drawn in self.drawn.items():
+            if current.get(key) != drawn:
+                screen.blit(self.background, drawn[0], drawn[0])
+                dirty.append(drawn[0])
+        self.drawn = current
+        
+        # Panels drawn over the pets, repainted when their content changes
+        hud_signature = self.current_hud_signature()
+        code_signature = (self.show_code, self.current_code)
+        layers.append([self.ui_rect, self.draw_ui, hud_signature != self.hud_signature])
+        layers.append([self.code_rect, self.draw_code_display, code_signature != self.code_signature])
+        layers.append([self.title_rect, self.draw_title, first_frame])
+        self.hud_signature = hud_signature
+        self.code_signature = code_signature
+        
+        # Anything overlapping a repainted area must be repainted whole too,
+        # or its see-through edges would be blended twice
+        for layer in layers:
+            if layer[2]:
+                screen.blit(self.background, layer[0], layer[0])
+                dirty.append(layer[0])
+        changed = True
+        while changed:
+            changed = False
+            for layer in layers:
+                if not layer[2] and layer[0].collidelist(dirty) != -1:
+                    layer[2] = True
+                    screen.blit(self.background, layer[0], layer[0])
+                    dirty.append(layer[0])
+                    changed = True
+        
+        for rect, draw, repaint in layers:
+            if repaint:
+                draw()
+        
+        if first_frame:
+            return [screen.get_rect()]
+        return dirty
+    
+    def advance(self, frame_time):
+        """Run as many fixed simulation ticks as frame_time seconds call for.
+        
+        Leftover time carries over to the next frame and sets how far
+        between the last two ticks pets are drawn. At most max_catch_up
+        ticks run per frame; after a very slow frame the backlog is dropped
+        rather than letting the simulation fall further and further behind.
+        """
+        if getattr(self.world, 'remote', False):
+            # The simulation keeps its own time in its own process
+            self.world.refresh()
+            self.alpha = 1.0
+            return 0
+        
+        tick_time = 1.0 / self.sim_hz
+        self.accumulator += frame_time
+        ticks = min(int(self.accumulator // tick_time), self.max_catch_up)
+        
+        if ticks > 0:
+            self.world.step(ticks - 1)
+            # Only pets that can be drawn need somewhere to draw them from
+            self.previous_positions = {name: (pet['x'], pet['y']) for name, pet in self.visible_pets()}
+            self.world.step()
+            self.accumulator -= ticks * tick_time
+            if self.accumulator >= tick_time:
+                self.accumulator %= tick_time  # Too far behind: give up on the backlog
+        
+        self.alpha = self.accumulator / tick_time
+        return ticks
     
     def run(self):
         """Main game loop"""
@@ -449,62 +885,121 @@ if my_energy < 20:
         print("🐍 PyGame Pet AI Started!")
         print("🎮 Watch the AI pets think and act autonomously!")
         print("⌨️  Controls: SPACE = Spawn Food, C = Toggle Code Display, H = Help")
+        print("🗺️  Arrows = Look Around, +/- or Mouse Wheel = Zoom")
+        if self.history is not None:
+            print(f"⏪ BACKSPACE = Rewind {REWIND_SECONDS} seconds")
         print()
         
+        last_time = time.perf_counter()
         while self.running:
             # Handle events
             self.handle_events()
             
             # Update game logic
-            self.spawn_food()
-            self.update_pets()
-            self.update_food()
-            self.update_messages()
-            
-            # Hide code display after a while
-            if self.show_code:
-                if random.random() < 0.005:  # 0.5% chance to hide
-                    self.show_code = False
+            now = time.perf_counter()
+            self.move_camera(now - last_time)
+            self.advance(now - last_time)
+            last_time = now
             
             # Draw everything
-            self.screen.fill(self.colors['background'])
-            
-            # Draw game objects
-            for food in self.food_items:
-                self.draw_food(food)
-            
-            for pet_name, pet in self.pets.items():
-                self.draw_pet(pet, pet_name)
-            
-            # Draw UI
-            self.draw_ui()
-            
-            if self.show_code:
-                self.draw_code_display()
-            
-            # Title
-            title_surface = self.font_large.render("🐍 Python Pet AI - Watch AI Pets Think!", True, self.colors['text'])
-            title_rect = title_surface.get_rect(center=(self.width // 2, 20))
-            self.screen.blit(title_surface, title_rect)
-            
-            # Instructions
-            instruction_surface = self.font_small.render("SPACE: Spawn Food | C: Toggle Code | H: Help", True, self.colors['text'])
-            instruction_rect = instruction_surface.get_rect(center=(self.width // 2, 45))
-            self.screen.blit(instruction_surface, instruction_rect)
-            
-            pygame.display.flip()
-            self.clock.tick(60)  # 60 FPS
+            if self.dirty_rects:
+                pygame.display.update(self.draw_changes())
+            else:
+                self.draw_frame()
+                pygame.display.flip()
+            self.clock.tick(self.render_fps)
         
+        print(f"🖼️  Text cache: {self.text_cache.hits} hits, {self.text_cache.misses} misses "
+              f"({self.text_cache.hit_rate:.0%} reused)")
         pygame.quit()
 
 # Run the intermediate game
 if __name__ == "__main__":
     try:
-        game = PyGamePetAI()
-        game.run()
-    except ImportError:
-        print("❌ PyGame not installed!")
-        print("💡 Install with: pip install pygame")
+        import argparse
+        parser = argparse.ArgumentParser(description="Python Pet AI")
+        parser.add_argument('--dirty-rects', action='store_true', help="only repaint what changed each frame")
+        parser.add_argument('--sim-hz', type=float, default=60, help="simulation ticks per second")
+        parser.add_argument('--fps', type=float, default=60, help="frames drawn per second")
+        parser.add_argument('--shards', type=int, default=0, help="split the pets across this many worker processes")
+        parser.add_argument('--worker', action='store_true', help="run the simulation in its own process")
+        parser.add_argument('--world', default='800x600', help="world size in pixels, e.g. 20000x20000")
+        parser.add_argument('--pets', type=int, default=0, help="fill the world with this many random pets")
+        parser.add_argument('--backend', choices=('dict', 'numpy'), default='dict', help="how the world stores pets")
+        parser.add_argument('--seed', type=int, help="seed for everything random (picked for you if not given)")
+        parser.add_argument('--per-pet-rng', action='store_true', help="give every pet its own random stream")
+        parser.add_argument('--record', help="save the session here to replay with pet_replay.py")
+        parser.add_argument('--rewind-mb', type=float, help="keep this many MB of history to rewind with BACKSPACE")
+        parser.add_argument('--save', help="save the rewind history here on exit")
+        parser.add_argument('--load', help="carry on from a history saved with --save")
+        args = parser.parse_args()
+        if args.record and (args.shards or args.worker):
+            parser.error("--record needs the simulation in this process (no --shards or --worker)")
+        rewinding = args.rewind_mb or args.save or args.load
+        if rewinding and (args.shards or args.worker or args.record):
+            parser.error("--rewind-mb, --save and --load need the simulation in this process "
+                         "(no --shards, --worker or --record)")
+        
+        import random
+        seed = args.seed if args.seed is not None else random.randrange(2**32)
+        print(f"🎲 Seed: {seed}")
+        
+        world_width, world_height = (int(size) for size in args.world.lower().split('x'))
+        pets = None
+        if args.pets:
+            from pet_shards import random_pets
+            pets = random_pets(args.pets, world_width, world_height)
+        
+        world = None
+        history = None
+        if rewinding:
+            from pet_history import History, HISTORY_BUDGET
+            budget = int(args.rewind_mb * (1 << 20)) if args.rewind_mb else HISTORY_BUDGET
+        if args.load:
+            history = History.load(args.load, budget_bytes=budget)
+            world = history.world
+            print(f"📂 Loaded {args.load}: ticks {history.first_tick}-{history.last_tick}")
+        elif args.shards:
+            from pet_shards import ShardedWorld
+            from pet_world import default_pets
+            world = ShardedWorld(pets if pets is not None else default_pets(), world_width, world_height,
+                                 shards=args.shards, seed=seed)
+        else:
+            if pets is not None:
+                pets = {name: dict(pet, ai=PetAI(name, pet['personality'])) for name, pet in pets.items()}
+            options = {'width': world_width, 'height': world_height, 'pets': pets, 'backend': args.backend,
+                       'pet_rngs': args.per_pet_rng}
+            if args.worker:
+                from pet_remote import RemoteWorld
+                world = RemoteWorld(seed=seed, sim_hz=args.sim_hz, **options)
+            else:
+                world = PetWorld(seed=seed, **options)
+                if rewinding:
+                    history = History(world, budget_bytes=budget)
+                if args.record:
+                    from pet_replay import RecordedWorld
+                    world = RecordedWorld(world, args.record)
+                    print(f"⏺️  Recording to {args.record}")
+        try:
+            game = PyGamePetAI(world=world, dirty_rects=args.dirty_rects, sim_hz=args.sim_hz, render_fps=args.fps,
+                               history=history)
+            game.run()
+        finally:
+            if hasattr(world, 'close'):
+                world.close()
+            if history is not None:
+                if args.save:
+                    history.save(args.save)
+                    print(f"💾 Saved ticks {history.first_tick}-{history.last_tick} to {args.save}")
+                history.close()
+    except ImportError as e:
+        # pygame is imported at the top, so this is an optional extra,
+        # like numpy for --backend numpy or --shards
+        if e.name:
+            print(f"❌ {e.name} not installed!")
+            print(f"💡 Install with: pip install {e.name}")
+        else:
+            print(f"❌ {e}")  # Our own messages say what to install
     except Exception as e:
         print(f"❌ Error: {e}")
-        print("💡 Make sure you have Python with PyGame installed")
\ No newline at end of file
+        print("💡 Make sure you have Python with PyGame installed")
@@ -0,0 +1,7 @@
+# Tests for the pet games: run with  python -m pytest tests  from games/
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # Draw without a window
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
@@ -0,0 +1,129 @@
+import random
+import time
+
+import pytest
+
+pygame = pytest.importorskip('pygame')
+
+from pet_remote import RemoteWorld
+from pet_world import CHUNK_SIZE, PetWorld
+from pygame_pet_ai import Camera, PyGamePetAI
+
+
+@pytest.fixture
+def game():
+    pygame.init()
+    world = PetWorld(rng=random.Random(5))
+    rng = random.Random(1)
+    for i in range(30):
+        world.add_pet(f"Pet{i}", rng.randint(25, 775), rng.randint(25, 450),
+                      {'hunger': rng.random(), 'social': rng.random()},
+                      hunger=rng.uniform(0, 100), energy=rng.uniform(0, 100), happiness=rng.uniform(0, 100))
+    game = PyGamePetAI(world=world, dirty_rects=True)
+    yield game
+    pygame.quit()
+
+
+def test_dirty_rects_match_full_frames(game):
+    for tick in range(120):
+        game.world.step()
+        if tick % 40 == 0:
+            game.world.add_food()
+            game.world.toggle_code()
+        if tick == 60:
+            game.world.add_obstacle(300, 200, 360, 260)
+        if tick == 90:
+            game.camera.zoom_by(1)
+
+        game.draw_changes()
+        changed = pygame.image.tobytes(game.screen, 'RGB')
+        game.draw_frame()
+        assert pygame.image.tobytes(game.screen, 'RGB') == changed, f"tick {tick}"
+        # Put the screen back as draw_changes() left it for the next frame
+        game.screen.blit(pygame.image.frombytes(changed, game.screen.get_size(), 'RGB'), (0, 0))
+
+
+def test_dirty_rects_cover_every_change(game):
+    game.draw_changes()
+    game.world.step(5)
+    shown = game.screen.copy()  # What the display has up
+    rects = game.draw_changes()
+    assert rects
+    # Updating just the reported rects must bring the display up to date
+    for rect in rects:
+        shown.blit(game.screen, rect, rect)
+    assert pygame.image.tobytes(shown, 'RGB') == pygame.image.tobytes(game.screen, 'RGB')
+
+
+def test_camera_stays_over_the_world():
+    camera = Camera(800, 600, 4000, 3000)
+    camera.pan(-500, -500)
+    assert (camera.x, camera.y) == (0, 0)
+    camera.pan(10000, 10000)
+    assert camera.view_rect() == (3200, 2400, 4000, 3000)
+    assert not camera.shows_everything()
+
+    small = Camera(800, 600, 400, 300)  # Smaller than the screen: centred
+    assert small.view_rect() == (-200, -150, 600, 450)
+    assert small.shows_everything()
+
+
+def test_camera_zooms_around_the_anchor():
+    camera = Camera(800, 600, 4000, 3000)
+    camera.pan(1000, 800)
+    anchor = (200, 150)
+    before = camera.to_world(*anchor)
+    camera.zoom_by(1, anchor)
+    assert camera.zoom == 2.0
+    assert camera.to_world(*anchor) == pytest.approx(before)
+    assert camera.to_screen(*camera.to_world(310, 220)) == (310, 220)
+    camera.zoom_by(-10)
+    assert camera.zoom == 0.125 and camera.shows_everything()
+
+
+def test_visible_chunks_cover_the_screen():
+    camera = Camera(800, 600, 4000, 3000)
+    camera.pan(700, 500)
+    x0, y0, x1, y1 = camera.view_rect()
+    cx0, cy0, cx1, cy1 = camera.visible_chunks(margin=0)
+    assert cx0 * CHUNK_SIZE <= x0 and (cx1 + 1) * CHUNK_SIZE >= x1
+    assert cy0 * CHUNK_SIZE <= y0 and (cy1 + 1) * CHUNK_SIZE >= y1
+
+
+def test_camera_focus_in_worker_mode():
+    pygame.init()
+    world = RemoteWorld(seed=2)
+    try:
+        game = PyGamePetAI(world=world)
+        game.camera.zoom_by(1)
+        game.move_camera(0)
+        assert game.focus is not None
+        game.camera.zoom_by(-1)
+        game.move_camera(0)  # Everything fits again, so the world drops its focus
+        assert game.focus is None
+        tick = world.tick
+        deadline = time.perf_counter() + 10
+        while world.tick == tick and time.perf_counter() < deadline:
+            time.sleep(0.01)
+            world.refresh()
+        assert world.tick > tick and world.process.is_alive()
+    finally:
+        world.close()
+        pygame.quit()
+
+
+def test_heatmap_from_arrays_matches_the_loop():
+    pygame.init()
+    world = PetWorld(3000, 2000, rng=random.Random(5), backend='numpy')
+    rng = random.Random(2)
+    for i in range(2000):
+        world.add_pet(f"Pet{i}", rng.uniform(0, 3000), rng.uniform(0, 2000), {})
+    game = PyGamePetAI(world=world)
+    assert game.pet_positions() is not None
+    columns, rows = -(-game.width // 16), -(-game.height // 16)
+    for x, y, zoom in ((0, 0, 1), (1000, 500, 0.25), (-400, 1500, 2), (2500, -300, 0.5)):
+        game.camera.x, game.camera.y, game.camera.zoom = x, y, zoom
+        binned = game.heat_from_arrays(*game.pet_positions(), columns, rows)
+        counted = game.heat_from_pets(game.visible_pets(), columns, rows)
+        assert pygame.image.tobytes(binned, 'RGBA') == pygame.image.tobytes(counted, 'RGBA'), (x, y, zoom)
+    pygame.quit()
@@ -0,0 +1,63 @@
+from pet_arrays import np
+from pet_env import OBS_SIZE, VectorPetEnv
+from pet_flow import arena_flow
+from pet_moves import act
+from pet_policy import EXPLORE, FIND_FOOD, HELP_FRIEND, SOCIALIZE, compile_policy, needy_mask
+from pet_world import default_pets
+
+
+def test_moves_match_separate_worlds():
+    env = VectorPetEnv(num_envs=8, num_pets=4, seed=1)
+    env.reset()
+    rng = np.random.default_rng(2)
+    env.hunger[:] = rng.uniform(0, 100, env.hunger.shape)
+    env.happiness[:] = rng.uniform(0, 100, env.happiness.shape)
+    env.food_alive[:] = rng.random(env.food_alive.shape) < 0.4
+    env.food_x[:] = rng.integers(50, 750, env.food_x.shape)
+    env.food_y[:] = rng.integers(50, 450, env.food_y.shape)
+    env.food_x[0, 0], env.food_y[0, 0], env.food_alive[0, 0] = env.x[0, 0], env.y[0, 0], True  # Standing on it
+    env.food_stale[:] = True
+    actions = rng.integers(0, EXPLORE, env.x.shape)  # Everything but the random explorers
+    dx, dy = env._moves(actions)
+
+    for i in range(env.num_envs):
+        flow = arena_flow(env.width, env.height, env.bounds)
+        alive = env.food_alive[i]
+        flow.set_food(zip(env.food_x[i, alive], env.food_y[i, alive]))
+        x, y = env.x[i], env.y[i]
+        needy = needy_mask(env.hunger[i], env.happiness[i])
+        alone = ((actions[i] == FIND_FOOD) & ~alive.any()) | ((actions[i] == HELP_FRIEND) & (needy.sum() - needy == 0)) \
+            | ((actions[i] == SOCIALIZE) & ((env.happiness[i] > 50).sum() - (env.happiness[i] > 50) == 0))
+        world_dx, world_dy, done = act(actions[i], x, y, flow, env.food_x[i, alive], env.food_y[i, alive],
+                                       (x, y, env.hunger[i], env.happiness[i], np.arange(env.num_pets)))
+        assert done[~alone].all()
+        # A PetWorld's pets with nothing to head for stand still
+        assert (dx[i] == np.where(alone, 0, world_dx)).all() and (dy[i] == np.where(alone, 0, world_dy)).all()
+
+
+def test_same_seed_same_episodes():
+    weights = compile_policy(pet['ai'] for pet in default_pets().values())
+    runs = []
+    for _ in range(2):
+        env = VectorPetEnv(num_envs=4, seed=3, episode_ticks=200)
+        observations = [env.reset()]
+        for _ in range(500):
+            observations.append(env.step(env.policy_actions(weights))[0])
+        runs.append(np.array(observations))
+    assert runs[0].shape == (501, 4, 3, OBS_SIZE)
+    assert (runs[0] == runs[1]).all()
+
+
+def test_food_follows_the_spawner():
+    env = VectorPetEnv(num_envs=16, seed=5, episode_ticks=10000)
+    env.reset()
+    seen = 0
+    rest = np.ones(env.x.shape, dtype=int)  # Resting pets leave the food to spoil
+    for _ in range(2000):
+        before = env.food_alive.copy()
+        env.step(rest)
+        seen += (env.food_alive & ~before).sum()
+        assert env.food_alive.sum(axis=1).max() <= env.max_food
+        assert all(spawner.regions[0].count == alive
+                   for spawner, alive in zip(env.spawners, env.food_alive.sum(axis=1)))
+    assert seen > 100
@@ -0,0 +1,39 @@
+import pytest
+
+from pet_arrays import PERSONALITY_FIELDS
+from pet_evolve import evolve
+
+SMALL = dict(population=6, ticks=60, episodes=2, num_pets=2, elite=2, processes=0, seed=4)
+
+
+def test_resume_matches_uninterrupted_run(tmp_path):
+    checkpoint = str(tmp_path / 'search.json')
+    evolve(generations=2, checkpoint=checkpoint, **SMALL)
+    resumed = evolve(generations=4, checkpoint=checkpoint, **SMALL)
+    assert resumed == evolve(generations=4, **SMALL)
+    assert [entry['generation'] for entry in resumed['history']] == [0, 1, 2, 3]
+
+
+def test_resume_refuses_other_settings(tmp_path):
+    checkpoint = str(tmp_path / 'search.json')
+    evolve(generations=1, checkpoint=checkpoint, **SMALL)
+    with pytest.raises(ValueError, match='ticks'):
+        evolve(generations=2, checkpoint=checkpoint, **dict(SMALL, ticks=90))
+    with pytest.raises(ValueError, match='happiness'):
+        evolve(generations=2, checkpoint=checkpoint, fitness='balanced', **SMALL)
+    evolve(generations=2, checkpoint=checkpoint, resume=False, **dict(SMALL, ticks=90))
+
+
+@pytest.mark.parametrize('bad', [dict(population=0), dict(elite=7), dict(mutation=-0.1),
+                                 dict(fitness='speed')])
+def test_bad_settings(bad):
+    with pytest.raises(ValueError):
+        evolve(generations=1, **dict(SMALL, **bad))
+
+
+@pytest.mark.parametrize('elite', [0, 1])
+def test_smallest_settings(elite):
+    result = evolve(generations=3, population=1, ticks=1, episodes=1, num_pets=1, elite=elite,
+                    mutation=0, processes=0)
+    assert len(result['history']) == 3
+    assert set(result['best_weights']) == set(PERSONALITY_FIELDS)
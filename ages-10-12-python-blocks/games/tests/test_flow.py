@@ -0,0 +1,67 @@
+import random
+
+import pet_flow
+from pet_flow import FLOW_MAX_CELLS, FlowFields, arena_flow
+
+
+def walled_arena():
+    flow = FlowFields(400, 300)
+    flow.add_obstacle(200, 0, 219, 239)   # A wall with a gap at the bottom
+    flow.add_obstacle(0, 200, 119, 219)   # A box around the bottom-left corner
+    flow.add_obstacle(100, 220, 119, 299)
+    flow.set_food([(350, 30)])
+    return flow
+
+
+def walk(flow, x, y, limit=1000):
+    """Follow the food arrows from (x, y); returns the food cell, or None"""
+    for _ in range(limit):
+        move = flow.food_move(x, y)
+        if move is None:
+            return flow.cell(x, y)
+        x, y = x + move['dx'], y + move['dy']
+        assert not flow.is_blocked(x, y)
+    return None
+
+
+def test_arrows_lead_round_walls_to_food():
+    flow = walled_arena()
+    assert walk(flow, 30, 30) == flow.cell(350, 30)
+    assert walk(flow, 150, 150) == flow.cell(350, 30)
+    assert flow.food_move(50, 250) is None  # Boxed in: no way to the food
+    assert flow.food_move(350, 30) is None  # Standing on it
+
+
+def test_numpy_build_matches_dijkstra(monkeypatch):
+    flows = []
+    for use_numpy in (True, False):
+        if not use_numpy:
+            monkeypatch.setattr(pet_flow, 'np', None)
+        flow = walled_arena()
+        rng = random.Random(8)
+        for _ in range(6):
+            x, y = rng.randrange(0, 380), rng.randrange(0, 280)
+            flow.add_obstacle(x, y, x + 20, y + 20)
+        flow.update()
+        flows.append(flow)
+    for field in ('food', 'rest'):
+        assert getattr(flows[0], field).distance == getattr(flows[1], field).distance
+        assert getattr(flows[0], field).moves == getattr(flows[1], field).moves
+
+
+def test_fields_rebuild_only_when_needed():
+    flow = walled_arena()
+    flow.update()
+    rest_moves = flow.rest.moves
+    flow.set_food([(30, 30)])
+    assert flow.food_stale and not flow.rest_stale
+    flow.update()
+    assert flow.rest.moves is rest_moves
+    flow.add_obstacle(300, 100, 319, 119)
+    assert flow.food_stale and flow.rest_stale
+
+
+def test_big_arenas_get_bigger_cells():
+    flow = arena_flow(20000, 20000, (25, 25, 19975, 19850))
+    assert flow.columns * flow.rows <= 1.05 * FLOW_MAX_CELLS  # Rounding up can add a few
+    assert arena_flow(800, 600, (25, 25, 775, 450)).cell_size == pet_flow.FLOW_CELL_SIZE
@@ -0,0 +1,93 @@
+import pytest
+
+from pet_history import History
+from pet_replay import state_digest
+from pet_scheduling import AIScheduler
+from pet_shards import random_pets
+from pet_world import PetAI, PetWorld
+
+
+def make_world(backend):
+    pets = {name: dict(pet, ai=PetAI(name, pet['personality']))
+            for name, pet in random_pets(30, 1200, 1000, seed=2).items()}
+    return PetWorld(1200, 1000, pets, seed=5, backend=backend, pet_rngs=True)
+
+
+def run(world, start, stop, digests=None):
+    """Step from tick start to stop, giving commands along the way"""
+    for tick in range(start + 1, stop + 1):
+        world.step()
+        if tick == 40:
+            world.add_food(500, 500)
+            world.add_message("hi")
+        if tick == 70:
+            world.toggle_code()
+        if tick == 125:
+            world.add_food(900, 300)
+        if digests is not None:
+            digests[tick] = state_digest(world)
+
+
+@pytest.fixture(params=['dict', 'numpy'])
+def recorded(request):
+    """(world with a History of 200 ticks, its History, digest of every tick)"""
+    digests = {}
+    run(make_world(request.param), 0, 200, digests)
+    world = make_world(request.param)
+    history = History(world, checkpoint_every=50)
+    run(world, 0, 200)
+    yield world, history, digests
+    history.close()
+
+
+def test_recording_does_not_change_the_world(recorded):
+    world, history, digests = recorded
+    assert state_digest(world) == digests[200]
+    assert (history.first_tick, history.last_tick) == (0, 200)
+
+
+def test_world_at_any_tick(recorded):
+    _, history, digests = recorded
+    for tick in (1, 49, 50, 99, 126, 173, 200):
+        assert state_digest(history.world_at(tick)) == digests[tick]
+        assert state_digest(history.world_at(tick, exact=False)) == digests[tick]
+
+
+def test_rewind_between_checkpoints_then_carry_on(recorded):
+    world, history, digests = recorded
+    history.rewind(110)
+    assert state_digest(world) == digests[110]
+    assert history.last_tick == 110
+    run(world, 110, 200)
+    assert state_digest(world) == digests[200]
+
+
+def test_save_and_load(recorded, tmp_path):
+    _, history, digests = recorded
+    path = str(tmp_path / 'world.pethist')
+    history.save(path)
+    loaded = History.load(path)
+    try:
+        assert state_digest(loaded.world) == digests[200]
+        assert state_digest(loaded.world_at(77)) == digests[77]
+        loaded.rewind(160)
+        run(loaded.world, 160, 200)
+        assert state_digest(loaded.world) == digests[200]
+    finally:
+        loaded.close()
+
+
+def test_budget_drops_oldest_ticks():
+    world = make_world('numpy')
+    history = History(world, budget_bytes=40_000, checkpoint_every=20)
+    world.step(200)
+    assert history.first_tick > 0
+    assert history.last_tick == 200
+    with pytest.raises(ValueError):
+        history.world_at(0)
+    history.close()
+
+
+def test_clock_budget_is_refused():
+    with pytest.raises(ValueError):
+        History(PetWorld(seed=1, ai_scheduler=AIScheduler(budget=0.001)))
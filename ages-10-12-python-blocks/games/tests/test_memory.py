@@ -0,0 +1,61 @@
+from pet_memory import ATE_FOOD, HELPED_FRIEND, MET_FRIEND, NameTable, PetMemory
+from pet_shards import random_pets
+from pet_policy import GOALS
+from pet_world import MEET_LOG_INTERVAL, PetAI, PetWorld
+
+
+def test_oldest_events_are_forgotten():
+    memory = PetMemory(capacity=4)
+    for tick in range(10):
+        memory.remember(tick, MET_FRIEND if tick % 3 else ATE_FOOD, tick, 0, f"Pet{tick}")
+    assert len(memory) == 4
+    # Only ticks 6-9 are left: meals were at 0, 3, 6 and 9
+    assert [record.tick for record in memory.recent(ATE_FOOD)] == [9, 6]
+    assert memory.last(ATE_FOOD).tick == 9
+    assert memory.partners(MET_FRIEND) == {'Pet7', 'Pet8'}
+    assert memory.partners(MET_FRIEND, since=8) == {'Pet8'}
+    assert memory.last(HELPED_FRIEND) is None
+
+
+def test_remember_all_matches_remember():
+    one_by_one, batched = PetMemory(capacity=5), PetMemory(capacity=5)
+    events = [(MET_FRIEND, 'Luna'), (HELPED_FRIEND, 'Dash'), (MET_FRIEND, None), (MET_FRIEND, 'Luna')]
+    for tick in (10, 20):
+        for kind, partner in events:
+            one_by_one.remember(tick, kind, 3.5, 4.5, partner)
+        batched.remember_all(tick, [kind for kind, _ in events], 3.5, 4.5,
+                             [batched.names.id(partner) for _, partner in events])
+    for kind in (MET_FRIEND, HELPED_FRIEND):
+        assert one_by_one.recent(kind) == batched.recent(kind)
+
+
+def test_use_names_keeps_partners():
+    memory = PetMemory()
+    memory.remember(1, MET_FRIEND, 0, 0, 'Luna')
+    shared = NameTable()
+    shared.id('Someone else')
+    memory.use_names(shared)
+    memory.remember(2, MET_FRIEND, 0, 0, 'Dash')
+    assert memory.partners(MET_FRIEND) == {'Luna', 'Dash'}
+    assert memory.names is shared
+
+
+def test_numpy_backend_notes_the_same_meetings():
+    def memories(note_in_batches):
+        pets = {name: dict(pet, ai=PetAI(name, pet['personality']))
+                for name, pet in random_pets(300, 600, 450, seed=4).items()}
+        world = PetWorld(600, 450, pets, seed=2, backend='numpy')
+        if not note_in_batches:
+            def one_pair_at_a_time(slots, others, codes):
+                arrays = world.pets.arrays
+                for slot, other in zip(slots.tolist(), others.tolist()):
+                    world._note_meeting(arrays.ais[slot], GOALS[codes[slot]], arrays.views[slot],
+                                        arrays.names[other], arrays.views[other])
+            world._note_meetings = one_pair_at_a_time
+        world.step(2 * MEET_LOG_INTERVAL)
+        return {name: [memory.recent(kind) for kind in (MET_FRIEND, HELPED_FRIEND)]
+                for name, memory in ((name, pet['ai'].memory) for name, pet in world.pets.items())}
+
+    batched = memories(True)
+    assert batched == memories(False)
+    assert sum(len(met) for met, _ in batched.values()) > 300
@@ -0,0 +1,34 @@
+import random
+
+from pet_policy import check_equivalence
+from pet_world import PetAI, default_pets
+
+
+def crowd(count, seed):
+    rng = random.Random(seed)
+    pets = {}
+    for i in range(count):
+        personality = {'hunger': rng.random(), 'social': rng.random(), 'helpful': rng.random()}
+        pets[f"Pet{i}"] = {
+            'x': rng.uniform(25, 775), 'y': rng.uniform(25, 450),
+            'hunger': rng.choice([rng.uniform(0, 100), 30, 70, 100]),
+            'energy': rng.choice([rng.uniform(0, 100), 0, 44, 100]),
+            'happiness': rng.choice([rng.uniform(0, 100), 29, 30, 50]),
+            'ai': PetAI(f"Pet{i}", personality),
+        }
+    return pets
+
+
+def test_compiled_policy_matches_think():
+    assert check_equivalence(default_pets()) == []
+    for seed in range(5):
+        assert check_equivalence(crowd(300, seed)) == []
+
+
+def test_check_equivalence_leaves_goals_alone():
+    pets = default_pets()
+    for pet in pets.values():
+        pet['ai'].current_goal = 'explore'
+    check_equivalence(pets)
+    assert all(pet['ai'].current_goal == 'explore' for pet in pets.values())
+
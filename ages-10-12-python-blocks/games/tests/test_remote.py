@@ -0,0 +1,66 @@
+import time
+from multiprocessing import Event, Process
+
+import pytest
+
+from pet_remote import RemoteWorld, SnapshotBuffer
+
+
+def write_forever(name, stop):
+    buffer = SnapshotBuffer(name=name)
+    count = 0
+    while not stop.is_set():
+        count += 1
+        # Every byte of a snapshot is the same, and sizes vary
+        buffer.write(bytes([count % 256]) * (1000 + count % 50000))
+    buffer.close()
+
+
+def test_snapshot_buffer_round_trip():
+    buffer = SnapshotBuffer(slot_bytes=100)
+    try:
+        assert buffer.read() is None
+        buffer.write(b'first')
+        buffer.write(b'second')
+        assert buffer.read() == b'second'
+        with pytest.raises(ValueError):
+            buffer.write(bytes(101))
+    finally:
+        buffer.close()
+        buffer.shm.unlink()
+
+
+def test_no_torn_reads():
+    buffer = SnapshotBuffer(slot_bytes=60000)
+    stop = Event()
+    writer = Process(target=write_forever, args=(buffer.name, stop))
+    writer.start()
+    try:
+        reads = 0
+        end = time.perf_counter() + 1.0
+        while time.perf_counter() < end:
+            data = buffer.read()
+            if data is not None:
+                assert data == data[:1] * len(data)
+                reads += 1
+        assert reads > 0
+    finally:
+        stop.set()
+        writer.join()
+        buffer.close()
+        buffer.shm.unlink()
+
+
+def test_remote_world_grows_its_buffer():
+    world = RemoteWorld(seed=2, snapshot_bytes=64)
+    try:
+        assert world.buffer.slot_bytes > 64
+        assert set(world.pets) == {'Buddy', 'Luna', 'Dash'}
+        world.add_message("Hello from the game")
+        deadline = time.perf_counter() + 10
+        while "Hello from the game" not in world.snapshot['messages'] and time.perf_counter() < deadline:
+            time.sleep(0.01)
+            world.refresh()
+        assert "Hello from the game" in world.snapshot['messages']
+    finally:
+        world.close()
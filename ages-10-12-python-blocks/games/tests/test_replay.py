@@ -0,0 +1,91 @@
+import pytest
+
+from pet_replay import RecordedWorld, read_log, replay, state_digest
+from pet_scheduling import AIScheduler
+from pet_world import PetWorld
+
+
+def play(world):
+    """A short session using every kind of command"""
+    world.step(30)
+    world.add_food(300, 200)
+    world.add_message("Snack time!")
+    world.step(20)
+    world.add_pet('Pip', 100, 100, {'hunger': 0.9, 'social': 0.2}, happiness=20)
+    world.add_obstacle(500, 100, 540, 300)
+    world.toggle_code()
+    world.step(25)
+    world.set_focus(0, 0, 400, 300)
+    world.add_food(x=600, y=150, lifetime=90)
+    world.step(25)
+    world.clear_focus()
+    world.step(20)
+
+
+@pytest.mark.parametrize('backend', ['dict', 'numpy'])
+def test_replay_matches_recording(tmp_path, backend):
+    path = str(tmp_path / 'session.petlog')
+    world = RecordedWorld(PetWorld(seed=7, backend=backend, pet_rngs=True), path)
+    play(world)
+    world.close()
+
+    uninterrupted = PetWorld(seed=7, backend=backend, pet_rngs=True)
+    play(uninterrupted)
+    replayed, matched = replay(path)
+    assert matched is True
+    assert state_digest(replayed) == state_digest(uninterrupted)
+    assert 'Pip' in replayed.pets
+
+
+def test_replay_stops_early(tmp_path):
+    path = str(tmp_path / 'session.petlog')
+    with RecordedWorld(PetWorld(seed=3), path) as world:
+        play(world)
+    _, records, end = read_log(path)
+    assert [command for _, command, _ in records][:3] == ['add_food', 'add_message', 'add_pet']
+    assert end[0] == 120
+
+    early, matched = replay(path, until=60)
+    assert matched is None
+    assert early.tick == 60
+
+
+def test_only_replayable_worlds_are_recorded(tmp_path):
+    path = str(tmp_path / 'session.petlog')
+    with pytest.raises(ValueError):
+        RecordedWorld(PetWorld(), path)
+    with pytest.raises(ValueError):
+        RecordedWorld(PetWorld(seed=1, ai_scheduler=AIScheduler(budget=0.001)), path)
+    started = PetWorld(seed=1)
+    started.step()
+    with pytest.raises(ValueError):
+        RecordedWorld(started, path)
+
+
+@pytest.mark.parametrize('backend', ['dict', 'numpy'])
+def test_failed_commands_are_not_recorded(tmp_path, backend):
+    path = str(tmp_path / 'session.petlog')
+    with RecordedWorld(PetWorld(seed=5, backend=backend), path) as world:
+        world.step(10)
+        with pytest.raises(TypeError):
+            world.add_obstacle('left', 0, 100, 100)
+        world.step(10)
+        world.add_food(x=200, y=200)
+        world.step(10)
+    _, records, _ = read_log(path)
+    assert [command for _, command, _ in records] == ['add_food']
+    _, matched = replay(path)
+    assert matched is True
+
+
+def test_commands_sent_to_the_world_itself_are_recorded(tmp_path):
+    path = str(tmp_path / 'session.petlog')
+    world = PetWorld(seed=5)
+    with RecordedWorld(world, path):
+        world.step(10)
+        world.add_food(200, 200)
+        world.step(10)
+    assert world.input_observers == []
+    _, records, _ = read_log(path)
+    assert records == [(10, 'add_food', [200, 200])]
+    assert replay(path)[1] is True
@@ -0,0 +1,134 @@
+from pet_arrays import np
+from pet_scheduling import AIScheduler, ExpiryQueue, FoodSpawner
+from pet_world import MESSAGE_LIFETIME, PetWorld, WorldSummary, default_pets
+
+
+def test_expiry_queue_pops_in_order():
+    queue = ExpiryQueue()
+    for key, expires in (('a', 5), ('b', 3), ('c', 5), ('d', 9)):
+        queue.schedule(key, expires)
+    assert queue.next_expiry() == 3
+    assert queue.pop_expired(2) == []
+    assert queue.pop_expired(5) == ['b', 'a', 'c']
+    assert len(queue) == 1 and 'd' in queue
+
+
+def test_expiry_queue_cancel_and_reschedule():
+    queue = ExpiryQueue()
+    queue.schedule('a', 4)
+    queue.schedule('b', 6)
+    queue.cancel('a')
+    queue.schedule('b', 10)  # The old entry for b is stale now
+    assert queue.next_expiry() == 10
+    assert queue.pop_expired(9) == []
+    assert queue.pop_expired(10) == ['b']
+    assert len(queue) == 0 and queue.next_expiry() is None
+
+
+def test_expiry_queue_compacts_cancelled_entries():
+    queue = ExpiryQueue()
+    for key in range(1000):
+        queue.schedule(key, key)
+    for key in range(990):
+        queue.cancel(key)
+    assert len(queue.heap) < 200
+    assert queue.pop_expired(2000) == list(range(990, 1000))
+
+
+def test_food_and_messages_expire_on_time():
+    world = PetWorld(pets={}, seed=1, food_spawner=FoodSpawner(seed=1))
+    world.add_food(100, 100, lifetime=10)
+    world.add_message("hello")
+    world.step(9)
+    assert len(world.food_items) == 1
+    world.step()
+    assert len(world.food_items) == 0
+    world.step(MESSAGE_LIFETIME - 11)
+    assert [message['text'] for message in world.messages] == ["hello"]
+    world.step()
+    assert len(world.messages) == 0
+
+
+def arrivals(spawner, ticks):
+    return [(tick, spawn) for tick in range(ticks) for spawn in spawner.due(tick)]
+
+
+def test_spawner_seed_gives_same_arrivals():
+    first, second = FoodSpawner(seed=4), FoodSpawner(seed=4)
+    for spawner in (first, second):
+        spawner.add_region((0, 100), (0, 100), rate=0.1, cap=1000)
+        spawner.add_region((200, 300), (0, 100), rate=0.05, cap=1000, lifetime=50)
+    spawned = arrivals(first, 2000)
+    assert spawned == arrivals(second, 2000)
+    assert 200 < len(spawned) < 400  # About 0.15 per tick
+    assert all(0 <= x <= 100 if region == 0 else 200 <= x <= 300 for _, (region, x, _, _) in spawned)
+    assert {lifetime for _, (region, _, _, lifetime) in spawned if region == 1} == {50}
+
+
+def test_spawner_respects_caps():
+    spawner = FoodSpawner(seed=2)
+    spawner.add_region((0, 100), (0, 100), rate=0.5, cap=2)
+    assert len(arrivals(spawner, 100)) == 2
+    spawner.release(0)
+    assert len(arrivals(spawner, 200)) == 1  # Ticks already past have nothing left
+    assert spawner.claim(50, 50) == 0 and spawner.regions[0].count == 3
+    assert spawner.claim(500, 500) is None
+
+
+def test_full_spawner_keeps_the_same_random_stream():
+    capped, roomy = FoodSpawner(seed=9), FoodSpawner(seed=9)
+    capped.add_region((0, 100), (0, 100), rate=0.2, cap=1)
+    roomy.add_region((0, 100), (0, 100), rate=0.2, cap=1000)
+    arrivals(capped, 500)
+    arrivals(roomy, 500)
+    assert capped.next_tick == roomy.next_tick
+
+
+def test_seeded_world_food_does_not_depend_on_the_pets():
+    calm = PetWorld(seed=3)
+    busy = PetWorld(seed=3)
+    busy.add_pet('Extra', 300, 300, {'social': 1.0}, happiness=10)
+    calm.step(600)
+    busy.step(600)
+    assert calm.food_spawner.next_tick == busy.food_spawner.next_tick
+
+
+def test_ai_scheduler_staggers_pets():
+    scheduler = AIScheduler(period=4)
+    names = [f"Pet{i}" for i in range(12)]
+    thinks = {name: [tick for tick in range(8) if scheduler.should_think(name, tick)] for name in names}
+    assert all(len(ticks) == 2 and ticks[1] - ticks[0] == 4 for ticks in thinks.values())
+    assert sorted(ticks[0] for ticks in thinks.values()) == [0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3]
+
+    scheduler.wake('Pet1')  # Pet1 is on phase 1
+    assert scheduler.should_think('Pet1', 8)
+    assert not scheduler.should_think('Pet1', 10)
+
+
+def test_ai_scheduler_budget_postpones_a_tick():
+    clock = iter(range(1000))
+    scheduler = AIScheduler(budget=2.5, clock=lambda: next(clock))  # Each think costs 1
+    pets = default_pets()
+    ai = pets['Buddy']['ai']
+    game_state = {'pets': pets, 'food_items': [], 'summary': WorldSummary(pets)}
+    scheduler.start_tick()
+    thought = [name for name in 'abcde' if scheduler.should_think(name, 0) and scheduler.think(ai, game_state)]
+    assert thought == ['a', 'b', 'c']
+    scheduler.start_tick()
+    # Postponed pets go first next tick, whatever the budget
+    assert [name for name in 'de' if scheduler.should_think(name, 1)] == ['d', 'e']
+
+
+def test_ai_scheduler_plan_matches_should_think():
+    names = [f"Pet{i}" for i in range(20)]
+    slots = {name: slot for slot, name in enumerate(names)}
+    one_at_a_time, batched = AIScheduler(period=3), AIScheduler(period=3)
+    asking = np.ones(len(names), dtype=bool)
+    asking[::4] = False
+    one_at_a_time.phase_array(names)  # Same phases: pets get them in the order first seen
+    for tick in range(6):
+        for scheduler in (one_at_a_time, batched):
+            scheduler.wake(names[tick + 1])
+        expected = [bool(asking[slot]) and one_at_a_time.should_think(name, tick) for slot, name in enumerate(names)]
+        woken, due = batched.plan(names, tick, asking, slots)
+        assert (woken | due).tolist() == expected
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import math
+
+import pytest
+
+from pet_server import (COMMAND, ERROR, MAX_COMMAND_BYTES, PetClient, PetServer, Player, _frame,
+                        _numbers)
+from pet_world import PetWorld
+
+
+class Writer:
+    """Collects what the server sends a player"""
+
+    def __init__(self):
+        self.frames = []
+
+    def write(self, data):
+        self.frames.append(data)
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize('args', [
+    [1, 2, 3],
+    [1, 2, 3, 4, 5],
+    [1, 2, 3, math.nan],
+    [1, 2, math.inf, 4],
+    [1, 2, 3, True],
+    [1, 2, 3, '4'],
+    [1, 2, 3, None],
+])
+def test_numbers_refuses_bad_arguments(args):
+    with pytest.raises(ValueError):
+        _numbers(args, 4)
+
+
+def test_numbers_gives_floats():
+    assert _numbers([1, 2.5], 2) == [1.0, 2.5]
+
+
+@pytest.mark.parametrize('command, args', [
+    ('view', [0, 0, 100]),
+    ('view', [0, 0, math.nan, 100]),
+    ('view', [100, 0, 0, 100]),
+    ('view', [0, 0, 100000, 100]),
+    ('add_food', [-500, 100]),
+    ('add_food', ['here', 'there']),
+    ('adopt', []),
+    ('adopt', ['Luna']),
+    ('adopt', ['Rex', 'friendly']),
+    ('adopt', ['Rex', {'hunger': 0.5}]),
+    ('adopt', ['Rex', [0.5, 0.5]]),
+])
+def test_bad_commands_are_refused(command, args):
+    world = PetWorld(3000, 2000, seed=1)
+    server = PetServer(world)
+    player = server.players[1] = Player(1, 'Sam', Writer())
+    pets, food = dict(world.pets), len(world.food)
+
+    server._apply(player, command, args)
+
+    assert player.view is None
+    assert dict(world.pets) == pets and len(world.food) == food
+    assert len(player.writer.frames) == 1
+    assert player.writer.frames[0][4] == ERROR  # After the payload size
+
+
+def test_adopting_is_limited():
+    world = PetWorld(3000, 2000, seed=1)
+    server = PetServer(world)
+    player = Player(1, 'Sam', Writer())
+    for name in ('Rex', 'Bo', 'Pip', 'Zed'):
+        server._apply(player, 'adopt', [name])
+    assert {'Rex', 'Bo', 'Pip'} <= set(world.pets) and 'Zed' not in world.pets
+    assert len(player.writer.frames) == 1
+
+
+def test_world_keeps_going_after_bad_input(capsys):
+    async def session():
+        world = PetWorld(1000, 800, seed=1)
+        server = PetServer(world)
+        port = await server.start()
+        try:
+            client = await PetClient.connect('127.0.0.1', port, 'Sam')
+            await client.command('add_food', 'here', 'there')
+            client.writer.write(_frame(COMMAND, json.dumps(['launch_rocket']).encode('utf-8')))
+
+            # A command that blows up inside the world is dropped, not fatal
+            add_food = world.add_food
+
+            def broken_add_food(*args, **kwargs):
+                world.add_food = add_food
+                raise RuntimeError("out of apples")
+            world.add_food = broken_add_food
+            added = []
+            world.input_observers.append(lambda name, args, kwargs: added.append((name, args)))
+            await client.command('add_food', 300, 300)
+            await client.command('add_food', 400, 300)
+            while len(client.errors) < 2:
+                await asyncio.wait_for(client.receive(), 2)
+            while not added:
+                await asyncio.sleep(0.01)
+            assert added == [('add_food', (400, 300))]
+            tick = world.tick
+
+            # A player sending oversized frames is disconnected, and nobody else notices
+            rude = await PetClient.connect('127.0.0.1', port, 'Rude')
+            rude.writer.write(_frame(COMMAND, b' ' * (MAX_COMMAND_BYTES + 1)))
+            while len(server.players) > 1:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.1)
+            assert world.tick > tick
+            await client.close()
+            await rude.close()
+            return client.errors
+        finally:
+            await server.close()
+
+    errors = asyncio.run(session())
+    assert sorted(error.split(':')[0] for error in errors) == ['Unknown command', 'add_food']
+    assert "Dropped add_food from Sam" in capsys.readouterr().out
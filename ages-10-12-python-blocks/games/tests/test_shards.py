@@ -0,0 +1,37 @@
+import pytest
+
+from pet_arrays import np
+from pet_shards import ShardedWorld, random_pets
+
+
+def run(processes, shards=4):
+    with ShardedWorld(random_pets(400, 1600, 1200, seed=3), 1600, 1200, shards=shards,
+                      processes=processes, seed=5) as world:
+        world.add_obstacle(700, 300, 740, 900)
+        world.step(40)
+        world.add_food(400, 400)
+        world.add_message("Lunch!")
+        world.step(40)
+        return world.snapshot(), [food['id'] for food in world.food_items], world.current_code
+
+
+@pytest.mark.parametrize('processes', [1, 2, 4])
+def test_results_do_not_depend_on_processes(processes):
+    snapshot, food, code = run(processes)
+    alone, alone_food, alone_code = run(0)
+    assert all(np.array_equal(snapshot[key], alone[key]) for key in alone)
+    assert (food, code) == (alone_food, alone_code)
+
+
+def test_pets_stay_in_bounds_and_keep_their_names():
+    pets = random_pets(200, 800, 600, seed=1)
+    with ShardedWorld(pets, shards=3, processes=0, seed=2, capacity=256) as world:
+        world.add_pet('Late', 400, 300, {'social': 0.9})
+        world.step(100)
+        assert set(world.pets) == set(pets) | {'Late'}
+        min_x, min_y, max_x, max_y = world.bounds
+        for pet in world.pets.values():
+            assert min_x <= pet['x'] <= max_x and min_y <= pet['y'] <= max_y
+            assert 0 <= pet['hunger'] <= 100
+        inside = world.pets_in(0, 0, 400, 600)
+        assert inside and all(pet['x'] < 400 for _, pet in inside)
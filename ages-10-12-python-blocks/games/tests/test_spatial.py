@@ -0,0 +1,68 @@
+import math
+import random
+
+from pet_arrays import np
+from pet_spatial import SpatialGrid, close_pairs, nearest_points
+
+
+def test_grid_query_and_nearest_match_brute_force():
+    rng = random.Random(2)
+    grid = SpatialGrid(50)
+    points = {}
+    for key in range(300):
+        points[key] = (rng.uniform(-200, 900), rng.uniform(-200, 700))
+        grid.insert(key, *points[key])
+    for key in range(0, 300, 3):  # Some points move, some leave
+        points[key] = (rng.uniform(-200, 900), rng.uniform(-200, 700))
+        grid.move(key, *points[key])
+    for key in range(1, 300, 7):
+        del points[key]
+        grid.remove(key)
+    assert len(grid) == len(points)
+
+    for _ in range(100):
+        x, y = rng.uniform(-400, 1100), rng.uniform(-400, 900)
+        radius = rng.uniform(10, 200)
+        distance = {key: math.sqrt((x - px)**2 + (y - py)**2) for key, (px, py) in points.items()}
+        assert sorted(grid.query(x, y, radius)) == sorted(key for key, d in distance.items() if d < radius)
+        assert grid.nearest(x, y) == min(points, key=lambda key: (distance[key], key))
+        closest = grid.nearest(x, y)
+        assert grid.nearest(x, y, exclude=closest) == min((key for key in points if key != closest),
+                                                          key=lambda key: (distance[key], key))
+
+
+def test_grid_nearest_ties_go_to_smallest_key():
+    grid = SpatialGrid(10)
+    for key, x in ((5, 10), (2, 30), (7, 30)):
+        grid.insert(key, x, 0)
+    assert grid.nearest(20, 0) == 2
+    assert SpatialGrid(10).nearest(0, 0) is None
+
+
+def test_close_pairs_matches_brute_force():
+    rng = np.random.default_rng(5)
+    ax, ay = rng.uniform(-100, 600, 400), rng.uniform(0, 500, 400)
+    bx, by = rng.uniform(0, 700, 300), rng.uniform(-50, 400, 300)
+    for radius in (5, 30, 120):
+        found = set(zip(*close_pairs(ax, ay, bx, by, radius)))
+        close = (ax[:, None] - bx) ** 2 + (ay[:, None] - by) ** 2 < radius ** 2
+        assert found == set(zip(*np.nonzero(close)))
+    assert len(close_pairs(ax, ay, bx[:0], by[:0], 30)[0]) == 0
+
+
+def test_nearest_points_matches_brute_force():
+    rng = np.random.default_rng(3)
+    for queries, points in ((50, 40), (3000, 2000), (2000, 5)):
+        qx, qy = rng.uniform(0, 1000, queries), rng.uniform(0, 1000, queries)
+        px, py = rng.integers(0, 100, points) * 10.0, rng.integers(0, 100, points) * 10.0  # Plenty of ties
+        exclude = rng.integers(-1, points, queries)
+        distance = (qx[:, None] - px) ** 2 + (qy[:, None] - py) ** 2
+        skipped = np.flatnonzero(exclude >= 0)
+        distance[skipped, exclude[skipped]] = np.inf
+        assert (nearest_points(qx, qy, px, py, exclude) == distance.argmin(axis=1)).all()
+
+
+def test_nearest_points_with_nothing_to_find():
+    empty = np.zeros(0)
+    assert (nearest_points(np.ones(3), np.ones(3), empty, empty) == -1).all()
+    assert (nearest_points(np.ones(1), np.ones(1), np.ones(1), np.ones(1), np.zeros(1, dtype=int)) == -1).all()